@@ -0,0 +1,64 @@
+"""
+Replays a recording of a worker (see camunda.utils.recording.TaskRecorder) through handlers offline, as fast as
+possible, and prints per topic timings as JSON lines; with --profile the replay runs under cProfile.
+
+    python -m benchmarks.replay recording.ndjson --handler topicA=my_handlers:handle_a --repeat 10
+    python -m benchmarks.replay recording.ndjson --handler topicA=my_handlers:handle_a --profile replay.prof
+"""
+import argparse
+import cProfile
+import importlib
+import json
+import sys
+
+from camunda.testing.replay import ReplayDriver
+
+
+def load_handler(spec):
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise argparse.ArgumentTypeError(f"handler must be module:function, got {spec}")
+    handler = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        handler = getattr(handler, name)
+    return handler
+
+
+def parse_topic_handler(value):
+    topic, separator, spec = value.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected topic=module:function, got {value}")
+    return topic, load_handler(spec)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="NDJSON file written by TaskRecorder")
+    parser.add_argument("--handler", type=parse_topic_handler, action="append", required=True,
+                        help="topic=module:function, repeatable")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the recorded tasks this many times")
+    parser.add_argument("--profile", help="write cProfile stats of the replay to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    driver = ReplayDriver(args.recording)
+    topic_handlers = dict(args.handler)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    stats = driver.run(topic_handlers, repeat=args.repeat)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    for topic, topic_stats in stats.items():
+        print(json.dumps({"topic": topic, **topic_stats}))
+    missing = set(topic_handlers) - set(stats)
+    if missing:
+        print(f"no recorded tasks for topic(s): {', '.join(sorted(missing))}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
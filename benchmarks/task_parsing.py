@@ -0,0 +1,157 @@
+"""
+Microbenchmarks of the per-task CPU path: parsing fetchAndLock responses into ExternalTasks, reading variables,
+Variables.format on wide and deep payloads, TaskResult construction and JSON encoding of the complete body.
+
+    python -m benchmarks.task_parsing                                # print timings
+    python -m benchmarks.task_parsing --save-baseline baseline.json  # record timings
+    python -m benchmarks.task_parsing --baseline baseline.json --threshold 0.2
+        # exit with status 1 if any benchmark got more than 20% slower than the baseline
+"""
+import argparse
+import json
+import sys
+import time
+import timeit
+
+from camunda.external_task.external_task import ExternalTask
+from camunda.testing.fake_engine import FakeTask
+from camunda.variables.variables import Variables
+
+
+def create_variables(count, value_size=10):
+    variables = {}
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            variables[f"str_var_{i}"] = "x" * value_size
+        elif kind == 1:
+            variables[f"int_var_{i}"] = i
+        elif kind == 2:
+            variables[f"bool_var_{i}"] = bool(i % 2)
+        else:
+            variables[f"json_var_{i}"] = {"items": list(range(value_size))}
+    return variables
+
+
+def create_deep_variables(depth, width=3):
+    value = "leaf"
+    for level in range(depth):
+        value = {f"level_{level}_{i}": value for i in range(width)}
+    return {"deep_var": value}
+
+
+def create_fetch_response(tasks_count, variables_count):
+    now = time.monotonic()
+    variables = create_variables(variables_count)
+    return json.dumps([FakeTask("benchmark_topic", variables).to_json(now) for _ in range(tasks_count)])
+
+
+def get_benchmarks():
+    """
+    :return: dict of benchmark name -> zero argument callable, with the inputs prepared outside of the timing
+    """
+    benchmarks = {}
+
+    for tasks_count, variables_count in [(1, 10), (10, 10), (100, 10), (10, 100)]:
+        response_text = create_fetch_response(tasks_count, variables_count)
+        # json decoding alone, to separate its share from the ExternalTask wrappers
+        benchmarks[f"decode_fetch_response[tasks={tasks_count},variables={variables_count}]"] = (
+            lambda text=response_text: json.loads(text)
+        )
+        benchmarks[f"parse_fetch_response[tasks={tasks_count},variables={variables_count}]"] = (
+            lambda text=response_text: [ExternalTask(context) for context in json.loads(text)]
+        )
+
+    for variables_count in [10, 100]:
+        task = ExternalTask(json.loads(create_fetch_response(1, variables_count))[0])
+        names = list(task.get_variables().keys())
+        benchmarks[f"get_variables[variables={variables_count}]"] = task.get_variables
+        benchmarks[f"get_variable_each[variables={variables_count}]"] = (
+            lambda task=task, names=names: [task.get_variable(name) for name in names]
+        )
+        benchmarks[f"get_variable_with_meta[variables={variables_count}]"] = (
+            lambda task=task, name=names[0]: task.get_variable(name, with_meta=True)
+        )
+
+    wide_variables = create_variables(1000)
+    deep_variables = create_deep_variables(8)
+    preformatted_variables = Variables.format(wide_variables)
+    benchmarks["variables_format[wide=1000]"] = lambda: Variables.format(wide_variables)
+    benchmarks["variables_format[preformatted=1000]"] = lambda: Variables.format(preformatted_variables)
+    benchmarks["variables_format[deep=8]"] = lambda: Variables.format(deep_variables)
+    benchmarks["encode_complete_body[wide=1000]"] = lambda: json.dumps({
+        "workerId": "benchmark", "variables": Variables.format(wide_variables), "localVariables": {},
+    })
+    benchmarks["encode_complete_body[deep=8]"] = lambda: json.dumps({
+        "workerId": "benchmark", "variables": Variables.format(deep_variables), "localVariables": {},
+    })
+
+    task = ExternalTask(json.loads(create_fetch_response(1, 10))[0])
+    result_variables = create_variables(10)
+    benchmarks["task_result_complete"] = lambda: task.complete(result_variables)
+    benchmarks["task_result_failure"] = lambda: task.failure("error", "details", max_retries=3, retry_timeout=1000)
+    benchmarks["task_result_bpmn_error"] = lambda: task.bpmn_error("ERROR_CODE", "error", result_variables)
+    return benchmarks
+
+
+def run_benchmark(func, repeat=5, min_seconds=0.2):
+    """
+    :return: best seconds per call over repeat runs of at least min_seconds each
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    :return: list of (name, baseline seconds, seconds) of benchmarks more than threshold (e.g. 0.2 = 20%) slower
+    """
+    regressions = []
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds and seconds > baseline_seconds * (1 + threshold):
+            regressions.append((name, baseline_seconds, seconds))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="minimum duration of one repeat")
+    parser.add_argument("--save-baseline", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON file written by --save-baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name, func in get_benchmarks().items():
+        if args.filter and args.filter not in name:
+            continue
+        seconds = run_benchmark(func, args.repeat, args.min_seconds)
+        results[name] = seconds
+        change = f" ({(seconds / baseline[name] - 1) * 100:+.1f}%)" if baseline.get(name) else ""
+        print(f"{name:<60} {seconds * 1e6:>12.2f} us{change}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, baseline_seconds, seconds in regressions:
+        print(f"REGRESSION {name}: {baseline_seconds * 1e6:.2f} us -> {seconds * 1e6:.2f} us", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
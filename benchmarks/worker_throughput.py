@@ -0,0 +1,242 @@
+"""
+Throughput benchmark of ExternalTaskWorker and AsyncExternalTaskWorker against the in-process FakeEngine.
+
+Every combination of the swept parameters is one scenario. For each scenario it reports tasks/sec, p50/p99
+end-to-end latency (task created in the engine -> reported), lock expiry rate and peak RSS, as one JSON
+object per line so runs can be compared with e.g. jq or pandas.
+
+    python -m benchmarks.worker_throughput --worker async --handler io --max-concurrent-tasks 1 10 50 \\
+        --tasks 2000 --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+
+import httpx
+
+from camunda.external_task.async_external_task_worker import AsyncExternalTaskWorker
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.testing.fake_engine import FakeEngine
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def cpu_work(duration_seconds):
+    deadline = time.perf_counter() + duration_seconds
+    x = 0
+    while time.perf_counter() < deadline:
+        x += 1
+    return x
+
+
+def get_handler_duration(handler, handler_millis, rng):
+    if handler == "heavy-tail":
+        # pareto distributed: most calls are short, a few are very slow
+        return min(handler_millis * rng.paretovariate(1.5) / 3, handler_millis * 100) / 1000
+    return handler_millis / 1000
+
+
+def create_sync_handler(handler, handler_millis, seed):
+    rng = random.Random(seed)
+
+    def handle_task(task):
+        duration = get_handler_duration(handler, handler_millis, rng)
+        if handler == "cpu":
+            cpu_work(duration)
+        else:
+            time.sleep(duration)
+        return task.complete({"result": True})
+    return handle_task
+
+
+def create_async_handler(handler, handler_millis, seed):
+    rng = random.Random(seed)
+
+    async def handle_task(task):
+        duration = get_handler_duration(handler, handler_millis, rng)
+        if handler == "cpu":
+            cpu_work(duration)  # blocks the event loop like a CPU bound coroutine would
+        else:
+            await asyncio.sleep(duration)
+        return task.complete({"result": True})
+    return handle_task
+
+
+def run_sync_worker(engine, topics, scenario, deadline):
+    worker = ExternalTaskWorker("benchmark", engine.base_url, {
+        "maxTasks": scenario["max_tasks"],
+        "lockDuration": scenario["lock_duration_millis"],
+        "asyncResponseTimeout": 1000,
+        "sleepSeconds": 0,
+    })
+    action = create_sync_handler(scenario["handler"], scenario["handler_millis"], scenario["seed"])
+    stopped = threading.Event()
+
+    def fetch_loop():
+        while not stopped.is_set():
+            worker._fetch_and_execute_safe(topics, action)
+
+    thread = threading.Thread(target=fetch_loop, daemon=True)
+    thread.start()
+    finished = engine.wait_until(lambda e: e.count_tasks("available") == 0, deadline - time.monotonic())
+    stopped.set()
+    thread.join(timeout=5)
+    return finished
+
+
+def run_async_worker(engine, topics, scenario, deadline):
+    async def run():
+        http_client = httpx.AsyncClient() if scenario["shared_http_client"] else None
+        worker = AsyncExternalTaskWorker("benchmark", engine.base_url, {
+            "maxConcurrentTasks": scenario["max_concurrent_tasks"],
+            "lockDuration": scenario["lock_duration_millis"],
+            "asyncResponseTimeout": 1000,
+            "sleepSeconds": 0,
+        }, http_client=http_client)
+        handlers = {topic: create_async_handler(scenario["handler"], scenario["handler_millis"], scenario["seed"])
+                    for topic in topics}
+        subscription = asyncio.ensure_future(worker.subscribe(handlers))
+        finished = False
+        while time.monotonic() < deadline:
+            if engine.count_tasks("available") == 0:
+                finished = True
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        subscription.cancel()
+        await asyncio.gather(subscription, return_exceptions=True)
+        if http_client is not None:
+            await http_client.aclose()
+        return finished
+
+    return asyncio.run(run())
+
+
+def percentile(sorted_values, pct):
+    # nearest rank
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def get_peak_rss_kb():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss // 1024 if sys.platform == "darwin" else peak_rss  # bytes on macOS, KB elsewhere
+
+
+def run_scenario(scenario):
+    topics = [f"benchmark_topic_{i}" for i in range(scenario["topics"])]
+    payload = "x" * scenario["payload_bytes"]
+    with FakeEngine(latency_seconds=scenario["engine_latency_millis"] / 1000,
+                    error_rate=scenario["engine_error_rate"], seed=scenario["seed"]) as engine:
+        for i in range(scenario["tasks"]):
+            engine.add_task(topics[i % len(topics)], {"payload": payload, "index": i})
+
+        start = time.monotonic()
+        deadline = start + scenario["timeout_seconds"]
+        if scenario["worker"] == "sync":
+            finished = run_sync_worker(engine, topics, scenario, deadline)
+        else:
+            finished = run_async_worker(engine, topics, scenario, deadline)
+        elapsed = time.monotonic() - start
+
+        reported = [task for task in engine.tasks.values() if task.reported_at is not None]
+        latencies_millis = sorted((task.reported_at - task.created_at) * 1000 for task in reported)
+        stats = dict(engine.stats)
+
+    return {
+        **scenario,
+        "finished": finished,
+        "elapsed_seconds": round(elapsed, 3),
+        "tasks_reported": len(reported),
+        "tasks_per_second": round(len(reported) / elapsed, 2) if elapsed else None,
+        "latency_p50_millis": round(percentile(latencies_millis, 50), 2) if latencies_millis else None,
+        "latency_p99_millis": round(percentile(latencies_millis, 99), 2) if latencies_millis else None,
+        "lock_expiry_rate": round(stats["lock_expired"] / stats["fetched"], 4) if stats["fetched"] else 0,
+        "fetch_and_lock_calls": stats["fetch_and_lock"],
+        "peak_rss_kb": get_peak_rss_kb(),
+        "engine_stats": stats,
+    }
+
+
+def get_scenarios(args):
+    workers = ["sync", "async"] if args.worker == "both" else [args.worker]
+    for worker in workers:
+        # maxTasks only applies to the sync worker, maxConcurrentTasks only to the async one
+        max_tasks_values = args.max_tasks if worker == "sync" else [None]
+        max_concurrent_values = args.max_concurrent_tasks if worker == "async" else [None]
+        for max_tasks in max_tasks_values:
+            for max_concurrent_tasks in max_concurrent_values:
+                for payload_bytes in args.payload_bytes:
+                    for topics in args.topics:
+                        yield {
+                            "worker": worker,
+                            "handler": args.handler,
+                            "handler_millis": args.handler_millis,
+                            "tasks": args.tasks,
+                            "max_tasks": max_tasks,
+                            "max_concurrent_tasks": max_concurrent_tasks,
+                            "payload_bytes": payload_bytes,
+                            "topics": topics,
+                            "shared_http_client": args.shared_http_client if worker == "async" else None,
+                            "lock_duration_millis": args.lock_duration_millis,
+                            "engine_latency_millis": args.engine_latency_millis,
+                            "engine_error_rate": args.engine_error_rate,
+                            "timeout_seconds": args.timeout_seconds,
+                            "seed": args.seed,
+                        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--handler", choices=["cpu", "io", "heavy-tail"], default="io")
+    parser.add_argument("--handler-millis", type=float, default=5, help="(median) handler duration")
+    parser.add_argument("--tasks", type=int, default=500, help="tasks per scenario")
+    parser.add_argument("--max-tasks", type=int, nargs="+", default=[1, 10], help="sync worker maxTasks values")
+    parser.add_argument("--max-concurrent-tasks", type=int, nargs="+", default=[1, 10],
+                        help="async worker maxConcurrentTasks values")
+    parser.add_argument("--payload-bytes", type=int, nargs="+", default=[100], help="size of a task variable")
+    parser.add_argument("--topics", type=int, nargs="+", default=[1], help="number of topics the tasks spread over")
+    parser.add_argument("--shared-http-client", action="store_true",
+                        help="pass one httpx.AsyncClient to the async worker instead of a client per request")
+    parser.add_argument("--lock-duration-millis", type=int, default=300000)
+    parser.add_argument("--engine-latency-millis", type=float, default=0, help="latency added to every REST call")
+    parser.add_argument("--engine-error-rate", type=float, default=0, help="fraction of REST calls failing with 500")
+    parser.add_argument("--timeout-seconds", type=float, default=120, help="per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="append JSON lines results to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for scenario in get_scenarios(args):
+            result = run_scenario(scenario)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            print(f"{result['worker']:>5} maxTasks={result['max_tasks']} "
+                  f"maxConcurrentTasks={result['max_concurrent_tasks']} payload={result['payload_bytes']}B "
+                  f"topics={result['topics']}: {result['tasks_per_second']} tasks/s, "
+                  f"p50={result['latency_p50_millis']}ms p99={result['latency_p99_millis']}ms, "
+                  f"lock expiry rate={result['lock_expiry_rate']}", file=sys.stderr)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import asyncio
+import base64
+import logging
+from http import HTTPStatus
+from typing import Optional
+
+import httpx
+
+from camunda.client.engine_client import EngineClient, ENGINE_LOCAL_BASE_URL
+from camunda.utils.response_utils import raise_exception_if_not_ok
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEngineClient(EngineClient):
+    """
+    asyncio counterpart of EngineClient, safe to use from AsyncExternalTaskWorker handlers.
+    Pass the http_client of an AsyncExternalTaskClient (or any httpx.AsyncClient) to share its connection pool,
+    otherwise a new connection is opened per request.
+    """
+
+    def __init__(self, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(engine_base_url, config=config)
+        self.http_client = http_client
+        self.http_timeout_seconds = self.config.get("httpTimeoutMillis", 30000) / 1000
+
+    async def _request(self, method, url, failover=None, **kwargs):
+        """
+        :param failover: whether the request is safe to retry on another engine node, by default only GET queries are
+        """
+        if failover is None:
+            failover = method == "GET"
+        kwargs.setdefault("headers", self._get_headers())
+        kwargs.setdefault("timeout", self.http_timeout_seconds)
+        return await self.endpoints.call_async(url, lambda routed_url: self._send(method, routed_url, **kwargs),
+                                               failover=failover)
+
+    async def _send(self, method, url, **kwargs):
+        if self.http_client is not None:
+            return await self.http_client.request(method, url, **kwargs)
+        async with httpx.AsyncClient() as client:
+            return await client.request(method, url, **kwargs)
+
+    async def start_process(self, process_key, variables, tenant_id=None, business_key=None):
+        url = self.get_start_process_instance_url(process_key, tenant_id)
+        body = self._get_start_process_body(variables, business_key)
+
+        response = await self._request("POST", url, json=body)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def get_process_instance(self, process_key=None, variables=frozenset([]), tenant_ids=frozenset([])):
+        url = f"{self.engine_base_url}/process-instance"
+        url_params = self._get_process_instance_url_params(process_key, tenant_ids, variables)
+        response = await self._request("GET", url, params=url_params)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def correlate_message(self, message_name, process_instance_id=None, tenant_id=None, business_key=None,
+                                process_variables=None, result_enabled=True, correlate_all=False):
+        url = f"{self.engine_base_url}/message"
+        body = self._get_correlate_message_body(message_name, process_instance_id, tenant_id, business_key,
+                                                process_variables, result_enabled, correlate_all)
+
+        response = await self._request("POST", url, json=body)
+        return self._get_correlate_message_result(response, result_enabled)
+
+    async def correlate_messages(self, messages, max_concurrency=10, result_enabled=False):
+        """
+        Correlates many messages with at most max_concurrency requests in flight.
+        :return: list with one entry per message in the same order: the result of correlate_message()
+            or the exception raised while correlating that message
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def correlate(message):
+            message = {"result_enabled": result_enabled, **message}
+            async with semaphore:
+                try:
+                    return await self.correlate_message(**message)
+                except Exception as e:
+                    logger.warning("failed to correlate message: %s: %s", message.get('message_name'), e)
+                    return e
+
+        return list(await asyncio.gather(*(correlate(message) for message in messages)))
+
+    async def get_jobs(self,
+                       offset: int,
+                       limit: int,
+                       tenant_ids=None,
+                       with_failure=None,
+                       process_instance_id=None,
+                       task_name=None,
+                       sort_by="jobDueDate",
+                       sort_order="desc"):
+        url = f"{self.engine_base_url}/job"
+        params = self._get_jobs_url_params(offset, limit, tenant_ids, with_failure, process_instance_id,
+                                           task_name, sort_by, sort_order)
+        response = await self._request("GET", url, params=params)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def set_job_retry(self, job_id, retries=1):
+        url = f"{self.engine_base_url}/job/{job_id}/retries"
+        body = {"retries": retries}
+
+        response = await self._request("PUT", url, json=body)
+        raise_exception_if_not_ok(response)
+        return response.status_code == HTTPStatus.NO_CONTENT
+
+    async def set_jobs_retries_async(self, retries, job_ids=None, tenant_ids=None, with_failure=None,
+                                     process_instance_id=None, task_name=None, due_date=None):
+        url = f"{self.engine_base_url}/job/retries"
+        body = self._get_jobs_retries_body(retries, job_ids, tenant_ids, with_failure, process_instance_id,
+                                           task_name, due_date)
+
+        response = await self._request("POST", url, json=body)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def get_batch(self, batch_id):
+        url = f"{self.engine_base_url}/batch/{batch_id}"
+        response = await self._request("GET", url)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def get_process_instance_variable(self, process_instance_id, variable_name, with_meta=False):
+        url = f"{self.engine_base_url}/process-instance/{process_instance_id}/variables/{variable_name}"
+        response = await self._request("GET", url)
+        raise_exception_if_not_ok(response)
+        resp_json = response.json()
+
+        response = await self._request("GET", f"{url}/data")
+        raise_exception_if_not_ok(response)
+
+        decoded_value = base64.encodebytes(response.content).decode("utf-8")
+
+        if with_meta:
+            return dict(resp_json, value=decoded_value)
+        return decoded_value
+
+    async def get_process_instances_variable(self, process_instance_ids, variable_name, with_meta=False,
+                                             deserialize_values=False, fetch_binary=False, page_size=1000):
+        result = {}
+        async for variable in self.iter_variable_instances(process_instance_ids, variable_name,
+                                                           deserialize_values, fetch_binary, page_size):
+            result[variable["processInstanceId"]] = variable if with_meta else variable["value"]
+        return result
+
+    async def iter_variable_instances(self, process_instance_ids, variable_name=None, deserialize_values=False,
+                                      fetch_binary=False, page_size=1000):
+        url = f"{self.engine_base_url}/variable-instance"
+        body = self._get_variable_instance_query(process_instance_ids, variable_name)
+        if not body["processInstanceIdIn"]:
+            return
+
+        offset = 0
+        while True:
+            params = self._get_variable_instance_query_params(offset, page_size, deserialize_values)
+            # a query despite the POST, so safe to retry on another engine node
+            response = await self._request("POST", url, failover=True, params=params, json=body)
+            raise_exception_if_not_ok(response)
+            variables = response.json()
+            for variable in variables:
+                if fetch_binary and variable.get("type") in ("Bytes", "File"):
+                    variable["value"] = await self.get_variable_instance_data(variable["id"])
+                yield variable
+
+            if len(variables) < page_size:
+                return
+            offset += page_size
+
+    async def get_variable_instance_data(self, variable_instance_id):
+        url = f"{self.engine_base_url}/variable-instance/{variable_instance_id}/data"
+        response = await self._request("GET", url)
+        raise_exception_if_not_ok(response)
+        return base64.encodebytes(response.content).decode("utf-8")
@@ -1,10 +1,13 @@
 import logging
 from http import HTTPStatus
+from typing import Optional
 
 import httpx
 
+from camunda.client.endpoints import get_engine_endpoints
 from camunda.client.engine_client import ENGINE_LOCAL_BASE_URL
-from camunda.utils.log_utils import log_with_context
+from camunda.client.external_task_client import get_fetch_filters
+from camunda.utils.log_utils import log_with_context, LazyLogArg
 from camunda.utils.response_utils import raise_exception_if_not_ok
 from camunda.utils.utils import str_to_list
 from camunda.utils.auth_basic import AuthBasic, obfuscate_password
@@ -17,71 +20,113 @@ logger = logging.getLogger(__name__)
 class AsyncExternalTaskClient:
     default_config = {
         "maxConcurrentTasks": 10,  # Number of concurrent tasks you can process
+        "prefetchTasks": 0,  # Number of tasks fetched ahead of free slots, queued locally by priority
+        "orderByLockDeadline": False,  # run queued tasks of equal priority closest to their lock expiry first
+        "syncHandlerPool": "thread",  # "thread" or "process": pool running synchronous (non async) handlers
+        "syncHandlerPoolSize": None,  # defaults to maxConcurrentTasks threads or one process per CPU
         "lockDuration": 300000,  # in milliseconds
         "asyncResponseTimeout": 30000,
         "retries": 3,
         "retryTimeout": 300000,
+        "retryBackoff": "fixed",  # or "exponential": retryTimeout * retryBackoffFactor ** previous failures
+        "retryBackoffFactor": 2,
+        "retryTimeoutMax": None,  # caps the retry timeout in milliseconds
+        "retryJitter": "none",  # "full" or "equal": randomizes retry timeouts, see RetryBackoff
+        "handlerTimeoutSeconds": None,  # None: the remaining lock time minus the margin, 0: no handler timeout
+        "handlerTimeoutMarginSeconds": 5,  # left of the lock when a handler times out, at most half of lockDuration
+        "handlerTimeoutPolicy": "failure",  # "failure" or "unlock": how a task whose handler timed out is reported
         "httpTimeoutMillis": 30000,
         "timeoutDeltaMillis": 5000,
         "includeExtensionProperties": True,  # enables Camunda Extension Properties
         "deserializeValues": True,  # deserialize values when fetch a task by default
         "usePriority": False,
-        "sorting": None
+        "sorting": None,
+        "loadBalancing": "least-outstanding",  # or "round-robin": spreads requests over several engine base URLs
+        "endpointMaxFailures": 3,  # consecutive errors after which an engine base URL is ejected
+        "endpointEjectSeconds": 30,  # an ejected engine base URL is re-probed after this time
     }
 
-    def __init__(self, worker_id, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None):
+    def __init__(self, worker_id, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None,
+                 http_client: Optional[httpx.AsyncClient] = None):
         config = config if config is not None else {}
         self.worker_id = worker_id
-        self.external_task_base_url = engine_base_url + "/external-task"
+        # optional shared httpx.AsyncClient, e.g. to pool connections with an AsyncEngineClient
+        self.http_client = http_client
         self.config = type(self).default_config.copy()
         self.config.update(config)
+        # engine_base_url may list several engine nodes, requests are spread over them
+        self.endpoints = get_engine_endpoints(engine_base_url, self.config)
+        self.external_task_base_url = self.endpoints.primary_base_url + "/external-task"
         self.is_debug = config.get('isDebug', False)
         self.http_timeout_seconds = self.config.get('httpTimeoutMillis') / 1000
-        self._log_with_context(f"Created External Task client with config: {obfuscate_password(self.config)}")
+        self._log_with_context("Created External Task client with config: %s",
+                               LazyLogArg(obfuscate_password, self.config))
+
+    async def _post(self, url, failover=False, **kwargs):
+        return await self.endpoints.call_async(url, lambda routed_url: self._send_post(routed_url, **kwargs),
+                                               failover=failover)
+
+    async def _send_post(self, url, **kwargs):
+        if self.http_client is not None:
+            return await self.http_client.post(url, **kwargs)
+        async with httpx.AsyncClient() as client:
+            return await client.post(url, **kwargs)
 
     def get_fetch_and_lock_url(self):
         return f"{self.external_task_base_url}/fetchAndLock"
 
-    async def fetch_and_lock(self, topic_names, process_variables=None, variables=None):
+    async def fetch_and_lock(self, topic_names, process_variables=None, variables=None, max_tasks=1,
+                             async_response_timeout=None, topic_options=None):
+        """
+        :param async_response_timeout: long polling timeout in milliseconds overriding asyncResponseTimeout
+        :param topic_options: optional per topic settings, e.g. {"topicA": {"tenantIdIn": ["tenant1"]}}: the fetch
+            filters in FETCH_FILTERS, lockDuration and includeExtensionProperties override the config for the topic
+        """
         url = self.get_fetch_and_lock_url()
+        if async_response_timeout is None:
+            async_response_timeout = self.config["asyncResponseTimeout"]
         body = {
             "workerId": str(self.worker_id),  # convert to string to make it JSON serializable
-            "maxTasks": 1,
-            "topics": self._get_topics(topic_names, process_variables, variables),
-            "asyncResponseTimeout": self.config["asyncResponseTimeout"],
+            "maxTasks": max_tasks,
+            "topics": self._get_topics(topic_names, process_variables, variables, topic_options),
+            "asyncResponseTimeout": async_response_timeout,
             "usePriority": self.config["usePriority"],
             "sorting": self.config["sorting"]
         }
 
         if self.is_debug:
-            self._log_with_context(f"Trying to fetch and lock with request payload: {body}")
-        http_timeout_seconds = self.__get_fetch_and_lock_http_timeout_seconds()
+            self._log_with_context("Trying to fetch and lock with request payload: %s", body)
+        http_timeout_seconds = self.__get_fetch_and_lock_http_timeout_seconds(async_response_timeout)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self._get_headers(), json=body, timeout=http_timeout_seconds)
+        # fetching is safe to retry on another node, unacknowledged locks expire
+        response = await self._post(url, failover=True, headers=self._get_headers(), json=body,
+                                    timeout=http_timeout_seconds)
         raise_exception_if_not_ok(response)
 
         resp_json = response.json()
         if self.is_debug:
-            self._log_with_context(f"Fetch and lock response JSON: {resp_json} for request: {body}")
+            self._log_with_context("Fetch and lock response JSON: %s for request: %s", resp_json, body)
         return resp_json
 
-    def __get_fetch_and_lock_http_timeout_seconds(self):
+    def __get_fetch_and_lock_http_timeout_seconds(self, async_response_timeout):
         # Use HTTP timeout slightly more than async response / long polling timeout
-        return (self.config["timeoutDeltaMillis"] + self.config["asyncResponseTimeout"]) / 1000
+        return (self.config["timeoutDeltaMillis"] + async_response_timeout) / 1000
 
-    def _get_topics(self, topic_names, process_variables, variables):
+    def _get_topics(self, topic_names, process_variables, variables, topic_options=None):
         topics = []
         for topic in str_to_list(topic_names):
-            topics.append({
+            topic_config = {**self.config, **(topic_options or {}).get(topic, {})}
+            topic_body = {
                 "topicName": topic,
-                "lockDuration": self.config["lockDuration"],
+                "lockDuration": topic_config["lockDuration"],
                 "processVariables": process_variables if process_variables else {},
                 # Enables Camunda Extension Properties
-                "includeExtensionProperties": self.config.get("includeExtensionProperties") or False,
+                "includeExtensionProperties": topic_config.get("includeExtensionProperties") or False,
                 "deserializeValues": self.config["deserializeValues"],
                 "variables": variables
-            })
+            }
+            topic_body.update(get_fetch_filters(topic_config))
+            topics.append(topic_body)
         return topics
 
     async def complete(self, task_id, global_variables, local_variables=None):
@@ -93,8 +138,7 @@ class AsyncExternalTaskClient:
             "localVariables": Variables.format(local_variables)
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        response = await self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
         raise_exception_if_not_ok(response)
         return response.status_code == HTTPStatus.NO_CONTENT
 
@@ -103,7 +147,7 @@ class AsyncExternalTaskClient:
 
     async def failure(self, task_id, error_message, error_details, retries, retry_timeout):
         url = self.get_task_failure_url(task_id)
-        logger.info(f"Setting retries to: {retries} for task: {task_id}")
+        logger.info("Setting retries to: %s for task: %s", retries, task_id)
         body = {
             "workerId": self.worker_id,
             "errorMessage": error_message,
@@ -113,8 +157,7 @@ class AsyncExternalTaskClient:
         if error_details:
             body["errorDetails"] = error_details
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        response = await self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
         raise_exception_if_not_ok(response)
         return response.status_code == HTTPStatus.NO_CONTENT
 
@@ -132,16 +175,42 @@ class AsyncExternalTaskClient:
         }
 
         if self.is_debug:
-            self._log_with_context(f"Trying to report BPMN error with request payload: {body}")
+            self._log_with_context("Trying to report BPMN error with request payload: %s", body)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        response = await self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
         response.raise_for_status()
         return response.status_code == HTTPStatus.NO_CONTENT
 
     def get_task_bpmn_error_url(self, task_id):
         return f"{self.external_task_base_url}/{task_id}/bpmnError"
 
+    async def extend_lock(self, task_id, new_duration):
+        """
+        :param new_duration: new lock duration in milliseconds, counted from now
+        """
+        url = self.get_task_extend_lock_url(task_id)
+        body = {
+            "workerId": self.worker_id,
+            "newDuration": new_duration,
+        }
+
+        response = await self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        raise_exception_if_not_ok(response)
+        return response.status_code == HTTPStatus.NO_CONTENT
+
+    def get_task_extend_lock_url(self, task_id):
+        return f"{self.external_task_base_url}/{task_id}/extendLock"
+
+    async def unlock(self, task_id):
+        url = self.get_task_unlock_url(task_id)
+
+        response = await self._post(url, headers=self._get_headers(), timeout=self.http_timeout_seconds)
+        raise_exception_if_not_ok(response)
+        return response.status_code == HTTPStatus.NO_CONTENT
+
+    def get_task_unlock_url(self, task_id):
+        return f"{self.external_task_base_url}/{task_id}/unlock"
+
     @property
     def auth_basic(self) -> dict:
         if not self.config.get("auth_basic") or not isinstance(self.config.get("auth_basic"), dict):
@@ -166,6 +235,6 @@ class AsyncExternalTaskClient:
             headers.update(self.auth_bearer)
         return headers
 
-    def _log_with_context(self, msg, log_level='info', **kwargs):
+    def _log_with_context(self, msg, *args, log_level='info', **kwargs):
         context = {"WORKER_ID": self.worker_id}
-        log_with_context(msg, context=context, log_level=log_level, **kwargs)
+        log_with_context(msg, context=context, log_level=log_level, args=args, **kwargs)
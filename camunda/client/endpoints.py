@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+
+import httpx
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from camunda.utils.utils import str_to_list
+
+logger = logging.getLogger(__name__)
+
+LOAD_BALANCING_STRATEGIES = ("least-outstanding", "round-robin")
+# responses of a node that is down or overloaded, other 5xx are errors of the request that any node would return
+NODE_FAILURE_STATUS_CODES = (502, 503, 504)
+
+
+class _Endpoint:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.outstanding = 0
+        self.failures = 0  # consecutive
+        self.ejected_until = None
+        self.probing = False
+
+
+class EngineEndpoints:
+    """
+    Spreads the requests of clients over the base URLs of several engine nodes sharing one database:
+
+        client = ExternalTaskClient("1", ["http://node1:8080/engine-rest", "http://node2:8080/engine-rest"])
+
+    Each request goes to the node with the fewest requests in flight (strategy "least-outstanding", so a slow
+    node gets fewer of them) or to the next node in turn ("round-robin"). A node is ejected after max_failures
+    consecutive failures (transport errors or 502, 503 and 504 responses) and re-probed with a single request
+    after eject_seconds; if the probe fails it stays ejected for another eject_seconds. When all nodes are ejected
+    the one ejected first is used anyway. Requests that could not connect to a node are retried on the other
+    nodes; with failover, meant for idempotent calls, any request failing in one of these ways is.
+
+    URLs are built on primary_base_url, the first one, and routed to the selected node. Pass the same instance as
+    engine_base_url of several clients to share the node health between them.
+    """
+
+    def __init__(self, base_urls, strategy="least-outstanding", max_failures=3, eject_seconds=30,
+                 clock=time.monotonic):
+        base_urls = list(str_to_list(base_urls))
+        if not base_urls:
+            raise ValueError("at least one engine base URL is required")
+        if strategy not in LOAD_BALANCING_STRATEGIES:
+            raise ValueError(f"loadBalancing must be one of {LOAD_BALANCING_STRATEGIES}, got {strategy!r}")
+        if max_failures < 1:
+            raise ValueError(f"max_failures must be at least 1, got {max_failures}")
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.clock = clock
+        self._endpoints = [_Endpoint(base_url) for base_url in base_urls]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def primary_base_url(self):
+        return self._endpoints[0].base_url
+
+    def get_base_urls(self):
+        return [endpoint.base_url for endpoint in self._endpoints]
+
+    def get_ejected_base_urls(self):
+        with self._lock:
+            return [endpoint.base_url for endpoint in self._endpoints if endpoint.ejected_until is not None]
+
+    def call(self, url, send, failover=False):
+        """
+        :param send: sends the request to the routed url and returns the response
+        """
+        tried = []
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                response = send(self._route(url, endpoint))
+            except BaseException as e:
+                self._release(endpoint, ok=False if is_transport_error(e) else None)
+                if not self._should_fail_over(e, failover, tried, endpoint):
+                    raise
+                continue
+            ok = self._is_ok(response)
+            self._release(endpoint, ok)
+            if ok or not self._should_fail_over(None, failover, tried, endpoint):
+                return response
+
+    async def call_async(self, url, send, failover=False):
+        """
+        :param send: coroutine function sending the request to the routed url and returning the response
+        """
+        tried = []
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                response = await send(self._route(url, endpoint))
+            except BaseException as e:  # on a cancellation the node is neither healthy nor broken
+                self._release(endpoint, ok=False if is_transport_error(e) else None)
+                if not self._should_fail_over(e, failover, tried, endpoint):
+                    raise
+                continue
+            ok = self._is_ok(response)
+            self._release(endpoint, ok)
+            if ok or not self._should_fail_over(None, failover, tried, endpoint):
+                return response
+
+    def _acquire(self, exclude):
+        with self._lock:
+            now = self.clock()
+            candidates = [endpoint for endpoint in self._endpoints if endpoint not in exclude] or self._endpoints
+            endpoint = self._get_probe(candidates, now) or self._select(candidates)
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _get_probe(self, candidates, now):
+        for endpoint in candidates:
+            if endpoint.ejected_until is not None and endpoint.ejected_until <= now and not endpoint.probing:
+                endpoint.probing = True
+                logger.info("re-probing engine endpoint %s", endpoint.base_url)
+                return endpoint
+        return None
+
+    def _select(self, candidates):
+        healthy = [endpoint for endpoint in candidates if endpoint.ejected_until is None]
+        if not healthy:
+            return min(candidates, key=lambda endpoint: endpoint.ejected_until)
+        # rotate, so least-outstanding spreads ties evenly too
+        start = self._next % len(healthy)
+        self._next += 1
+        rotated = healthy[start:] + healthy[:start]
+        if self.strategy == "round-robin":
+            return rotated[0]
+        return min(rotated, key=lambda endpoint: endpoint.outstanding)
+
+    def _release(self, endpoint, ok):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok is None:
+                endpoint.probing = False
+            elif ok:
+                if endpoint.ejected_until is not None:
+                    logger.info("engine endpoint %s is back", endpoint.base_url)
+                endpoint.failures = 0
+                endpoint.ejected_until = None
+                endpoint.probing = False
+            else:
+                endpoint.failures += 1
+                if len(self._endpoints) > 1 and (endpoint.probing or endpoint.failures >= self.max_failures):
+                    if endpoint.ejected_until is None:
+                        logger.warning("ejecting engine endpoint %s after %s consecutive errors for %s seconds",
+                                       endpoint.base_url, endpoint.failures, self.eject_seconds)
+                    endpoint.ejected_until = self.clock() + self.eject_seconds
+                    endpoint.probing = False
+
+    def _should_fail_over(self, error, failover, tried, endpoint):
+        if not (failover and (error is None or is_transport_error(error)) or is_connect_error(error)):
+            return False
+        tried.append(endpoint)
+        if len(tried) >= len(self._endpoints):
+            return False
+        logger.warning("request to engine endpoint %s failed%s, failing over", endpoint.base_url,
+                       f": {error}" if error is not None else "")
+        return True
+
+    def _route(self, url, endpoint):
+        primary_base_url = self.primary_base_url
+        if endpoint.base_url == primary_base_url or not url.startswith(primary_base_url):
+            return url
+        return endpoint.base_url + url[len(primary_base_url):]
+
+    @staticmethod
+    def _is_ok(response):
+        return getattr(response, "status_code", None) not in NODE_FAILURE_STATUS_CODES
+
+
+def is_connect_error(error) -> bool:
+    """
+    :return: True if error means the request never reached the engine, so any request can be sent again
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, requests.exceptions.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def is_transport_error(error) -> bool:
+    """
+    :return: True if error means the node couldn't be reached or didn't answer, as opposed to e.g. a bug of the caller
+    """
+    return isinstance(error, (httpx.TransportError, requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def get_engine_endpoints(engine_base_url, config) -> EngineEndpoints:
+    """
+    :param engine_base_url: a base URL, a list of them or an EngineEndpoints instance, which is returned as is
+    """
+    if isinstance(engine_base_url, EngineEndpoints):
+        return engine_base_url
+    return EngineEndpoints(engine_base_url, strategy=config.get("loadBalancing", "least-outstanding"),
+                           max_failures=config.get("endpointMaxFailures", 3),
+                           eject_seconds=config.get("endpointEjectSeconds", 30))
@@ -1,9 +1,12 @@
 import base64
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from camunda.client.endpoints import get_engine_endpoints
 from camunda.utils.response_utils import raise_exception_if_not_ok
 from camunda.utils.utils import join
 from camunda.utils.auth_basic import AuthBasic
@@ -20,7 +23,9 @@ class EngineClient:
     def __init__(self, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None):
         config = config if config is not None else {}
         self.config = config.copy()
-        self.engine_base_url = engine_base_url
+        # engine_base_url may list several engine nodes, requests are spread over them, see EngineEndpoints
+        self.endpoints = get_engine_endpoints(engine_base_url, self.config)
+        self.engine_base_url = self.endpoints.primary_base_url
 
     def get_start_process_instance_url(self, process_key, tenant_id=None):
         if tenant_id:
@@ -37,25 +42,30 @@ class EngineClient:
         :return: response json
         """
         url = self.get_start_process_instance_url(process_key, tenant_id)
+        body = self._get_start_process_body(variables, business_key)
+
+        response = self._request("post", url, headers=self._get_headers(), json=body)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    @staticmethod
+    def _get_start_process_body(variables, business_key=None):
         body = {
             "variables": Variables.format(variables)
         }
         if business_key:
             body["businessKey"] = business_key
-
-        response = requests.post(url, headers=self._get_headers(), json=body)
-        raise_exception_if_not_ok(response)
-        return response.json()
+        return body
 
     def get_process_instance(self, process_key=None, variables=frozenset([]), tenant_ids=frozenset([])):
         url = f"{self.engine_base_url}/process-instance"
-        url_params = self.__get_process_instance_url_params(process_key, tenant_ids, variables)
-        response = requests.get(url, headers=self._get_headers(), params=url_params)
+        url_params = self._get_process_instance_url_params(process_key, tenant_ids, variables)
+        response = self._request("get", url, headers=self._get_headers(), params=url_params)
         raise_exception_if_not_ok(response)
         return response.json()
 
     @staticmethod
-    def __get_process_instance_url_params(process_key, tenant_ids, variables):
+    def _get_process_instance_url_params(process_key, tenant_ids, variables):
         url_params = {}
         if process_key:
             url_params["processDefinitionKey"] = process_key
@@ -67,6 +77,15 @@ class EngineClient:
             url_params["tenantIdIn"] = tenant_ids_filter
         return url_params
 
+    def _request(self, method, url, failover=None, **kwargs):
+        """
+        :param failover: whether the request is safe to retry on another engine node, by default only GET queries are
+        """
+        if failover is None:
+            failover = method == "get"
+        return self.endpoints.call(url, lambda routed_url: getattr(requests, method)(routed_url, **kwargs),
+                                   failover=failover)
+
     @property
     def auth_basic(self) -> dict:
         if not self.config.get("auth_basic") or not isinstance(self.config.get("auth_basic"), dict):
@@ -92,7 +111,7 @@ class EngineClient:
         return headers
 
     def correlate_message(self, message_name, process_instance_id=None, tenant_id=None, business_key=None,
-                          process_variables=None):
+                          process_variables=None, result_enabled=True, correlate_all=False):
         """
         Correlates a message to the process engine to either trigger a message start event or
         an intermediate message catching event.
@@ -101,12 +120,56 @@ class EngineClient:
         :param tenant_id:
         :param business_key:
         :param process_variables:
-        :return: response json
+        :param result_enabled: if False the engine doesn't serialize the correlation result
+        :param correlate_all: correlate the message to all matching executions and start events
+        :return: response json, or True if result_enabled is False
+        """
+        url = f"{self.engine_base_url}/message"
+        body = self._get_correlate_message_body(message_name, process_instance_id, tenant_id, business_key,
+                                                process_variables, result_enabled, correlate_all)
+
+        response = self._request("post", url, headers=self._get_headers(), json=body)
+        return self._get_correlate_message_result(response, result_enabled)
+
+    def correlate_messages(self, messages, max_concurrency=10, result_enabled=False):
+        """
+        Correlates many messages concurrently, reusing a pool of at most max_concurrency HTTP connections.
+        :param messages: list of dicts with the keyword arguments of correlate_message(), e.g.
+            [{"message_name": "CANCEL_MESSAGE", "business_key": "123456"}, ...]
+        :param max_concurrency: maximum number of correlations in flight
+        :param result_enabled: default for messages not setting result_enabled themselves
+        :return: list with one entry per message in the same order: the result of correlate_message()
+            or the exception raised while correlating that message
         """
         url = f"{self.engine_base_url}/message"
+        headers = self._get_headers()
+
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            def correlate(message):
+                message = {"result_enabled": result_enabled, **message}
+                try:
+                    body = self._get_correlate_message_body(**message)
+                    response = self.endpoints.call(
+                        url, lambda routed_url: session.post(routed_url, headers=headers, json=body))
+                    return self._get_correlate_message_result(response, message["result_enabled"])
+                except Exception as e:
+                    logger.warning("failed to correlate message: %s: %s", message.get('message_name'), e)
+                    return e
+
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                return list(executor.map(correlate, messages))
+
+    @staticmethod
+    def _get_correlate_message_body(message_name, process_instance_id=None, tenant_id=None, business_key=None,
+                                    process_variables=None, result_enabled=True, correlate_all=False):
         body = {
             "messageName": message_name,
-            "resultEnabled": True,
+            "resultEnabled": result_enabled,
+            "all": True if correlate_all else None,
             "processVariables": Variables.format(process_variables) if process_variables else None,
             "processInstanceId": process_instance_id,
             "tenantId": tenant_id,
@@ -118,11 +181,14 @@ class EngineClient:
             body.pop("tenantId")
             body.pop("withoutTenantId")
 
-        body = {k: v for k, v in body.items() if v is not None}
+        return {k: v for k, v in body.items() if v is not None}
 
-        response = requests.post(url, headers=self._get_headers(), json=body)
+    @staticmethod
+    def _get_correlate_message_result(response, result_enabled):
         raise_exception_if_not_ok(response)
-        return response.json()
+        if result_enabled:
+            return response.json()
+        return response.status_code == HTTPStatus.NO_CONTENT
 
     def get_jobs(self,
                  offset: int,
@@ -137,6 +203,15 @@ class EngineClient:
         # sort_order can be "asc" or "desc
 
         url = f"{self.engine_base_url}/job"
+        params = self._get_jobs_url_params(offset, limit, tenant_ids, with_failure, process_instance_id,
+                                           task_name, sort_by, sort_order)
+        response = self._request("get", url, params=params, headers=self._get_headers())
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    @staticmethod
+    def _get_jobs_url_params(offset, limit, tenant_ids, with_failure, process_instance_id, task_name,
+                             sort_by, sort_order):
         params = {
             "firstResult": offset,
             "maxResults": limit,
@@ -151,26 +226,81 @@ class EngineClient:
             params["withException"] = "true"
         if tenant_ids:
             params["tenantIdIn"] = ','.join(tenant_ids)
-        response = requests.get(url, params=params, headers=self._get_headers())
-        raise_exception_if_not_ok(response)
-        return response.json()
+        return params
 
     def set_job_retry(self, job_id, retries=1):
         url = f"{self.engine_base_url}/job/{job_id}/retries"
         body = {"retries": retries}
 
-        response = requests.put(url, headers=self._get_headers(), json=body)
+        response = self._request("put", url, headers=self._get_headers(), json=body)
         raise_exception_if_not_ok(response)
         return response.status_code == HTTPStatus.NO_CONTENT
 
+    def set_jobs_retries_async(self, retries, job_ids=None, tenant_ids=None, with_failure=None,
+                               process_instance_id=None, task_name=None, due_date=None):
+        """
+        Sets the retries of many jobs with one request. The engine creates a batch and does the fan-out itself.
+        Jobs are selected by job_ids and/or a job query built from the same filters as get_jobs().
+        :param retries: Mandatory - new number of retries
+        :param job_ids: Optional - list of job ids
+        :param tenant_ids: Optional
+        :param with_failure: Optional - only jobs with an exception
+        :param process_instance_id: Optional
+        :param task_name: Optional - failed activity id
+        :param due_date: Optional - new due date of the jobs e.g. "2024-01-31T10:00:00.000+0000"
+        :return: response json of the created batch
+        """
+        url = f"{self.engine_base_url}/job/retries"
+        body = self._get_jobs_retries_body(retries, job_ids, tenant_ids, with_failure, process_instance_id,
+                                           task_name, due_date)
+
+        response = self._request("post", url, headers=self._get_headers(), json=body)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    @classmethod
+    def _get_jobs_retries_body(cls, retries, job_ids, tenant_ids, with_failure, process_instance_id, task_name,
+                               due_date):
+        job_query = cls._get_job_query(tenant_ids, with_failure, process_instance_id, task_name)
+        if not job_ids and not job_query:
+            # an empty job query matches every job of the engine
+            raise ValueError("either job_ids or at least one job query filter is required to set job retries")
+
+        body = {
+            "retries": retries,
+            "jobIds": list(job_ids) if job_ids else None,
+            "jobQuery": job_query if job_query else None,
+            "dueDate": due_date,
+        }
+        return {k: v for k, v in body.items() if v is not None}
+
+    @staticmethod
+    def _get_job_query(tenant_ids, with_failure, process_instance_id, task_name):
+        job_query = {}
+        if process_instance_id:
+            job_query["processInstanceId"] = process_instance_id
+        if task_name:
+            job_query["failedActivityId"] = task_name
+        if with_failure:
+            job_query["withException"] = True
+        if tenant_ids:
+            job_query["tenantIdIn"] = list(tenant_ids)
+        return job_query
+
+    def get_batch(self, batch_id):
+        url = f"{self.engine_base_url}/batch/{batch_id}"
+        response = self._request("get", url, headers=self._get_headers())
+        raise_exception_if_not_ok(response)
+        return response.json()
+
     def get_process_instance_variable(self, process_instance_id, variable_name, with_meta=False):
         url = f"{self.engine_base_url}/process-instance/{process_instance_id}/variables/{variable_name}"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._request("get", url, headers=self._get_headers())
         raise_exception_if_not_ok(response)
         resp_json = response.json()
 
         url_with_data = f"{url}/data"
-        response = requests.get(url_with_data, headers=self._get_headers())
+        response = self._request("get", url_with_data, headers=self._get_headers())
         raise_exception_if_not_ok(response)
 
         decoded_value = base64.encodebytes(response.content).decode("utf-8")
@@ -178,3 +308,77 @@ class EngineClient:
         if with_meta:
             return dict(resp_json, value=decoded_value)
         return decoded_value
+
+    def get_process_instances_variable(self, process_instance_ids, variable_name, with_meta=False,
+                                       deserialize_values=False, fetch_binary=False, page_size=1000):
+        """
+        Fetches one variable of many process instances with the variable instance query, instead of
+        two requests per process instance with get_process_instance_variable().
+        :param process_instance_ids: Mandatory
+        :param variable_name: Mandatory
+        :param with_meta: return the variable instance json instead of only its value
+        :param deserialize_values: let the engine deserialize object values, by default their serialized
+            form is returned and can be deserialized by the caller only when needed
+        :param fetch_binary: fetch the content of Bytes and File variables (base64 encoded), otherwise their value is None
+        :param page_size: number of variable instances fetched per request
+        :return: dict of process instance id -> variable value (or json if with_meta), process instances
+            without the variable are left out
+        """
+        result = {}
+        for variable in self.iter_variable_instances(process_instance_ids, variable_name,
+                                                     deserialize_values, fetch_binary, page_size):
+            result[variable["processInstanceId"]] = variable if with_meta else variable["value"]
+        return result
+
+    def iter_variable_instances(self, process_instance_ids, variable_name=None, deserialize_values=False,
+                                fetch_binary=False, page_size=1000):
+        """
+        Lazily pages through the variable instances of the given process instances,
+        one request per page of page_size variable instances.
+        """
+        url = f"{self.engine_base_url}/variable-instance"
+        body = self._get_variable_instance_query(process_instance_ids, variable_name)
+        if not body["processInstanceIdIn"]:
+            return
+
+        offset = 0
+        while True:
+            params = self._get_variable_instance_query_params(offset, page_size, deserialize_values)
+            # a query despite the POST, so safe to retry on another engine node
+            response = self._request("post", url, failover=True, headers=self._get_headers(), params=params, json=body)
+            raise_exception_if_not_ok(response)
+            variables = response.json()
+            for variable in variables:
+                if fetch_binary and variable.get("type") in ("Bytes", "File"):
+                    variable["value"] = self.get_variable_instance_data(variable["id"])
+                yield variable
+
+            if len(variables) < page_size:
+                return
+            offset += page_size
+
+    @staticmethod
+    def _get_variable_instance_query(process_instance_ids, variable_name):
+        # only variables of the process instances themselves, not same-named locals of their activities. No sorting:
+        # the engine then orders by the unique id, keeping the pages stable
+        process_instance_ids = list(process_instance_ids)
+        body = {
+            "processInstanceIdIn": process_instance_ids,
+            "variableScopeIdIn": process_instance_ids,
+            "variableName": variable_name,
+        }
+        return {k: v for k, v in body.items() if v is not None}
+
+    @staticmethod
+    def _get_variable_instance_query_params(offset, page_size, deserialize_values):
+        return {
+            "firstResult": offset,
+            "maxResults": page_size,
+            "deserializeValues": "true" if deserialize_values else "false",
+        }
+
+    def get_variable_instance_data(self, variable_instance_id):
+        url = f"{self.engine_base_url}/variable-instance/{variable_instance_id}/data"
+        response = self._request("get", url, headers=self._get_headers())
+        raise_exception_if_not_ok(response)
+        return base64.encodebytes(response.content).decode("utf-8")
@@ -3,8 +3,9 @@ from http import HTTPStatus
 
 import requests
 
+from camunda.client.endpoints import get_engine_endpoints
 from camunda.client.engine_client import ENGINE_LOCAL_BASE_URL
-from camunda.utils.log_utils import log_with_context
+from camunda.utils.log_utils import log_with_context, LazyLogArg
 from camunda.utils.response_utils import raise_exception_if_not_ok
 from camunda.utils.utils import str_to_list
 from camunda.utils.auth_basic import AuthBasic, obfuscate_password
@@ -13,6 +14,19 @@ from camunda.variables.variables import Variables
 
 logger = logging.getLogger(__name__)
 
+# options of fetchAndLock topics narrowing down the fetched tasks, set in the config for every topic or per topic
+FETCH_FILTERS = (
+    "businessKey",
+    "processDefinitionId",
+    "processDefinitionIdIn",
+    "processDefinitionKey",
+    "processDefinitionKeyIn",
+    "processDefinitionVersionTag",
+    "tenantIdIn",
+    "withoutTenantId",
+    "localVariables",
+)
+
 
 class ExternalTaskClient:
     default_config = {
@@ -21,65 +35,91 @@ class ExternalTaskClient:
         "asyncResponseTimeout": 30000,
         "retries": 3,
         "retryTimeout": 300000,
+        "retryBackoff": "fixed",  # or "exponential": retryTimeout * retryBackoffFactor ** previous failures
+        "retryBackoffFactor": 2,
+        "retryTimeoutMax": None,  # caps the retry timeout in milliseconds
+        "retryJitter": "none",  # "full" or "equal": randomizes retry timeouts, see RetryBackoff
+        "handlerTimeoutSeconds": None,  # None or 0: no timeout, else bound by the remaining lock time minus the margin
+        "handlerTimeoutMarginSeconds": 5,  # left of the lock when a handler times out, at most half of lockDuration
+        "handlerTimeoutPolicy": "failure",  # "failure" or "unlock": how a task whose handler timed out is reported
         "httpTimeoutMillis": 30000,
         "timeoutDeltaMillis": 5000,
         "includeExtensionProperties": True,  # enables Camunda Extension Properties
         "deserializeValues": True,  # deserialize values when fetch a task by default
         "usePriority": False,
-        "sorting": None
+        "sorting": None,
+        "loadBalancing": "least-outstanding",  # or "round-robin": spreads requests over several engine base URLs
+        "endpointMaxFailures": 3,  # consecutive errors after which an engine base URL is ejected
+        "endpointEjectSeconds": 30,  # an ejected engine base URL is re-probed after this time
     }
 
     def __init__(self, worker_id, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None):
         config = config if config is not None else {}
         self.worker_id = worker_id
-        self.external_task_base_url = engine_base_url + "/external-task"
         self.config = type(self).default_config.copy()
         self.config.update(config)
+        # engine_base_url may list several engine nodes, requests are spread over them
+        self.endpoints = get_engine_endpoints(engine_base_url, self.config)
+        self.external_task_base_url = self.endpoints.primary_base_url + "/external-task"
         self.is_debug = config.get('isDebug', False)
         self.http_timeout_seconds = self.config.get('httpTimeoutMillis') / 1000
-        self._log_with_context(f"Created External Task client with config: {obfuscate_password(self.config)}")
+        self._log_with_context("Created External Task client with config: %s",
+                               LazyLogArg(obfuscate_password, self.config))
 
     def get_fetch_and_lock_url(self):
         return f"{self.external_task_base_url}/fetchAndLock"
 
-    def fetch_and_lock(self, topic_names, process_variables=None, variables=None):
+    def fetch_and_lock(self, topic_names, process_variables=None, variables=None, max_tasks=None,
+                       async_response_timeout=None, topic_options=None):
+        """
+        :param max_tasks: overrides maxTasks for this fetch
+        :param async_response_timeout: long polling timeout in milliseconds overriding asyncResponseTimeout
+        :param topic_options: optional per topic settings, e.g. {"topicA": {"tenantIdIn": ["tenant1"]}}: the fetch
+            filters in FETCH_FILTERS, lockDuration and includeExtensionProperties override the config for the topic
+        """
         url = self.get_fetch_and_lock_url()
+        if async_response_timeout is None:
+            async_response_timeout = self.config["asyncResponseTimeout"]
         body = {
             "workerId": str(self.worker_id),  # convert to string to make it JSON serializable
-            "maxTasks": self.config["maxTasks"],
-            "topics": self._get_topics(topic_names, process_variables, variables),
-            "asyncResponseTimeout": self.config["asyncResponseTimeout"],
+            "maxTasks": self.config["maxTasks"] if max_tasks is None else max_tasks,
+            "topics": self._get_topics(topic_names, process_variables, variables, topic_options),
+            "asyncResponseTimeout": async_response_timeout,
             "usePriority": self.config["usePriority"],
             "sorting": self.config["sorting"]
         }
 
         if self.is_debug:
-            self._log_with_context(f"trying to fetch and lock with request payload: {body}")
-        http_timeout_seconds = self.__get_fetch_and_lock_http_timeout_seconds()
-        response = requests.post(url, headers=self._get_headers(), json=body, timeout=http_timeout_seconds)
+            self._log_with_context("trying to fetch and lock with request payload: %s", body)
+        http_timeout_seconds = self.__get_fetch_and_lock_http_timeout_seconds(async_response_timeout)
+        # fetching is safe to retry on another node, unacknowledged locks expire
+        response = self._post(url, failover=True, headers=self._get_headers(), json=body, timeout=http_timeout_seconds)
         raise_exception_if_not_ok(response)
 
         resp_json = response.json()
         if self.is_debug:
-            self._log_with_context(f"fetch and lock response json: {resp_json} for request: {body}")
+            self._log_with_context("fetch and lock response json: %s for request: %s", resp_json, body)
         return response.json()
 
-    def __get_fetch_and_lock_http_timeout_seconds(self):
+    def __get_fetch_and_lock_http_timeout_seconds(self, async_response_timeout):
         # use HTTP timeout slightly more than async Response / long polling timeout
-        return (self.config["timeoutDeltaMillis"] + self.config["asyncResponseTimeout"]) / 1000
+        return (self.config["timeoutDeltaMillis"] + async_response_timeout) / 1000
 
-    def _get_topics(self, topic_names, process_variables, variables):
+    def _get_topics(self, topic_names, process_variables, variables, topic_options=None):
         topics = []
         for topic in str_to_list(topic_names):
-            topics.append({
+            topic_config = {**self.config, **(topic_options or {}).get(topic, {})}
+            topic_body = {
                 "topicName": topic,
-                "lockDuration": self.config["lockDuration"],
+                "lockDuration": topic_config["lockDuration"],
                 "processVariables": process_variables if process_variables else {},
                 # enables Camunda Extension Properties
-                "includeExtensionProperties": self.config.get("includeExtensionProperties") or False,
+                "includeExtensionProperties": topic_config.get("includeExtensionProperties") or False,
                 "deserializeValues": self.config["deserializeValues"],
                 "variables": variables
-            })
+            }
+            topic_body.update(get_fetch_filters(topic_config))
+            topics.append(topic_body)
         return topics
 
     def complete(self, task_id, global_variables, local_variables=None):
@@ -91,7 +131,7 @@ class ExternalTaskClient:
             "localVariables": Variables.format(local_variables)
         }
 
-        response = requests.post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        response = self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
         raise_exception_if_not_ok(response)
         return response.status_code == HTTPStatus.NO_CONTENT
 
@@ -100,7 +140,7 @@ class ExternalTaskClient:
 
     def failure(self, task_id, error_message, error_details, retries, retry_timeout):
         url = self.get_task_failure_url(task_id)
-        logger.info(f"setting retries to: {retries} for task: {task_id}")
+        logger.info("setting retries to: %s for task: %s", retries, task_id)
         body = {
             "workerId": self.worker_id,
             "errorMessage": error_message,
@@ -110,7 +150,7 @@ class ExternalTaskClient:
         if error_details:
             body["errorDetails"] = error_details
 
-        response = requests.post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        response = self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
         raise_exception_if_not_ok(response)
         return response.status_code == HTTPStatus.NO_CONTENT
 
@@ -128,15 +168,45 @@ class ExternalTaskClient:
         }
 
         if self.is_debug:
-            self._log_with_context(f"trying to report bpmn error with request payload: {body}")
+            self._log_with_context("trying to report bpmn error with request payload: %s", body)
 
-        resp = requests.post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        resp = self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
         resp.raise_for_status()
         return resp.status_code == HTTPStatus.NO_CONTENT
 
     def get_task_bpmn_error_url(self, task_id):
         return f"{self.external_task_base_url}/{task_id}/bpmnError"
 
+    def extend_lock(self, task_id, new_duration):
+        """
+        :param new_duration: new lock duration in milliseconds, counted from now
+        """
+        url = self.get_task_extend_lock_url(task_id)
+        body = {
+            "workerId": self.worker_id,
+            "newDuration": new_duration,
+        }
+
+        response = self._post(url, headers=self._get_headers(), json=body, timeout=self.http_timeout_seconds)
+        raise_exception_if_not_ok(response)
+        return response.status_code == HTTPStatus.NO_CONTENT
+
+    def get_task_extend_lock_url(self, task_id):
+        return f"{self.external_task_base_url}/{task_id}/extendLock"
+
+    def unlock(self, task_id):
+        url = self.get_task_unlock_url(task_id)
+
+        response = self._post(url, headers=self._get_headers(), timeout=self.http_timeout_seconds)
+        raise_exception_if_not_ok(response)
+        return response.status_code == HTTPStatus.NO_CONTENT
+
+    def get_task_unlock_url(self, task_id):
+        return f"{self.external_task_base_url}/{task_id}/unlock"
+
+    def _post(self, url, failover=False, **kwargs):
+        return self.endpoints.call(url, lambda routed_url: requests.post(routed_url, **kwargs), failover=failover)
+
     @property
     def auth_basic(self) -> dict:
         if not self.config.get("auth_basic") or not isinstance(self.config.get("auth_basic"), dict):
@@ -161,6 +231,13 @@ class ExternalTaskClient:
             headers.update(self.auth_bearer)
         return headers
 
-    def _log_with_context(self, msg, log_level='info', **kwargs):
+    def _log_with_context(self, msg, *args, log_level='info', **kwargs):
         context = {"WORKER_ID": self.worker_id}
-        log_with_context(msg, context=context, log_level=log_level, **kwargs)
+        log_with_context(msg, context=context, log_level=log_level, args=args, **kwargs)
+
+
+def get_fetch_filters(topic_config):
+    """
+    :return: the fetch filters set in topic_config, see FETCH_FILTERS
+    """
+    return {key: topic_config[key] for key in FETCH_FILTERS if topic_config.get(key) is not None}
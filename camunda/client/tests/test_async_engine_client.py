@@ -0,0 +1,95 @@
+import base64
+import json
+import unittest
+from http import HTTPStatus
+
+import httpx
+
+from camunda.client.async_engine_client import AsyncEngineClient
+from camunda.client.async_external_task_client import AsyncExternalTaskClient
+from camunda.client.engine_client import ENGINE_LOCAL_BASE_URL
+
+
+class AsyncEngineClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.requests = []
+        self.routes = {}
+        self.http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle_request))
+        self.client = AsyncEngineClient(http_client=self.http_client)
+
+    async def asyncTearDown(self):
+        await self.http_client.aclose()
+
+    def handle_request(self, request):
+        self.requests.append(request)
+        return self.routes[(request.method, request.url.path)](request)
+
+    def route(self, method, path, status_code=HTTPStatus.OK, **kwargs):
+        self.routes[(method, f"/engine-rest{path}")] = lambda request: httpx.Response(status_code, **kwargs)
+
+    async def test_start_process_success(self):
+        self.route("POST", "/process-definition/key/PROCESS_KEY/start", json={"id": "process_instance_id"})
+
+        resp = await self.client.start_process("PROCESS_KEY", {"intVar": 1}, business_key="123456")
+
+        self.assertDictEqual({"id": "process_instance_id"}, resp)
+        self.assertDictEqual({"variables": {"intVar": {"value": 1}}, "businessKey": "123456"},
+                             json.loads(self.requests[0].content))
+
+    async def test_start_process_not_found_raises_exception(self):
+        self.route("POST", "/process-definition/key/PROCESS_KEY/start", status_code=HTTPStatus.NOT_FOUND,
+                   json={"type": "RestException", "message": "No matching process definition"})
+
+        with self.assertRaises(Exception) as exception_ctx:
+            await self.client.start_process("PROCESS_KEY", {})
+
+        self.assertEqual("received 404 : RestException : No matching process definition", str(exception_ctx.exception))
+
+    async def test_get_jobs_and_set_job_retry(self):
+        self.route("GET", "/job", json=[{"id": "job1"}])
+        self.route("PUT", "/job/job1/retries", status_code=HTTPStatus.NO_CONTENT)
+
+        jobs = await self.client.get_jobs(0, 10, tenant_ids=["tenant1"], with_failure=True)
+        self.assertTrue(await self.client.set_job_retry(jobs[0]["id"], 3))
+
+        self.assertEqual("tenant1", self.requests[0].url.params["tenantIdIn"])
+        self.assertEqual("true", self.requests[0].url.params["withException"])
+        self.assertDictEqual({"retries": 3}, json.loads(self.requests[1].content))
+
+    async def test_correlate_messages_returns_result_or_exception_per_message(self):
+        def correlate(request):
+            if json.loads(request.content)["businessKey"] == "2":
+                return httpx.Response(HTTPStatus.BAD_REQUEST, json={"type": "RestException", "message": "no match"})
+            return httpx.Response(HTTPStatus.NO_CONTENT)
+        self.routes[("POST", "/engine-rest/message")] = correlate
+
+        results = await self.client.correlate_messages([
+            {"message_name": "CANCEL_MESSAGE", "business_key": "1"},
+            {"message_name": "CANCEL_MESSAGE", "business_key": "2"},
+        ], max_concurrency=2)
+
+        self.assertTrue(results[0])
+        self.assertEqual("received 400 : RestException : no match", str(results[1]))
+        self.assertFalse(json.loads(self.requests[0].content)["resultEnabled"])
+
+    async def test_get_process_instances_variable(self):
+        self.route("POST", "/variable-instance", json=[
+            {"id": "v1", "name": "var1", "type": "String", "value": "a", "processInstanceId": "pi1"},
+            {"id": "v2", "name": "var1", "type": "Bytes", "value": None, "processInstanceId": "pi2"},
+        ])
+        self.route("GET", "/variable-instance/v2/data", content=base64.decodebytes(b"hellocamunda"))
+
+        resp = await self.client.get_process_instances_variable(["pi1", "pi2"], "var1", fetch_binary=True)
+
+        self.assertDictEqual({"pi1": "a", "pi2": "hellocamunda\n"}, resp)
+
+    async def test_shares_http_client_with_async_external_task_client(self):
+        self.route("POST", "/external-task/task1/complete", status_code=HTTPStatus.NO_CONTENT)
+        self.route("PUT", "/job/job1/retries", status_code=HTTPStatus.NO_CONTENT)
+        external_task_client = AsyncExternalTaskClient(1, ENGINE_LOCAL_BASE_URL, http_client=self.http_client)
+
+        self.assertTrue(await external_task_client.complete("task1", {}))
+        self.assertTrue(await self.client.set_job_retry("job1"))
+        self.assertEqual(2, len(self.requests))
+        self.assertFalse(self.http_client.is_closed)
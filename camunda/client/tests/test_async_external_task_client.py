@@ -126,3 +126,16 @@ class AsyncExternalTaskClientTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(kwargs["json"]["errorCode"], "BPMN_ERROR")
         self.assertTrue(client.is_debug)  # Confirm the debug flag is set
 
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_extend_lock_and_unlock(self, mock_post):
+        mock_post.return_value.status_code = HTTPStatus.NO_CONTENT
+        client = AsyncExternalTaskClient(self.default_worker_id, self.default_engine_url, {})
+
+        self.assertTrue(await client.extend_lock("myTaskId", 60000))
+        self.assertTrue(await client.unlock("myTaskId"))
+
+        (extend_args, extend_kwargs), (unlock_args, _) = mock_post.call_args_list
+        self.assertEqual(f"{ENGINE_LOCAL_BASE_URL}/external-task/myTaskId/extendLock", extend_args[0])
+        self.assertEqual({"workerId": 1, "newDuration": 60000}, extend_kwargs["json"])
+        self.assertEqual(f"{ENGINE_LOCAL_BASE_URL}/external-task/myTaskId/unlock", unlock_args[0])
@@ -0,0 +1,244 @@
+import asyncio
+import unittest
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from camunda.client.endpoints import EngineEndpoints, get_engine_endpoints
+from camunda.client.external_task_client import ExternalTaskClient
+from camunda.testing.fake_engine import FakeEngine
+
+NODE1 = "http://node1:8080/engine-rest"
+NODE2 = "http://node2:8080/engine-rest"
+NODE3 = "http://node3:8080/engine-rest"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def respond(status_codes):
+    """
+    :return: send function answering with the status code of the node of the url, recording the urls
+    """
+    urls = []
+
+    def send(url):
+        urls.append(url)
+        status_code = status_codes.get(url.split("/engine-rest")[0] + "/engine-rest", 204)
+        if isinstance(status_code, Exception):
+            raise status_code
+        return FakeResponse(status_code)
+
+    send.urls = urls
+    return send
+
+
+class EngineEndpointsTest(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_round_robin_routes_urls_to_nodes_in_turn(self):
+        endpoints = EngineEndpoints([NODE1, NODE2, NODE3], strategy="round-robin")
+        send = respond({})
+
+        for _ in range(4):
+            endpoints.call(f"{NODE1}/external-task/1/complete", send)
+
+        self.assertEqual([f"{NODE1}/external-task/1/complete", f"{NODE2}/external-task/1/complete",
+                          f"{NODE3}/external-task/1/complete", f"{NODE1}/external-task/1/complete"], send.urls)
+
+    def test_least_outstanding_avoids_nodes_with_requests_in_flight(self):
+        endpoints = EngineEndpoints([NODE1, NODE2])
+        urls = []
+
+        def send_nested(url):
+            urls.append(url)
+            if len(urls) == 1:  # node1 is still busy with this request
+                endpoints.call(f"{NODE1}/job", send_nested)
+                endpoints.call(f"{NODE1}/job", send_nested)
+            return FakeResponse(200)
+
+        endpoints.call(f"{NODE1}/job", send_nested)
+
+        self.assertEqual([f"{NODE1}/job", f"{NODE2}/job", f"{NODE2}/job"], urls)
+
+    def test_ejects_node_after_consecutive_errors_and_reprobes_it(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin", max_failures=2, eject_seconds=30,
+                                    clock=self.clock)
+        status_codes = {NODE1: 503}
+        send = respond(status_codes)
+
+        for _ in range(4):
+            endpoints.call(f"{NODE1}/job", send)
+        self.assertEqual([NODE1], endpoints.get_ejected_base_urls())
+        send.urls.clear()
+        for _ in range(3):
+            endpoints.call(f"{NODE1}/job", send)
+        self.assertEqual([f"{NODE2}/job"] * 3, send.urls)
+
+        self.clock.now = 30
+        endpoints.call(f"{NODE1}/job", send)  # failed probe, ejected again
+        self.assertEqual([NODE1], endpoints.get_ejected_base_urls())
+        self.clock.now = 45
+        send.urls.clear()
+        endpoints.call(f"{NODE1}/job", send)
+        self.assertEqual([f"{NODE2}/job"], send.urls)
+
+        self.clock.now = 60
+        status_codes[NODE1] = 204
+        endpoints.call(f"{NODE1}/job", send)  # successful probe
+        self.assertEqual([], endpoints.get_ejected_base_urls())
+
+    def test_client_errors_do_not_count_as_node_errors(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin", max_failures=1)
+        send = respond({NODE1: 404, NODE2: 400})
+
+        for _ in range(4):
+            endpoints.call(f"{NODE1}/job", send)
+
+        self.assertEqual([], endpoints.get_ejected_base_urls())
+
+    def test_single_node_is_never_ejected(self):
+        endpoints = EngineEndpoints(NODE1, max_failures=1)
+        send = respond({NODE1: requests.ConnectionError("refused")})
+
+        for _ in range(3):
+            with self.assertRaises(requests.ConnectionError):
+                endpoints.call(f"{NODE1}/job", send)
+
+        self.assertEqual([], endpoints.get_ejected_base_urls())
+        self.assertEqual(3, len(send.urls))
+
+    def test_failover_tries_each_node_once(self):
+        endpoints = EngineEndpoints([NODE1, NODE2, NODE3], strategy="round-robin")
+        send = respond({NODE1: requests.ReadTimeout("timeout"), NODE2: 503, NODE3: 503})
+
+        response = endpoints.call(f"{NODE1}/external-task/fetchAndLock", send, failover=True)
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual([f"{NODE1}/external-task/fetchAndLock", f"{NODE2}/external-task/fetchAndLock",
+                          f"{NODE3}/external-task/fetchAndLock"], sorted(send.urls))
+
+    def test_failover_returns_last_error_response_when_all_nodes_fail(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin")
+        send = respond({NODE1: 503, NODE2: 502})
+
+        response = endpoints.call(f"{NODE1}/job", send, failover=True)
+
+        self.assertEqual(502, response.status_code)
+        self.assertEqual(2, len(send.urls))
+
+    def test_other_server_errors_are_no_node_failures(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin", max_failures=1)
+        send = respond({NODE1: 500, NODE2: 500})
+
+        response = endpoints.call(f"{NODE1}/job", send, failover=True)
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual(1, len(send.urls))
+        self.assertEqual([], endpoints.get_ejected_base_urls())
+
+    def test_errors_of_the_caller_are_no_node_failures(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin", max_failures=1)
+        send = respond({NODE1: ValueError("not serializable")})
+
+        with self.assertRaises(ValueError):
+            endpoints.call(f"{NODE1}/job", send, failover=True)
+        self.assertEqual(1, len(send.urls))
+        self.assertEqual([], endpoints.get_ejected_base_urls())
+
+    def test_without_failover_errors_are_raised(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin")
+        send = respond({NODE1: requests.ReadTimeout("timeout"), NODE2: 503})
+
+        with self.assertRaises(requests.ReadTimeout):
+            endpoints.call(f"{NODE1}/job", send)
+        self.assertEqual(503, endpoints.call(f"{NODE1}/job", send).status_code)
+        self.assertEqual(2, len(send.urls))
+
+    def test_requests_that_could_not_connect_are_always_retried_on_other_nodes(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin")
+        connect_error = requests.ConnectionError(MaxRetryError(None, "/job", NewConnectionError(None, "refused")))
+        send = respond({NODE1: connect_error})
+
+        self.assertEqual(204, endpoints.call(f"{NODE1}/job", send).status_code)
+        self.assertEqual([f"{NODE1}/job", f"{NODE2}/job"], send.urls)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            EngineEndpoints([])
+        with self.assertRaises(ValueError):
+            EngineEndpoints(NODE1, strategy="random")
+        with self.assertRaises(ValueError):
+            EngineEndpoints(NODE1, max_failures=0)
+
+    def test_get_engine_endpoints_reads_config_and_keeps_instances(self):
+        endpoints = get_engine_endpoints([NODE1, NODE2], {"loadBalancing": "round-robin", "endpointMaxFailures": 5})
+
+        self.assertEqual("round-robin", endpoints.strategy)
+        self.assertEqual(5, endpoints.max_failures)
+        self.assertIs(endpoints, get_engine_endpoints(endpoints, {}))
+
+
+class AsyncEngineEndpointsTest(IsolatedAsyncioTestCase):
+
+    async def test_cancelled_request_is_not_a_node_error(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], max_failures=1)
+
+        async def send(url):
+            await asyncio.sleep(10)
+
+        call = asyncio.ensure_future(endpoints.call_async(f"{NODE1}/job", send))
+        await asyncio.sleep(0)
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+
+        self.assertEqual([], endpoints.get_ejected_base_urls())
+
+    async def test_failover_retries_other_node(self):
+        endpoints = EngineEndpoints([NODE1, NODE2], strategy="round-robin")
+        send = respond({NODE1: 503})
+
+        async def send_async(url):
+            return send(url)
+
+        response = await endpoints.call_async(f"{NODE1}/job", send_async, failover=True)
+
+        self.assertEqual(204, response.status_code)
+
+
+class ExternalTaskClientFailoverTest(TestCase):
+
+    def setUp(self):
+        self.engine = FakeEngine().start()
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def test_fetch_and_lock_fails_over_to_live_node(self):
+        self.engine.add_task("topicA")
+        client = ExternalTaskClient("worker1", ["http://127.0.0.1:1/engine-rest", self.engine.base_url],
+                                    {"asyncResponseTimeout": 0, "loadBalancing": "round-robin"})
+
+        tasks = client.fetch_and_lock("topicA")
+
+        self.assertEqual(1, len(tasks))
+        self.assertTrue(client.complete(tasks[0]["id"], {}))
+        self.assertEqual(1, self.engine.count_tasks("completed"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import base64
+import json
 from http import HTTPStatus
 from unittest import TestCase
 from unittest.mock import patch
@@ -226,3 +227,138 @@ class EngineClientTest(TestCase):
 
         resp = self.client.get_process_instance_variable(process_instance_id, variable_name, True)
         self.assertEqual({"value": "hellocamunda\n", "valueInfo": {}, "type": ""}, resp)
+
+    @patch('requests.post')
+    def test_set_jobs_retries_async_with_job_ids(self, mock_post):
+        self.client.set_jobs_retries_async(3, job_ids=["job1", "job2"])
+        mock_post.assert_called_with(ENGINE_LOCAL_BASE_URL + "/job/retries",
+                                     json={"retries": 3, "jobIds": ["job1", "job2"]},
+                                     headers={'Content-Type': 'application/json'})
+
+    @patch('requests.post')
+    def test_set_jobs_retries_async_with_job_query(self, mock_post):
+        self.client.set_jobs_retries_async(1, tenant_ids=[self.tenant_id], with_failure=True,
+                                           task_name="CALL_SERVICE", due_date="2024-01-31T10:00:00.000+0000")
+        mock_post.assert_called_with(ENGINE_LOCAL_BASE_URL + "/job/retries",
+                                     json={
+                                         "retries": 1,
+                                         "jobQuery": {
+                                             "failedActivityId": "CALL_SERVICE",
+                                             "withException": True,
+                                             "tenantIdIn": [self.tenant_id],
+                                         },
+                                         "dueDate": "2024-01-31T10:00:00.000+0000",
+                                     },
+                                     headers={'Content-Type': 'application/json'})
+
+    def test_set_jobs_retries_async_without_job_selection_raises_exception(self):
+        with self.assertRaises(ValueError):
+            self.client.set_jobs_retries_async(1)
+
+    @responses.activate
+    def test_set_jobs_retries_async_returns_batch(self):
+        batch = {"id": "batch1", "type": "set-job-retries", "totalJobs": 2}
+        responses.add(responses.POST, f"{ENGINE_LOCAL_BASE_URL}/job/retries", status=HTTPStatus.OK, json=batch)
+        responses.add(responses.GET, f"{ENGINE_LOCAL_BASE_URL}/batch/batch1", status=HTTPStatus.OK, json=batch)
+
+        self.assertDictEqual(batch, self.client.set_jobs_retries_async(1, job_ids=["job1", "job2"]))
+        self.assertDictEqual(batch, self.client.get_batch("batch1"))
+
+    @patch('requests.post')
+    def test_correlate_message_to_all_without_result(self, mock_post):
+        mock_post.return_value.ok = True
+        mock_post.return_value.status_code = HTTPStatus.NO_CONTENT
+        expected_request_payload = {
+            "messageName": "CANCEL_MESSAGE",
+            "withoutTenantId": True,
+            "businessKey": "123456",
+            "resultEnabled": False,
+            "all": True
+        }
+
+        self.assertTrue(self.client.correlate_message("CANCEL_MESSAGE", business_key="123456",
+                                                      result_enabled=False, correlate_all=True))
+        mock_post.assert_called_with(ENGINE_LOCAL_BASE_URL + "/message",
+                                     json=expected_request_payload,
+                                     headers={'Content-Type': 'application/json'})
+
+    @responses.activate
+    def test_correlate_messages_returns_result_or_exception_per_message(self):
+        correlate_msg_url = f"{ENGINE_LOCAL_BASE_URL}/message"
+        responses.add(responses.POST, correlate_msg_url, status=HTTPStatus.NO_CONTENT,
+                      match=[responses.json_params_matcher({"messageName": "CANCEL_MESSAGE", "resultEnabled": False,
+                                                            "withoutTenantId": True, "businessKey": "1"})])
+        responses.add(responses.POST, correlate_msg_url, status=HTTPStatus.BAD_REQUEST,
+                      json={"type": "RestException", "message": "Cannot correlate message"},
+                      match=[responses.json_params_matcher({"messageName": "CANCEL_MESSAGE", "resultEnabled": False,
+                                                            "withoutTenantId": True, "businessKey": "2"})])
+        responses.add(responses.POST, correlate_msg_url, status=HTTPStatus.OK, json=[{"resultType": "Execution"}],
+                      match=[responses.json_params_matcher({"messageName": "CANCEL_MESSAGE", "resultEnabled": True,
+                                                            "withoutTenantId": True, "businessKey": "3"})])
+
+        results = self.client.correlate_messages([
+            {"message_name": "CANCEL_MESSAGE", "business_key": "1"},
+            {"message_name": "CANCEL_MESSAGE", "business_key": "2"},
+            {"message_name": "CANCEL_MESSAGE", "business_key": "3", "result_enabled": True},
+        ], max_concurrency=2)
+
+        self.assertTrue(results[0])
+        self.assertEqual("received 400 : RestException : Cannot correlate message", str(results[1]))
+        self.assertEqual([{"resultType": "Execution"}], results[2])
+
+    @responses.activate
+    def test_get_process_instances_variable_pages_through_variable_instances(self):
+        variable_instance_url = f"{ENGINE_LOCAL_BASE_URL}/variable-instance"
+        first_page = [
+            {"id": "v1", "name": "var1", "type": "String", "value": "a", "processInstanceId": "pi1"},
+            {"id": "v2", "name": "var1", "type": "String", "value": "b", "processInstanceId": "pi2"},
+        ]
+        second_page = [
+            {"id": "v3", "name": "var1", "type": "Bytes", "value": None, "processInstanceId": "pi3"},
+        ]
+        query = {
+            "processInstanceIdIn": ["pi1", "pi2", "pi3", "pi4"],
+            "variableScopeIdIn": ["pi1", "pi2", "pi3", "pi4"],
+            "variableName": "var1",
+        }
+        responses.add(responses.POST, variable_instance_url, status=HTTPStatus.OK, json=first_page,
+                      match=[responses.json_params_matcher(query),
+                             responses.matchers.query_param_matcher(
+                                 {"firstResult": "0", "maxResults": "2", "deserializeValues": "false"})])
+        responses.add(responses.POST, variable_instance_url, status=HTTPStatus.OK, json=second_page,
+                      match=[responses.json_params_matcher(query),
+                             responses.matchers.query_param_matcher(
+                                 {"firstResult": "2", "maxResults": "2", "deserializeValues": "false"})])
+        responses.add(responses.GET, f"{variable_instance_url}/v3/data", status=HTTPStatus.OK,
+                      body=base64.decodebytes(b"hellocamunda"))
+
+        resp = self.client.get_process_instances_variable(["pi1", "pi2", "pi3", "pi4"], "var1",
+                                                          fetch_binary=True, page_size=2)
+
+        self.assertDictEqual({"pi1": "a", "pi2": "b", "pi3": "hellocamunda\n"}, resp)
+
+    @responses.activate
+    def test_get_process_instances_variable_ignores_same_named_local_variables(self):
+        variable_instances = [
+            {"id": "v1", "name": "var1", "type": "String", "value": "global", "processInstanceId": "pi1",
+             "executionId": "pi1"},
+            {"id": "v2", "name": "var1", "type": "String", "value": "local", "processInstanceId": "pi1",
+             "executionId": "ex1", "activityInstanceId": "task1:ai1"},
+        ]
+
+        def query_variable_instances(request):
+            body = json.loads(request.body)
+            scope_ids = body.get("variableScopeIdIn")
+            matching = [variable for variable in variable_instances
+                        if scope_ids is None or variable["executionId"] in scope_ids]
+            return HTTPStatus.OK, {}, json.dumps(matching)
+
+        responses.add_callback(responses.POST, f"{ENGINE_LOCAL_BASE_URL}/variable-instance",
+                               callback=query_variable_instances)
+
+        resp = self.client.get_process_instances_variable(["pi1"], "var1")
+
+        self.assertDictEqual({"pi1": "global"}, resp)
+
+    def test_get_process_instances_variable_without_process_instances_returns_empty_dict(self):
+        self.assertDictEqual({}, self.client.get_process_instances_variable([], "var1"))
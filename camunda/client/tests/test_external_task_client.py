@@ -1,5 +1,8 @@
+from http import HTTPStatus
 from unittest import TestCase
 
+import responses
+
 from camunda.client.engine_client import ENGINE_LOCAL_BASE_URL
 from camunda.client.external_task_client import ExternalTaskClient
 
@@ -15,3 +18,38 @@ class ExternalTaskClientTest(TestCase):
         client = ExternalTaskClient(1, ENGINE_LOCAL_BASE_URL, {"isDebug": True})
         self.assertTrue(client.is_debug)
         self.assertTrue(client.config.get("isDebug"))
+
+    @responses.activate
+    def test_extend_lock_and_unlock(self):
+        client = ExternalTaskClient(1, ENGINE_LOCAL_BASE_URL, {})
+        responses.add(responses.POST, client.get_task_extend_lock_url("myTaskId"), status=HTTPStatus.NO_CONTENT)
+        responses.add(responses.POST, client.get_task_unlock_url("myTaskId"), status=HTTPStatus.NO_CONTENT)
+
+        self.assertTrue(client.extend_lock("myTaskId", 60000))
+        self.assertTrue(client.unlock("myTaskId"))
+
+        self.assertEqual(b'{"workerId": 1, "newDuration": 60000}', responses.calls[0].request.body)
+        self.assertEqual(f"{ENGINE_LOCAL_BASE_URL}/external-task/myTaskId/unlock", responses.calls[1].request.url)
+
+    def test_get_topics_adds_fetch_filters_of_config_and_topic_options(self):
+        client = ExternalTaskClient(1, ENGINE_LOCAL_BASE_URL, {"tenantIdIn": ["tenant1"]})
+
+        topics = client._get_topics(["topicA", "topicB"], None, None, topic_options={
+            "topicB": {"tenantIdIn": ["tenant2"], "businessKey": "order-1", "processDefinitionVersionTag": "v2",
+                       "localVariables": True, "includeExtensionProperties": False, "handlerTimeoutSeconds": 10}})
+
+        self.assertEqual(["tenant1"], topics[0]["tenantIdIn"])
+        self.assertNotIn("businessKey", topics[0])
+        self.assertTrue(topics[0]["includeExtensionProperties"])
+        self.assertEqual({"tenantIdIn": ["tenant2"], "businessKey": "order-1", "processDefinitionVersionTag": "v2",
+                          "localVariables": True, "includeExtensionProperties": False},
+                         {key: topics[1][key] for key in ("tenantIdIn", "businessKey", "processDefinitionVersionTag",
+                                                          "localVariables", "includeExtensionProperties")})
+        self.assertNotIn("handlerTimeoutSeconds", topics[1])
+
+    def test_get_topics_uses_lock_duration_of_topic_options(self):
+        client = ExternalTaskClient(1, ENGINE_LOCAL_BASE_URL, {"lockDuration": 60000})
+
+        topics = client._get_topics(["topicA", "topicB"], None, None, topic_options={"topicB": {"lockDuration": 500}})
+
+        self.assertEqual([60000, 500], [topic["lockDuration"] for topic in topics])
@@ -1,37 +1,242 @@
+import asyncio
+import contextvars
+import functools
+import inspect
 import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Optional
 
 from camunda.client.async_external_task_client import AsyncExternalTaskClient
-from camunda.utils.log_utils import log_with_context
+from camunda.external_task.batch import get_batch_results
+from camunda.external_task.memoize import MemoizedHandler
+from camunda.external_task.external_task import TaskResult
+from camunda.external_task.handler_timeout import HandlerTimeoutError
+from camunda.utils import metrics, tracing
+from camunda.utils.log_utils import log_with_context, LazyLogArg
+from camunda.utils.metrics import NOOP_METRICS
+from camunda.utils.recording import NOOP_RECORDER, get_outcome
+from camunda.utils.tracing import NOOP_TRACER
+from camunda.utils.utils import get_exception_detail
 
 logger = logging.getLogger(__name__)
 
 
 class AsyncExternalTaskExecutor:
 
-    def __init__(self, worker_id: str, external_task_client: AsyncExternalTaskClient):
+    def __init__(self, worker_id: str, external_task_client: AsyncExternalTaskClient, metrics=NOOP_METRICS,
+                 tracer=NOOP_TRACER, handler_executor: Optional[Executor] = None, recorder=NOOP_RECORDER,
+                 handler_executor_factory: Optional[Callable[[], Executor]] = None):
+        """
+        :param handler_executor_factory: optional function creating a replacement of handler_executor when a timed
+            out synchronous handler is abandoned, as it keeps a worker of the executor busy until it returns
+        """
         self.worker_id = worker_id
         self.external_task_client = external_task_client
+        self.metrics = metrics
+        self.tracer = tracer
+        self.recorder = recorder
+        # runs synchronous handlers, None for the default executor of the event loop
+        self.handler_executor = handler_executor
+        self.handler_executor_factory = handler_executor_factory
+        self.abandoned_handlers = 0
 
-    async def execute_task(self, task, action):
+    async def execute_task(self, task, action, timeout_seconds=None):
+        """
+        :param timeout_seconds: optional time limit of the handler, HandlerTimeoutError is raised when it's exceeded
+        """
         topic = task.get_topic_name()
         task_id = task.get_task_id()
-        self._log_with_context(f"Executing external task for Topic: {topic}", task_id=task_id)
-        task_result = await action(task)
-        # in case task result is not set inside action function, set it in task here
-        task.set_task_result(task_result)
-        await self._handle_task_result(task_result)
+        self._log_with_context("Executing external task for Topic: %s", topic, task_id=task_id)
+        self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, 1)
+        try:
+            with self.tracer.start_span(tracing.EXECUTE_TASK_SPAN, self._get_span_attributes(task)):
+                if isinstance(action, MemoizedHandler):
+                    task_result = await self._run_memoized_action(task, action, timeout_seconds)
+                else:
+                    task_result = await self._run_action(task, action, timeout_seconds)
+                # in case task result is not set inside action function, set it in task here
+                task.set_task_result(task_result)
+                await self._handle_task_result(task_result)
+                return task_result
+        finally:
+            self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, -1)
+
+    async def _run_memoized_action(self, task, memoized_handler, timeout_seconds=None):
+        # the cache may block, e.g. a DiskCache, so it's used off the event loop
+        task_result = await self._run_in_thread(memoized_handler.get_cached_result, task)
+        if task_result is not None:
+            self.metrics.inc(metrics.MEMO_HITS_TOTAL, task.get_topic_name())
+            self._log_with_context("Completing task with memoized result", task_id=task.get_task_id(),
+                                   log_level='debug')
+            return task_result
+        self.metrics.inc(metrics.MEMO_MISSES_TOTAL, task.get_topic_name())
+        task_result = await self._run_action(task, memoized_handler.handler, timeout_seconds)
+        await self._run_in_thread(memoized_handler.store_result, task_result)
         return task_result
 
+    async def _run_in_thread(self, func, *args):
+        # a process pool would run func on a copy of the memoized handler and its cache
+        executor = None if isinstance(self.handler_executor, ProcessPoolExecutor) else self.handler_executor
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args))
+
+    async def _run_action(self, task, action, timeout_seconds=None):
+        if not (self.metrics.enabled or self.recorder.enabled):
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_span_attributes(task)):
+                return await self._call_action_with_timeout(task, action, timeout_seconds)
+
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_span_attributes(task)):
+                task_result = await self._call_action_with_timeout(task, action, timeout_seconds)
+                outcome = get_outcome(task_result)
+                return task_result
+        except BaseException as e:
+            if isinstance(e, HandlerTimeoutError):
+                outcome = "timeout"
+            self.metrics.inc(metrics.HANDLER_ERRORS_TOTAL, task.get_topic_name())
+            raise
+        finally:
+            duration_seconds = time.perf_counter() - start
+            self.metrics.observe(metrics.HANDLER_DURATION_SECONDS, task.get_topic_name(), duration_seconds)
+            self.recorder.record_handler(task, duration_seconds, outcome)
+
+    async def _call_action_with_timeout(self, task, action, timeout_seconds):
+        if timeout_seconds is None:
+            return await self._call_action(task, action)
+        try:
+            # cancels coroutine handlers, synchronous ones can't be interrupted and are abandoned
+            return await asyncio.wait_for(self._call_action(task, action), timeout_seconds)
+        except asyncio.TimeoutError:
+            abandoned = not is_async_action(action)
+            if abandoned:
+                self._replace_handler_executor()
+            raise HandlerTimeoutError(timeout_seconds, abandoned) from None
+
+    def _replace_handler_executor(self):
+        """
+        Without a replacement, every abandoned handler takes a worker of the handler executor for good, until
+        the tasks queued behind them time out without running.
+        """
+        self.abandoned_handlers += 1
+        if self.handler_executor_factory is None:
+            self._log_with_context("Abandoned a timed out synchronous handler, %s so far, each one keeps a worker of "
+                                   "the handler executor busy until it returns", self.abandoned_handlers,
+                                   log_level='warning')
+            return
+        self._log_with_context("Abandoned a timed out synchronous handler, %s so far, replacing the handler executor",
+                               self.abandoned_handlers, log_level='warning')
+        handler_executor = self.handler_executor
+        self.handler_executor = self.handler_executor_factory()
+        handler_executor.shutdown(wait=False)  # its other handlers still finish
+
+    async def execute_batch(self, tasks, batch_handler, max_retries, retry_timeout):
+        """
+        Runs a BatchHandler on tasks of one topic and reports the results of the tasks concurrently, each on its
+        own. A report that fails is logged and doesn't keep the other results of the batch from being reported.
+        :return: the result of every task, in the order of tasks
+        """
+        topic = tasks[0].get_topic_name()
+        self._log_with_context("Executing batch of %s external tasks for Topic: %s", len(tasks), topic)
+        self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, len(tasks))
+        try:
+            try:
+                results = await self._run_batch_handler(tasks, batch_handler)
+            except Exception as e:
+                self._log_with_context("Batch handler failed for Topic: %s: %s", topic, get_exception_detail(e),
+                                       log_level='error', exc_info=True)
+                results = [task.failure(error_message="Batch handler failed", error_details=get_exception_detail(e),
+                                        max_retries=max_retries, retry_timeout=retry_timeout) for task in tasks]
+            task_results = get_batch_results(tasks, results, max_retries, retry_timeout)
+            reports = await asyncio.gather(*(self._handle_task_result(task_result) for task_result in task_results),
+                                           return_exceptions=True)
+            for task_result, report in zip(task_results, reports):
+                if isinstance(report, Exception):
+                    self._log_with_context("Error reporting result of batch task: %s", get_exception_detail(report),
+                                           task_id=task_result.get_task().get_task_id(), log_level='error')
+            return task_results
+        finally:
+            self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, -len(tasks))
+
+    async def _run_batch_handler(self, tasks, batch_handler):
+        if not self.metrics.enabled:
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_batch_span_attributes(tasks)):
+                return await self._call_action(tasks, batch_handler.handler)
+
+        topic = tasks[0].get_topic_name()
+        start = time.perf_counter()
+        try:
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_batch_span_attributes(tasks)):
+                return await self._call_action(tasks, batch_handler.handler)
+        except BaseException:
+            self.metrics.inc(metrics.HANDLER_ERRORS_TOTAL, topic)
+            raise
+        finally:
+            self.metrics.observe(metrics.HANDLER_DURATION_SECONDS, topic, time.perf_counter() - start)
+
+    def _get_batch_span_attributes(self, tasks):
+        if not self.tracer.enabled:
+            return None
+        return {"camunda.topic": tasks[0].get_topic_name(), "camunda.worker_id": str(self.worker_id),
+                "camunda.batch_size": len(tasks)}
+
+    async def _call_action(self, task, action):
+        """
+        Awaits coroutine handlers on the event loop and runs synchronous handlers on the handler executor, so a
+        blocking handler can't stall fetching and reporting of the other tasks.
+        """
+        if is_async_action(action):
+            return await action(task)
+
+        if isinstance(self.handler_executor, ProcessPoolExecutor):
+            func = functools.partial(action, task)  # action and task are pickled to the child process
+        else:
+            # keep the context, e.g. the current tracing span, in the pool thread
+            func = functools.partial(contextvars.copy_context().run, action, task)
+        result = await asyncio.get_running_loop().run_in_executor(self.handler_executor, func)
+        if inspect.isawaitable(result):
+            result = await result
+        if isinstance(result, TaskResult) and result.get_task() is not task:
+            result.task = task  # the handler ran on a copy of the task in another process
+        return result
+
+    def _get_span_attributes(self, task):
+        # skip building attributes nobody reads when tracing is disabled
+        return tracing.get_task_span_attributes(task) if self.tracer.enabled else None
+
     async def _handle_task_result(self, task_result):
         task = task_result.get_task()
         topic = task.get_topic_name()
         task_id = task.get_task_id()
+        if not self.metrics.enabled:
+            with self.tracer.start_span(tracing.REPORT_SPAN, self._get_span_attributes(task)) as span:
+                await self._report_task_result(task_id, task_result, topic, span)
+            return
+
+        start = time.perf_counter()
+        try:
+            with self.tracer.start_span(tracing.REPORT_SPAN, self._get_span_attributes(task)) as span:
+                await self._report_task_result(task_id, task_result, topic, span)
+        except BaseException:
+            self.metrics.inc(metrics.REPORT_ERRORS_TOTAL, topic)
+            raise
+        finally:
+            self.metrics.observe(metrics.REPORT_DURATION_SECONDS, topic, time.perf_counter() - start)
+
+    async def _report_task_result(self, task_id, task_result, topic, span):
         if task_result.is_success():
+            span.set_attribute("camunda.result", "complete")
             await self._handle_task_success(task_id, task_result, topic)
+            self.metrics.inc(metrics.TASKS_COMPLETED_TOTAL, topic)
         elif task_result.is_bpmn_error():
+            span.set_attribute("camunda.result", "bpmn_error")
             await self._handle_task_bpmn_error(task_id, task_result, topic)
+            self.metrics.inc(metrics.TASKS_BPMN_ERROR_TOTAL, topic)
         elif task_result.is_failure():
+            span.set_attribute("camunda.result", "failure")
             await self._handle_task_failure(task_id, task_result, topic)
+            self.metrics.inc(metrics.TASKS_FAILED_TOTAL, topic)
         else:
             err_msg = f"task result for task_id={task_id} must be either complete/failure/BPMNError"
             self._log_with_context(err_msg, task_id=task_id, log_level='warning')
@@ -50,27 +255,29 @@ class AsyncExternalTaskExecutor:
         return cleaned
 
     async def _handle_task_success(self, task_id, task_result, topic):
-        self._log_with_context(f"Marking task complete for Topic: {topic}", task_id)
+        self._log_with_context("Marking task complete for Topic: %s", topic, task_id=task_id)
         if await self.external_task_client.complete(task_id, task_result.global_variables, task_result.local_variables):
-            self._log_with_context(f"Marked task completed - Topic: {topic} "
-                                   f"global_variables: {self._strip_long_variables(task_result.global_variables)} "
-                                   f"local_variables: {self._strip_long_variables(task_result.local_variables)}",
-                                   task_id, log_level='debug')
+            self._log_with_context("Marked task completed - Topic: %s global_variables: %s local_variables: %s",
+                                   topic,
+                                   LazyLogArg(self._strip_long_variables, task_result.global_variables),
+                                   LazyLogArg(self._strip_long_variables, task_result.local_variables),
+                                   task_id=task_id, log_level='debug')
         else:
-            self._log_with_context(f"Not able to mark task completed - Topic: {topic} "
-                                   f"global_variables: {self._strip_long_variables(task_result.global_variables)} "
-                                   f"local_variables: {self._strip_long_variables(task_result.local_variables)}",
-                                   task_id, log_level='error')
+            self._log_with_context("Not able to mark task completed - Topic: %s global_variables: %s local_variables: %s",
+                                   topic,
+                                   LazyLogArg(self._strip_long_variables, task_result.global_variables),
+                                   LazyLogArg(self._strip_long_variables, task_result.local_variables),
+                                   task_id=task_id, log_level='error')
             raise Exception(f"Not able to mark complete for task_id={task_id} "
                             f"for topic={topic}, worker_id={self.worker_id}")
 
     async def _handle_task_failure(self, task_id, task_result, topic):
-        self._log_with_context(f"Marking task failed - Topic: {topic} task_result: {task_result}", task_id)
+        self._log_with_context("Marking task failed - Topic: %s task_result: %s", topic, task_result, task_id=task_id)
         if await self.external_task_client.failure(task_id, task_result.error_message, task_result.error_details,
                                                    task_result.retries, task_result.retry_timeout):
-            self._log_with_context(f"Marked task failed - Topic: {topic} task_result: {task_result}", task_id)
+            self._log_with_context("Marked task failed - Topic: %s task_result: %s", topic, task_result, task_id=task_id)
         else:
-            self._log_with_context(f"Not able to mark task failure - Topic: {topic}", task_id=task_id)
+            self._log_with_context("Not able to mark task failure - Topic: %s", topic, task_id=task_id)
             raise Exception(f"Not able to mark failure for task_id={task_id} "
                             f"for topic={topic}, worker_id={self.worker_id}")
 
@@ -79,13 +286,20 @@ class AsyncExternalTaskExecutor:
                                                                           task_result.error_message,
                                                                           task_result.global_variables)
         if bpmn_error_handled:
-            self._log_with_context(f"BPMN Error Handled: {bpmn_error_handled} "
-                                   f"Topic: {topic} task_result: {task_result}")
+            self._log_with_context("BPMN Error Handled: %s Topic: %s task_result: %s",
+                                   bpmn_error_handled, topic, task_result, task_id=task_id)
         else:
-            self._log_with_context(f"Not able to mark BPMN error - Topic: {topic}", task_id=task_id)
+            self._log_with_context("Not able to mark BPMN error - Topic: %s", topic, task_id=task_id)
             raise Exception(f"Not able to mark BPMN Error for task_id={task_id} "
                             f"for topic={topic}, worker_id={self.worker_id}")
 
-    def _log_with_context(self, msg, task_id=None, log_level='info', **kwargs):
+    def _log_with_context(self, msg, *args, task_id=None, log_level='info', **kwargs):
         context = {"WORKER_ID": self.worker_id, "TASK_ID": task_id}
-        log_with_context(msg, context=context, log_level=log_level, **kwargs)
+        log_with_context(msg, context=context, log_level=log_level, args=args, **kwargs)
+
+
+def is_async_action(action):
+    """
+    :return: True for coroutine functions and for objects with a coroutine __call__ method
+    """
+    return asyncio.iscoroutinefunction(action) or asyncio.iscoroutinefunction(getattr(action, "__call__", None))
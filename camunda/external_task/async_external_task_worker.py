@@ -1,50 +1,147 @@
 import asyncio
-from typing import Any, Callable, Dict, List, Optional
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import httpx
 
 from camunda.client.async_external_task_client import AsyncExternalTaskClient
 from camunda.client.external_task_client import ENGINE_LOCAL_BASE_URL
 from camunda.external_task.async_external_task_executor import AsyncExternalTaskExecutor
-from camunda.external_task.external_task import ExternalTask
+from camunda.external_task.batch import BatchHandler
+from camunda.external_task.external_task import ExternalTask, RETRY_CONFIG_KEYS
+from camunda.external_task.handler_timeout import (HandlerTimeoutError, get_handler_timeout_seconds,
+                                                   validate_handler_timeout_policy)
+from camunda.external_task.retry_backoff import RetryBackoff
+from camunda.external_task.task_queue import TaskQueue
+from camunda.external_task.task_slots import TaskSlots
+from camunda.external_task.task_stream import AsyncTaskStream
 from camunda.utils.auth_basic import obfuscate_password
-from camunda.utils.log_utils import log_with_context
+from camunda.utils import metrics, tracing
+from camunda.utils.log_utils import log_with_context, LazyLogArg
+from camunda.utils.metrics import NOOP_METRICS
+from camunda.utils.recording import NOOP_RECORDER
+from camunda.utils.tracing import NOOP_TRACER
 from camunda.utils.utils import get_exception_detail
 
 
 class AsyncExternalTaskWorker:
-    DEFAULT_SLEEP_SECONDS = 1  # Sleep duration when no tasks are fetched
+    DEFAULT_SLEEP_SECONDS = 1  # Sleep duration after fetch errors, and when no tasks are fetched with asyncResponseTimeout 0
 
     def __init__(
         self,
         worker_id: str,
-        base_url: str = ENGINE_LOCAL_BASE_URL,
+        base_url: Union[str, List[str]] = ENGINE_LOCAL_BASE_URL,
         config: Optional[Dict[str, Any]] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        metrics=NOOP_METRICS,
+        tracer=NOOP_TRACER,
+        handler_executor: Optional[Executor] = None,
+        recorder=NOOP_RECORDER,
     ):
+        """
+        :param handler_executor: optional executor running synchronous handlers, by default a pool created from
+            the syncHandlerPool and syncHandlerPoolSize config and shut down by stop()
+        :param recorder: optional TaskRecorder writing the fetched tasks and handler timings to a file
+        """
         self.config = config or {}
         self.worker_id = worker_id
-        self.client = AsyncExternalTaskClient(self.worker_id, base_url, self.config)
-        self.executor = AsyncExternalTaskExecutor(self.worker_id, self.client)
+        self.metrics = metrics
+        self.tracer = tracer
+        self.recorder = recorder
+        default_config = AsyncExternalTaskClient.default_config
+        self.max_concurrent_tasks = self.config.get('maxConcurrentTasks', default_config['maxConcurrentTasks'])
+        validate_handler_timeout_policy(self.config.get('handlerTimeoutPolicy', default_config['handlerTimeoutPolicy']))
+        self.topic_configs: Dict[str, Dict[str, Any]] = {}
+        self._owns_handler_executor = handler_executor is None
+        self.client = AsyncExternalTaskClient(self.worker_id, base_url, self.config, http_client=http_client)
+        RetryBackoff.from_config(self.client.config)  # raises ValueError for an invalid retry backoff config
+        # an own pool is replaced when timed out synchronous handlers are abandoned on it
+        self.executor = AsyncExternalTaskExecutor(
+            self.worker_id, self.client, metrics=metrics, tracer=tracer,
+            handler_executor=handler_executor or self._create_handler_executor(), recorder=recorder,
+            handler_executor_factory=self._create_handler_executor if self._owns_handler_executor else None,
+        )
         self.subscriptions: List[asyncio.Task] = []
-        max_concurrent_tasks = self.config.get('maxConcurrentTasks', 10)
-        self.semaphore = asyncio.Semaphore(max_concurrent_tasks)
+        prefetch_tasks = self.config.get('prefetchTasks', default_config['prefetchTasks'])
+        # slots cover fetched tasks until they are done, the queue holds them until one of the
+        # max_concurrent_tasks execution slots is free
+        self.task_slots = TaskSlots(self.max_concurrent_tasks + prefetch_tasks)
+        self.task_queue = TaskQueue(self.config.get('orderByLockDeadline', default_config['orderByLockDeadline']))
         self.running_tasks = set()
+        self._task_streams = set()
+        self._draining = False
+        self._stopped = False
         self._log_with_context(
-            f"Created new External Task Worker with config: {obfuscate_password(self.config)}"
+            "Created new External Task Worker with config: %s", LazyLogArg(obfuscate_password, self.config)
         )
 
+    @property
+    def handler_executor(self) -> Executor:
+        return self.executor.handler_executor
+
+    def _create_handler_executor(self) -> Executor:
+        default_config = AsyncExternalTaskClient.default_config
+        pool = self.config.get('syncHandlerPool', default_config['syncHandlerPool'])
+        pool_size = self.config.get('syncHandlerPoolSize', default_config['syncHandlerPoolSize'])
+        if pool == "process":
+            return ProcessPoolExecutor(max_workers=pool_size)
+        if pool == "thread":
+            # threads are only started on demand, up to one per execution slot by default
+            return ThreadPoolExecutor(max_workers=pool_size or self.max_concurrent_tasks,
+                                      thread_name_prefix=f"camunda-handler-{self.worker_id}")
+        raise ValueError(f"syncHandlerPool must be 'thread' or 'process', got {pool!r}")
+
     async def subscribe(
         self,
         topic_handlers: Dict[str, Callable[[ExternalTask], Any]],
         process_variables: Optional[Dict[str, Any]] = None,
         variables: Optional[List[str]] = None,
+        topic_configs: Optional[Dict[str, Dict[str, Any]]] = None,
     ):
+        """
+        Fetches and executes tasks of every topic in topic_handlers until stop() or drain() is called.
+        :param topic_configs: optional per topic settings, e.g. {"cheapTopic": {"maxConcurrentTasks": 2},
+            "importantTopic": {"weight": 3}}: maxConcurrentTasks caps the running tasks of the topic, weight is
+            its share of the worker's maxConcurrentTasks while several topics wait for a slot (default 1).
+            lockDuration, retries, retryTimeout, the retry backoff config (see RetryBackoff), handlerTimeoutSeconds,
+            handlerTimeoutMarginSeconds and handlerTimeoutPolicy override the worker config, the fetch filters in
+            FETCH_FILTERS (e.g. tenantIdIn, businessKey) narrow down the fetched tasks, see also
+            camunda.external_task.sharding
+
+        A topic whose handler is a BatchHandler is fetched in batches, see BatchHandler. A batch takes one slot,
+        so for such topics maxConcurrentTasks limits the batches handled at the same time.
+        """
+        for topic, topic_config in (topic_configs or {}).items():
+            self.task_slots.configure(topic, topic_config.get("maxConcurrentTasks"), topic_config.get("weight", 1))
+            if "handlerTimeoutPolicy" in topic_config:
+                validate_handler_timeout_policy(topic_config["handlerTimeoutPolicy"])
+            RetryBackoff.from_config({**self.client.config, **topic_config})
+        self.topic_configs = topic_configs or {}
         self.subscriptions = [
             asyncio.create_task(
-                self._fetch_and_execute_safe(topic, action, process_variables, variables)
+                self._fetch_and_execute_batches_safe(topic, action, process_variables, variables)
+                if isinstance(action, BatchHandler)
+                else self._fetch_and_execute_safe(topic, action, process_variables, variables)
             )
             for topic, action in topic_handlers.items()
         ]
         await asyncio.gather(*self.subscriptions)
 
+    def tasks(
+        self,
+        topic_names,
+        process_variables: Optional[Dict[str, Any]] = None,
+        variables: Optional[List[str]] = None,
+        buffer_size: int = 10,
+    ) -> AsyncTaskStream:
+        """
+        Consumes tasks without a handler: `async for task in worker.tasks(["topicA"])` yields AsyncLockedTasks
+        with their lock deadline, to be reported with their complete(), failure() or bpmn_error() coroutines.
+        See AsyncTaskStream.
+        """
+        return AsyncTaskStream(self, topic_names, process_variables, variables, buffer_size)
+
     async def _fetch_and_execute_safe(
         self,
         topic_name: str,
@@ -53,30 +150,145 @@ class AsyncExternalTaskWorker:
         variables: Optional[List[str]] = None,
     ):
         sleep_seconds = self._get_sleep_seconds()
-        while True:
+        long_polling = self._is_long_polling()
+        while not self._draining:
+            slot_acquired = False
             try:
-                await self.semaphore.acquire()
-                tasks_processed = await self.fetch_and_execute(topic_name, action, process_variables, variables)
+                # parks until a slot of this topic is free, woken by the release of that slot
+                await self.task_slots.acquire(topic_name)
+                slot_acquired = True
+                tasks_processed = await self._fetch_and_execute(topic_name, action, process_variables, variables,
+                                                                held_slots=1)
+                slot_acquired = False  # now held by the fetched task, or released right below
                 if not tasks_processed:
-                    # Release semaphore if no tasks were fetched
-                    self.semaphore.release()
-                    await asyncio.sleep(sleep_seconds)
+                    # Release the slot if no tasks were fetched
+                    self.task_slots.release(topic_name)
+                    if not long_polling:
+                        # without long polling the engine answers at once, so don't poll it in a tight loop
+                        await asyncio.sleep(sleep_seconds)
+                await asyncio.sleep(0)  # Yield control to the event loop
+            except asyncio.CancelledError:
+                if slot_acquired:
+                    self.task_slots.release(topic_name)
+                self._log_with_context("Task for topic %s was cancelled.", topic_name)
+                break
+            except Exception as e:
+                self._log_with_context(
+                    "Error fetching and executing tasks: %s for topic=%s with Process variables: %s. "
+                    "Retrying after %s seconds",
+                    get_exception_detail(e), topic_name, process_variables, sleep_seconds,
+                    exc_info=True,
+                    log_level="error"
+                )
+                if slot_acquired:
+                    self.task_slots.release(topic_name)
+                await asyncio.sleep(sleep_seconds)
+
+    async def _fetch_and_execute_batches_safe(
+        self,
+        topic_name: str,
+        batch_handler: BatchHandler,
+        process_variables: Optional[Dict[str, Any]] = None,
+        variables: Optional[List[str]] = None,
+    ):
+        sleep_seconds = self._get_sleep_seconds()
+        while not self._draining:
+            slot_acquired = False
+            tasks = []  # filled while the batch is collected, so tasks fetched before a cancellation aren't lost
+            try:
+                await self.task_slots.acquire(topic_name)
+                slot_acquired = True
+                await self._collect_batch(topic_name, batch_handler, tasks, process_variables, variables)
+                slot_acquired = False  # now held by the batch, or released right below
+                if tasks:
+                    self._start_batch(topic_name, tasks, batch_handler)
                 else:
-                    await asyncio.sleep(0)  # Yield control to the event loop
+                    self.task_slots.release(topic_name)
+                    if not self._is_long_polling():
+                        await asyncio.sleep(sleep_seconds)
+                await asyncio.sleep(0)
             except asyncio.CancelledError:
-                self._log_with_context(f"Task for topic {topic_name} was cancelled.")
+                if tasks and slot_acquired and self._draining and not self._stopped:
+                    # drain(): handle the tasks locked so far instead of letting their locks expire
+                    self._start_batch(topic_name, tasks, batch_handler)
+                elif slot_acquired:
+                    self.task_slots.release(topic_name)
+                self._log_with_context("Task for topic %s was cancelled.", topic_name)
                 break
             except Exception as e:
                 self._log_with_context(
-                    f"Error fetching and executing tasks: {get_exception_detail(e)} "
-                    f"for topic={topic_name} with Process variables: {process_variables}. "
-                    f"Retrying after {sleep_seconds} seconds",
+                    "Error fetching and executing batches: %s for topic=%s with Process variables: %s. "
+                    "Retrying after %s seconds",
+                    get_exception_detail(e), topic_name, process_variables, sleep_seconds,
                     exc_info=True,
                     log_level="error"
                 )
-                self.semaphore.release()
+                if tasks and slot_acquired:
+                    self._start_batch(topic_name, tasks, batch_handler)
+                elif slot_acquired:
+                    self.task_slots.release(topic_name)
                 await asyncio.sleep(sleep_seconds)
 
+    async def _collect_batch(
+        self,
+        topic_name: str,
+        batch_handler: BatchHandler,
+        tasks: List[ExternalTask],
+        process_variables: Optional[Dict[str, Any]] = None,
+        variables: Optional[List[str]] = None,
+    ):
+        """
+        Fetches into tasks until max_batch_size tasks are there or max_wait_seconds passed. Long polls are
+        shortened to the time left, so a batch is never held back longer than that.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + batch_handler.max_wait_seconds
+        long_polling_millis = self.config.get("asyncResponseTimeout",
+                                              AsyncExternalTaskClient.default_config["asyncResponseTimeout"])
+        while len(tasks) < batch_handler.max_batch_size:
+            remaining_millis = int((deadline - loop.time()) * 1000)
+            if tasks and remaining_millis <= 0:
+                return
+            resp_json = await self._fetch_and_lock(
+                topic_name, process_variables, variables, max_tasks=batch_handler.max_batch_size - len(tasks),
+                async_response_timeout=max(0, min(long_polling_millis, remaining_millis)),
+            )
+            fetched = self._parse_response(resp_json, topic_name, process_variables)
+            tasks.extend(fetched)
+            if not fetched and (not long_polling_millis or remaining_millis <= 0):
+                return
+
+    def _start_batch(self, topic_name: str, tasks: List[ExternalTask], batch_handler: BatchHandler):
+        running_batch = asyncio.create_task(self._execute_batch(tasks, batch_handler))
+        self.running_tasks.add(running_batch)
+        running_batch.add_done_callback(lambda t: self.task_slots.release(topic_name))
+        running_batch.add_done_callback(self.running_tasks.discard)
+        running_batch.add_done_callback(lambda t: self._dispatch())
+
+    async def _execute_batch(self, tasks: List[ExternalTask], batch_handler: BatchHandler):
+        topic = tasks[0].get_topic_name()
+        max_retries = self._get_topic_config(topic, 'retries')
+        retry_timeout = self._get_topic_config(topic, 'retryTimeout')
+        try:
+            return await self.executor.execute_batch(tasks, batch_handler, max_retries, retry_timeout)
+        except asyncio.CancelledError:
+            task_results = [task.failure(error_message='Task execution cancelled',
+                                         error_details='Task was cancelled by the user or system',
+                                         max_retries=max_retries, retry_timeout=retry_timeout)
+                            for task in tasks]
+            await asyncio.gather(*(self.executor._handle_task_result(task_result) for task_result in task_results),
+                                 return_exceptions=True)
+            self._log_with_context("Batch execution cancelled for %s task(s)", len(tasks),
+                                   topic=tasks[0].get_topic_name())
+            return task_results
+
+    def _get_lock_duration(self, topic_name: str) -> int:
+        return self._get_topic_config(topic_name, 'lockDuration')
+
+    def _is_long_polling(self) -> bool:
+        default_config = AsyncExternalTaskClient.default_config
+        return self.config.get("asyncResponseTimeout", default_config["asyncResponseTimeout"]) > 0
+
     async def fetch_and_execute(
         self,
         topic_name: str,
@@ -84,26 +296,114 @@ class AsyncExternalTaskWorker:
         process_variables: Optional[Dict[str, Any]] = None,
         variables: Optional[List[str]] = None,
     ):
+        """
+        Fetches tasks of topic_name and queues them for execution. Each task takes a task slot, even beyond
+        maxConcurrentTasks.
+        :return: True if tasks were fetched
+        """
+        return await self._fetch_and_execute(topic_name, action, process_variables, variables, held_slots=0)
+
+    async def _fetch_and_execute(
+        self,
+        topic_name: str,
+        action: Callable[[ExternalTask], Any],
+        process_variables: Optional[Dict[str, Any]] = None,
+        variables: Optional[List[str]] = None,
+        held_slots: int = 0,
+    ):
+        """
+        :param held_slots: task slots the caller already holds for the fetched tasks
+        """
         self._log_with_context(
-            f"Fetching and executing external tasks for Topic: {topic_name} "
-            f"with Process variables: {process_variables}",
+            "Fetching and executing external tasks for Topic: %s with Process variables: %s",
+            topic_name, process_variables,
             log_level="debug"
         )
-        resp_json = await self.client.fetch_and_lock([topic_name], process_variables, variables)
+        resp_json = await self._fetch_and_lock(topic_name, process_variables, variables)
+        # the engine locks tasks when it answers a long poll, not when it is sent
+        fetched_at = time.monotonic()
         tasks = self._parse_response(resp_json, topic_name, process_variables)
         if not tasks:
             return False
+        if len(tasks) > held_slots:
+            self.task_slots.hold(topic_name, len(tasks) - held_slots)
 
+        lock_deadline = fetched_at + self._get_lock_duration(topic_name) / 1000
         for task in tasks:
-            # Start processing the task in the background
-            running_task = asyncio.create_task(self._execute_task(task, action))
-            self.running_tasks.add(running_task)
-            # Release semaphore when task is done
-            running_task.add_done_callback(lambda t: self.semaphore.release())
-            # Remove from running_tasks when done
-            running_task.add_done_callback(self.running_tasks.discard)
+            self.task_queue.push(task, action, topic_name, lock_deadline)
+        self._dispatch()
         return True
 
+    def _dispatch(self):
+        """
+        Starts the most important queued tasks while execution slots are free.
+        """
+        if self._stopped:
+            return
+        for queued_task in self.task_queue.pop_expired(time.monotonic()):
+            self._log_with_context("Lock of task %s expired while it was queued, skipping it",
+                                   queued_task.task.get_task_id(), topic=queued_task.topic_name,
+                                   task_id=queued_task.task.get_task_id(), log_level="warning")
+            self.task_slots.release(queued_task.topic_name)
+        while self.task_queue and len(self.running_tasks) < self.max_concurrent_tasks:
+            self._start_task(self.task_queue.pop())
+
+    def _start_task(self, queued_task):
+        # Start processing the task in the background
+        running_task = asyncio.create_task(self._execute_task(queued_task.task, queued_task.action,
+                                                              queued_task.lock_deadline))
+        self.running_tasks.add(running_task)
+        # Release the slot when task is done
+        running_task.add_done_callback(lambda t: self.task_slots.release(queued_task.topic_name))
+        # Remove from running_tasks when done
+        running_task.add_done_callback(self.running_tasks.discard)
+        # and start the next queued task
+        running_task.add_done_callback(lambda t: self._dispatch())
+
+    async def _fetch_and_lock(
+        self,
+        topic_name: str,
+        process_variables: Optional[Dict[str, Any]] = None,
+        variables: Optional[List[str]] = None,
+        **fetch_options: Any,
+    ):
+        if not (self.metrics.enabled or self.recorder.enabled):
+            return await self._request_fetch_and_lock(topic_name, process_variables, variables, **fetch_options)
+
+        start = time.perf_counter()
+        try:
+            resp_json = await self._request_fetch_and_lock(topic_name, process_variables, variables, **fetch_options)
+        except BaseException:
+            self.metrics.inc(metrics.FETCH_ERRORS_TOTAL, topic_name)
+            raise
+        finally:
+            self.metrics.inc(metrics.FETCH_TOTAL, topic_name)
+            self.metrics.observe(metrics.FETCH_DURATION_SECONDS, topic_name, time.perf_counter() - start)
+        self.recorder.record_fetch([topic_name], resp_json, time.perf_counter() - start)
+        if resp_json:
+            self.metrics.inc(metrics.TASKS_FETCHED_TOTAL, topic_name, len(resp_json))
+        else:
+            self.metrics.inc(metrics.FETCH_EMPTY_TOTAL, topic_name)
+        return resp_json
+
+    async def _request_fetch_and_lock(
+        self,
+        topic_name: str,
+        process_variables: Optional[Dict[str, Any]] = None,
+        variables: Optional[List[str]] = None,
+        **fetch_options: Any,
+    ):
+        with self.tracer.start_span(tracing.FETCH_AND_LOCK_SPAN, self._get_fetch_span_attributes(topic_name)) as span:
+            resp_json = await self.client.fetch_and_lock([topic_name], process_variables, variables,
+                                                        topic_options=self.topic_configs, **fetch_options)
+            span.set_attribute("camunda.tasks_count", len(resp_json or []))
+        return resp_json
+
+    def _get_fetch_span_attributes(self, topic_name: str) -> Optional[Dict[str, Any]]:
+        if not self.tracer.enabled:
+            return None
+        return {"camunda.topic": topic_name, "camunda.worker_id": str(self.worker_id)}
+
     def _parse_response(
         self,
         resp_json: List[Dict[str, Any]],
@@ -111,27 +411,33 @@ class AsyncExternalTaskWorker:
         process_variables: Optional[Dict[str, Any]],
     ) -> List[ExternalTask]:
         tasks = [ExternalTask(context) for context in resp_json or []]
+        for task in tasks:
+            task.set_retry_config(self._get_retry_config(task.get_topic_name()))
         tasks_count = len(tasks)
         self._log_with_context(
-            f"{tasks_count} external task(s) found for "
-            f"Topic: {topic_name}, Process variables: {process_variables}",
+            "%s external task(s) found for Topic: %s, Process variables: %s",
+            tasks_count, topic_name, process_variables,
             log_level="debug"
         )
         return tasks
 
-    async def _execute_task(self, task: ExternalTask, action: Callable[[ExternalTask], Any]):
+    async def _execute_task(self, task: ExternalTask, action: Callable[[ExternalTask], Any],
+                            lock_deadline: Optional[float] = None):
+        timeout_seconds = self._get_handler_timeout_seconds(task.get_topic_name(), lock_deadline)
         try:
-            await self.executor.execute_task(task, action)
+            await self.executor.execute_task(task, action, timeout_seconds)
+        except HandlerTimeoutError as e:
+            return await self._handle_handler_timeout(task, e.timeout_seconds)
         except asyncio.CancelledError:
             task_result = task.failure(
                 error_message='Task execution cancelled',
                 error_details='Task was cancelled by the user or system',
-                max_retries=self.config.get('retries', AsyncExternalTaskClient.default_config['retries']),
-                retry_timeout=self.config.get('retryTimeout', AsyncExternalTaskClient.default_config['retryTimeout'])
+                max_retries=self._get_topic_config(task.get_topic_name(), 'retries'),
+                retry_timeout=self._get_topic_config(task.get_topic_name(), 'retryTimeout'),
             )
             await self.executor._handle_task_result(task_result)
             self._log_with_context(
-                f"Task execution cancelled for task_id: {task.get_task_id()}",
+                "Task execution cancelled for task_id: %s", task.get_task_id(),
                 topic=task.get_topic_name(),
                 task_id=task.get_task_id(),
                 log_level="info"
@@ -141,13 +447,13 @@ class AsyncExternalTaskWorker:
             task_result = task.failure(
                 error_message='Task execution failed',
                 error_details='An unexpected error occurred while executing the task',
-                max_retries=self.config.get('retries', AsyncExternalTaskClient.default_config['retries']),
-                retry_timeout=self.config.get('retryTimeout', AsyncExternalTaskClient.default_config['retryTimeout'])
+                max_retries=self._get_topic_config(task.get_topic_name(), 'retries'),
+                retry_timeout=self._get_topic_config(task.get_topic_name(), 'retryTimeout'),
             )
             await self.executor._handle_task_result(task_result)
             self._log_with_context(
-                f"Error when executing task: {get_exception_detail(e)}. "
-                f"Task execution cancelled for task_id: {task.get_task_id()}.",
+                "Error when executing task: %s. Task execution cancelled for task_id: %s.",
+                get_exception_detail(e), task.get_task_id(),
                 topic=task.get_topic_name(),
                 task_id=task.get_task_id(),
                 log_level="error",
@@ -155,27 +461,118 @@ class AsyncExternalTaskWorker:
             )
             return task_result
 
+    def _get_handler_timeout_seconds(self, topic_name: str, lock_deadline: Optional[float]) -> Optional[float]:
+        return get_handler_timeout_seconds(self._get_topic_config(topic_name, 'handlerTimeoutSeconds'),
+                                           self._get_topic_config(topic_name, 'handlerTimeoutMarginSeconds'),
+                                           self._get_lock_duration(topic_name), lock_deadline)
+
+    async def _handle_handler_timeout(self, task: ExternalTask, timeout_seconds: float):
+        """
+        Reports a task whose handler timed out according to handlerTimeoutPolicy: a failure, or an unlock so
+        another worker can fetch the task at once without using up a retry.
+        """
+        topic = task.get_topic_name()
+        policy = self._get_topic_config(topic, 'handlerTimeoutPolicy')
+        self.metrics.inc(metrics.HANDLER_TIMEOUTS_TOTAL, topic)
+        self._log_with_context("Handler timed out after %.3f seconds for task_id: %s, reporting %s",
+                               timeout_seconds, task.get_task_id(), policy,
+                               topic=topic, task_id=task.get_task_id(), log_level="warning")
+        try:
+            if policy == "unlock":
+                await self.client.unlock(task.get_task_id())
+                return None
+            task_result = task.failure(
+                error_message='Handler timed out',
+                error_details=f'Handler did not finish within {timeout_seconds:.3f} seconds',
+                max_retries=self._get_topic_config(topic, 'retries'),
+                retry_timeout=self._get_topic_config(topic, 'retryTimeout'),
+            )
+            await self.executor._handle_task_result(task_result)
+            return task_result
+        except Exception as e:
+            self._log_with_context("Error reporting timed out task: %s", get_exception_detail(e),
+                                   topic=topic, task_id=task.get_task_id(), log_level="error")
+
+    def _get_topic_config(self, topic_name: str, key: str) -> Any:
+        topic_config = self.topic_configs.get(topic_name, {})
+        if key in topic_config:
+            return topic_config[key]
+        return self.config.get(key, AsyncExternalTaskClient.default_config[key])
+
+    def _get_retry_config(self, topic_name: str) -> Dict[str, Any]:
+        return {key: self._get_topic_config(topic_name, key) for key in RETRY_CONFIG_KEYS}
+
     def _log_with_context(
         self,
         msg: str,
+        *args: Any,
         topic: Optional[str] = None,
         task_id: Optional[str] = None,
         log_level: str = "info",
         **kwargs: Any,
     ):
         context = {"WORKER_ID": str(self.worker_id), "TOPIC": topic, "TASK_ID": task_id}
-        log_with_context(msg, context=context, log_level=log_level, **kwargs)
+        log_with_context(msg, context=context, log_level=log_level, args=args, **kwargs)
 
     def _get_sleep_seconds(self) -> int:
         return self.config.get("sleepSeconds", self.DEFAULT_SLEEP_SECONDS)
 
+    def get_occupancy(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: per topic the held tasks (in_flight), of them the locally queued ones, the topic's
+            maxConcurrentTasks and weight and whether its fetch loop waits for a free slot, e.g.
+            {"topicA": {"in_flight": 2, "max_concurrent_tasks": 2, "weight": 1, "waiting": 1, "queued": 0}}
+        """
+        occupancy = self.task_slots.occupancy()
+        queued = self.task_queue.count_by_topic()
+        for topic, topic_occupancy in occupancy.items():
+            topic_occupancy["queued"] = queued.get(topic, 0)
+        return occupancy
+
+    async def drain(self, timeout_seconds: Optional[float] = None):
+        """
+        Stops gracefully: the fetch loops are cancelled at once, aborting outstanding long polls (the engine locks
+        tasks only when it answers), then the running and queued tasks are awaited. Whatever still runs after
+        timeout_seconds is cancelled as by stop().
+        """
+        self._draining = True
+        await self._cancel_subscriptions()
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout_seconds is None else loop.time() + timeout_seconds
+
+        def get_remaining_seconds():
+            return None if deadline is None else max(0.0, deadline - loop.time())
+
+        while self.running_tasks and get_remaining_seconds() != 0:
+            await asyncio.wait(set(self.running_tasks), timeout=get_remaining_seconds())
+
+        if self.running_tasks:
+            self._log_with_context("%s task(s) still running after drain timeout of %s seconds, cancelling them",
+                                   len(self.running_tasks), timeout_seconds, log_level="warning")
+        await self.stop()
+
     async def stop(self):
-        # First, cancel running tasks
+        # First, cancel the fetch loops (subscriptions), aborting outstanding long polls
+        self._stopped = True
+        await self._cancel_subscriptions()
+
+        # Drop the queued tasks, their locks expire in the engine
+        while self.task_queue:
+            self.task_slots.release(self.task_queue.pop().topic_name)
+
+        # Then, cancel running tasks
         for task in self.running_tasks:
             task.cancel()
         await asyncio.gather(*self.running_tasks, return_exceptions=True)
 
-        # Then, cancel the fetch loops (subscriptions)
+        if self._owns_handler_executor:
+            # synchronous handlers still running can't be interrupted, don't wait for them
+            self.handler_executor.shutdown(wait=False)
+
+    async def _cancel_subscriptions(self):
+        for task_stream in list(self._task_streams):
+            task_stream.cancel()
         for task in self.subscriptions:
             task.cancel()
         await asyncio.gather(*self.subscriptions, return_exceptions=True)
@@ -0,0 +1,72 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from camunda.external_task.external_task import ExternalTask, TaskResult
+
+BatchResults = Union[Iterable[TaskResult], Dict[str, TaskResult], None]
+
+
+class BatchHandler:
+    """
+    Marks a handler that processes the tasks of a topic in batches, e.g. to score them with one model call or to
+    insert them with one bulk statement:
+
+        @batch_handler(max_batch_size=50, max_wait_seconds=0.5)
+        def score(tasks):
+            scores = model.predict([task.get_variable("features") for task in tasks])
+            return [task.complete({"score": score}) for task, score in zip(tasks, scores)]
+
+    Both workers collect fetched tasks of a topic until max_batch_size tasks are there or max_wait_seconds passed
+    since the first fetch of the batch, whichever comes first, and call the handler with the list. The handler
+    returns a TaskResult per task, as a list or as a dict by task id; every result is reported on its own, so
+    tasks of a batch may complete, fail or throw a BPMN error independently. Tasks without a result are reported
+    as failures, and so is the whole batch when the handler raises.
+    """
+
+    def __init__(self, handler: Callable[[List[ExternalTask]], BatchResults], max_batch_size: int = 100,
+                 max_wait_seconds: float = 1.0):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        if max_wait_seconds < 0:
+            raise ValueError(f"max_wait_seconds must not be negative, got {max_wait_seconds}")
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+    def __call__(self, tasks: List[ExternalTask]) -> BatchResults:
+        return self.handler(tasks)
+
+
+def batch_handler(max_batch_size: int = 100, max_wait_seconds: float = 1.0):
+    """
+    Decorator turning a function of a list of tasks into a BatchHandler.
+    """
+    def decorator(handler):
+        return BatchHandler(handler, max_batch_size, max_wait_seconds)
+
+    return decorator
+
+
+def get_batch_results(tasks: List[ExternalTask], results: BatchResults, max_retries: int,
+                      retry_timeout: int) -> List[TaskResult]:
+    """
+    :return: the result of every task of the batch, in the order of tasks. Results are matched by task id, so the
+        handler may return them in any order, or for copies of the tasks (e.g. from a process pool); tasks without
+        a result get a failure.
+    """
+    if isinstance(results, dict):
+        results_by_id = dict(results)
+    else:
+        results_by_id = {result.get_task().get_task_id(): result
+                         for result in results or () if isinstance(result, TaskResult)}
+
+    task_results = []
+    for task in tasks:
+        task_result: Optional[Any] = results_by_id.get(task.get_task_id())
+        if not isinstance(task_result, TaskResult):
+            task_result = task.failure(error_message="Batch handler returned no result for the task",
+                                       error_details=f"result: {task_result!r}",
+                                       max_retries=max_retries, retry_timeout=retry_timeout)
+        task_result.task = task
+        task.set_task_result(task_result)
+        task_results.append(task_result)
+    return task_results
@@ -1,6 +1,11 @@
+from camunda.client.external_task_client import ExternalTaskClient
+from camunda.external_task.retry_backoff import RetryBackoff
 from camunda.variables.properties import Properties
 from camunda.variables.variables import Variables
 
+# config keys used by ExternalTask.failure(), set per topic by the workers
+RETRY_CONFIG_KEYS = ("retries", "retryTimeout", "retryBackoff", "retryBackoffFactor", "retryTimeoutMax", "retryJitter")
+
 
 class ExternalTask:
     def __init__(self, context):
@@ -8,6 +13,13 @@ class ExternalTask:
         self._variables = Variables(context.get("variables", {}))
         self._task_result = TaskResult.empty_task_result(task=self)
         self._extProperties = Properties(context.get("extensionProperties", {}))
+        self._retry_config = {}
+
+    def get_context(self):
+        """
+        :return: the raw task json as returned by fetchAndLock
+        """
+        return self._context
 
     def get_worker_id(self):
         return self._context["workerId"]
@@ -30,6 +42,9 @@ class ExternalTask:
     def get_topic_name(self):
         return self._context["topicName"]
 
+    def get_priority(self):
+        return self._context.get("priority") or 0
+
     def get_variable(self, variable_name, with_meta=False):
         return self._variables.get_variable(variable_name, with_meta=with_meta)
 
@@ -52,7 +67,25 @@ class ExternalTask:
         self._task_result = TaskResult.success(self, global_variables, local_variables)
         return self._task_result
 
-    def failure(self, error_message, error_details, max_retries, retry_timeout):
+    def set_retry_config(self, retry_config):
+        """
+        Set by the workers to the RETRY_CONFIG_KEYS of the task's topic config, used by failure() when max_retries
+        or retry_timeout are not given.
+        """
+        self._retry_config = retry_config
+
+    def failure(self, error_message, error_details, max_retries=None, retry_timeout=None, backoff=None):
+        """
+        :param max_retries: retries of a task failing for the first time, by default the retries config of its topic
+        :param retry_timeout: base retry timeout, by default the retryTimeout config of its topic
+        :param backoff: RetryBackoff applied to retry_timeout, by default the one configured for the topic
+        """
+        if max_retries is None:
+            max_retries = self._get_retry_config("retries")
+        if retry_timeout is None:
+            retry_timeout = self._get_retry_config("retryTimeout")
+        if backoff is None:
+            backoff = RetryBackoff.from_config({key: self._get_retry_config(key) for key in RETRY_CONFIG_KEYS})
         retries = self._calculate_retries(max_retries)
         self._task_result = TaskResult.failure(
             self,
@@ -60,9 +93,14 @@ class ExternalTask:
             error_details=error_details,
             retries=retries,
             retry_timeout=retry_timeout,
+            backoff=backoff,
+            max_retries=max_retries,
         )
         return self._task_result
 
+    def _get_retry_config(self, key):
+        return self._retry_config.get(key, ExternalTaskClient.default_config[key])
+
     def _calculate_retries(self, max_retries):
         retries = self._context.get("retries", None)
         retries = int(retries - 1) if retries and retries >= 1 else max_retries
@@ -114,7 +152,13 @@ class TaskResult:
         )
 
     @classmethod
-    def failure(cls, task, error_message, error_details, retries, retry_timeout):
+    def failure(cls, task, error_message, error_details, retries, retry_timeout, backoff=None, max_retries=None):
+        """
+        :param backoff: optional RetryBackoff turning retry_timeout into the timeout of this failure, based on
+            retries and max_retries
+        """
+        if backoff is not None:
+            retry_timeout = backoff.get_retry_timeout(retry_timeout, retries, max_retries)
         return TaskResult(
             task,
             success=False,
@@ -1,36 +1,213 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from camunda.utils.log_utils import log_with_context
+from camunda.external_task.batch import get_batch_results
+from camunda.external_task.handler_timeout import HandlerTimeoutError, call_with_timeout
+from camunda.external_task.memoize import MemoizedHandler
+from camunda.utils import metrics, tracing
+from camunda.utils.log_utils import log_with_context, LazyLogArg
+from camunda.utils.metrics import NOOP_METRICS
+from camunda.utils.recording import NOOP_RECORDER, get_outcome
+from camunda.utils.tracing import NOOP_TRACER
+from camunda.utils.utils import get_exception_detail
 
 logger = logging.getLogger(__name__)
 
 
 class ExternalTaskExecutor:
 
-    def __init__(self, worker_id, external_task_client):
+    def __init__(self, worker_id, external_task_client, metrics=NOOP_METRICS, tracer=NOOP_TRACER,
+                 recorder=NOOP_RECORDER):
         self.worker_id = worker_id
         self.external_task_client = external_task_client
+        self.metrics = metrics
+        self.tracer = tracer
+        self.recorder = recorder
+        self._handler_pool = None  # runs handlers with a timeout, created on first use
+        self._handler_pool_lock = threading.Lock()
+        self.abandoned_handlers = 0
 
-    def execute_task(self, task, action):
+    def shutdown(self):
+        """
+        Shuts down the pool running handlers with a timeout without waiting for abandoned handlers.
+        """
+        with self._handler_pool_lock:
+            handler_pool, self._handler_pool = self._handler_pool, None
+        if handler_pool is not None:
+            handler_pool.shutdown(wait=False)
+
+    def execute_task(self, task, action, timeout_seconds=None):
+        """
+        :param timeout_seconds: optional time limit of the handler, HandlerTimeoutError is raised when it's exceeded.
+            Handlers with a time limit run on a thread pool of the executor, others on the calling thread
+        """
         topic = task.get_topic_name()
         task_id = task.get_task_id()
-        self._log_with_context(f"Executing external task for Topic: {topic}", task_id=task_id)
-        task_result = action(task)
-        # in case task result is not set inside action function, set it in task here
-        task.set_task_result(task_result)
-        self._handle_task_result(task_result)
+        self._log_with_context("Executing external task for Topic: %s", topic, task_id=task_id)
+        self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, 1)
+        try:
+            with self.tracer.start_span(tracing.EXECUTE_TASK_SPAN, self._get_span_attributes(task)):
+                if isinstance(action, MemoizedHandler):
+                    task_result = self._run_memoized_action(task, action, timeout_seconds)
+                else:
+                    task_result = self._run_action(task, action, timeout_seconds)
+                # in case task result is not set inside action function, set it in task here
+                task.set_task_result(task_result)
+                self._handle_task_result(task_result)
+                return task_result
+        finally:
+            self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, -1)
+
+    def _run_memoized_action(self, task, memoized_handler, timeout_seconds=None):
+        task_result = memoized_handler.get_cached_result(task)
+        if task_result is not None:
+            self.metrics.inc(metrics.MEMO_HITS_TOTAL, task.get_topic_name())
+            self._log_with_context("Completing task with memoized result", task_id=task.get_task_id(),
+                                   log_level='debug')
+            return task_result
+        self.metrics.inc(metrics.MEMO_MISSES_TOTAL, task.get_topic_name())
+        task_result = self._run_action(task, memoized_handler.handler, timeout_seconds)
+        memoized_handler.store_result(task_result)
         return task_result
 
+    def _run_action(self, task, action, timeout_seconds=None):
+        if not (self.metrics.enabled or self.recorder.enabled):
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_span_attributes(task)):
+                return self._call_action(task, action, timeout_seconds)
+
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_span_attributes(task)):
+                task_result = self._call_action(task, action, timeout_seconds)
+                outcome = get_outcome(task_result)
+                return task_result
+        except BaseException as e:
+            if isinstance(e, HandlerTimeoutError):
+                outcome = "timeout"
+            self.metrics.inc(metrics.HANDLER_ERRORS_TOTAL, task.get_topic_name())
+            raise
+        finally:
+            duration_seconds = time.perf_counter() - start
+            self.metrics.observe(metrics.HANDLER_DURATION_SECONDS, task.get_topic_name(), duration_seconds)
+            self.recorder.record_handler(task, duration_seconds, outcome)
+
+    def _call_action(self, task, action, timeout_seconds):
+        if timeout_seconds is None:
+            return action(task)
+        try:
+            return call_with_timeout(self._get_handler_pool(), action, task, timeout_seconds)
+        except HandlerTimeoutError as e:
+            if e.abandoned:
+                self._replace_handler_pool()
+            raise
+
+    def _replace_handler_pool(self):
+        """
+        Gives up the pool whose thread is taken by an abandoned handler, the next handler gets a fresh one. The
+        abandoned thread ends when its handler returns.
+        """
+        self.abandoned_handlers += 1
+        self._log_with_context("Abandoned a timed out handler, %s so far, running the next ones on a new thread",
+                               self.abandoned_handlers, log_level='warning')
+        self.shutdown()
+
+    def _get_handler_pool(self):
+        with self._handler_pool_lock:
+            if self._handler_pool is None:
+                # handlers run one at a time, a pool with an abandoned handler is replaced
+                self._handler_pool = ThreadPoolExecutor(max_workers=1,
+                                                        thread_name_prefix=f"camunda-handler-{self.worker_id}")
+            return self._handler_pool
+
+    def execute_batch(self, tasks, batch_handler, max_retries, retry_timeout):
+        """
+        Runs a BatchHandler on tasks of one topic and reports the result of every task on its own. A report that
+        fails is logged and doesn't keep the other results of the batch from being reported.
+        :return: the result of every task, in the order of tasks
+        """
+        topic = tasks[0].get_topic_name()
+        self._log_with_context("Executing batch of %s external tasks for Topic: %s", len(tasks), topic)
+        self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, len(tasks))
+        try:
+            try:
+                results = self._run_batch_handler(tasks, batch_handler)
+            except Exception as e:
+                self._log_with_context("Batch handler failed for Topic: %s: %s", topic, get_exception_detail(e),
+                                       log_level='error', exc_info=True)
+                results = [task.failure(error_message="Batch handler failed", error_details=get_exception_detail(e),
+                                        max_retries=max_retries, retry_timeout=retry_timeout) for task in tasks]
+            task_results = get_batch_results(tasks, results, max_retries, retry_timeout)
+            for task_result in task_results:
+                try:
+                    self._handle_task_result(task_result)
+                except Exception as e:
+                    self._log_with_context("Error reporting result of batch task: %s", get_exception_detail(e),
+                                           task_id=task_result.get_task().get_task_id(), log_level='error')
+            return task_results
+        finally:
+            self.metrics.add(metrics.TASKS_IN_FLIGHT, topic, -len(tasks))
+
+    def _run_batch_handler(self, tasks, batch_handler):
+        if not self.metrics.enabled:
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_batch_span_attributes(tasks)):
+                return batch_handler(tasks)
+
+        topic = tasks[0].get_topic_name()
+        start = time.perf_counter()
+        try:
+            with self.tracer.start_span(tracing.HANDLER_SPAN, self._get_batch_span_attributes(tasks)):
+                return batch_handler(tasks)
+        except BaseException:
+            self.metrics.inc(metrics.HANDLER_ERRORS_TOTAL, topic)
+            raise
+        finally:
+            self.metrics.observe(metrics.HANDLER_DURATION_SECONDS, topic, time.perf_counter() - start)
+
+    def _get_batch_span_attributes(self, tasks):
+        if not self.tracer.enabled:
+            return None
+        return {"camunda.topic": tasks[0].get_topic_name(), "camunda.worker_id": str(self.worker_id),
+                "camunda.batch_size": len(tasks)}
+
+    def _get_span_attributes(self, task):
+        # skip building attributes nobody reads when tracing is disabled
+        return tracing.get_task_span_attributes(task) if self.tracer.enabled else None
+
     def _handle_task_result(self, task_result):
         task = task_result.get_task()
         topic = task.get_topic_name()
         task_id = task.get_task_id()
+        if not self.metrics.enabled:
+            with self.tracer.start_span(tracing.REPORT_SPAN, self._get_span_attributes(task)) as span:
+                self._report_task_result(task_id, task_result, topic, span)
+            return
+
+        start = time.perf_counter()
+        try:
+            with self.tracer.start_span(tracing.REPORT_SPAN, self._get_span_attributes(task)) as span:
+                self._report_task_result(task_id, task_result, topic, span)
+        except BaseException:
+            self.metrics.inc(metrics.REPORT_ERRORS_TOTAL, topic)
+            raise
+        finally:
+            self.metrics.observe(metrics.REPORT_DURATION_SECONDS, topic, time.perf_counter() - start)
+
+    def _report_task_result(self, task_id, task_result, topic, span):
         if task_result.is_success():
+            span.set_attribute("camunda.result", "complete")
             self._handle_task_success(task_id, task_result, topic)
+            self.metrics.inc(metrics.TASKS_COMPLETED_TOTAL, topic)
         elif task_result.is_bpmn_error():
+            span.set_attribute("camunda.result", "bpmn_error")
             self._handle_task_bpmn_error(task_id, task_result, topic)
+            self.metrics.inc(metrics.TASKS_BPMN_ERROR_TOTAL, topic)
         elif task_result.is_failure():
+            span.set_attribute("camunda.result", "failure")
             self._handle_task_failure(task_id, task_result, topic)
+            self.metrics.inc(metrics.TASKS_FAILED_TOTAL, topic)
         else:
             err_msg = f"task result for task_id={task_id} must be either complete/failure/BPMNError"
             self._log_with_context(err_msg, task_id=task_id, log_level='warning')
@@ -49,25 +226,29 @@ class ExternalTaskExecutor:
         return cleaned
 
     def _handle_task_success(self, task_id, task_result, topic):
-        self._log_with_context(f"Marking task complete for Topic: {topic}", task_id)
+        self._log_with_context("Marking task complete for Topic: %s", topic, task_id=task_id)
         if self.external_task_client.complete(task_id, task_result.global_variables, task_result.local_variables):
-            self._log_with_context(f"Marked task completed - Topic: {topic} "
-                                   f"global_variables: {self._strip_long_variables(task_result.global_variables)} "
-                                   f"local_variables: {self._strip_long_variables(task_result.local_variables)}", task_id)
+            self._log_with_context("Marked task completed - Topic: %s global_variables: %s local_variables: %s",
+                                   topic,
+                                   LazyLogArg(self._strip_long_variables, task_result.global_variables),
+                                   LazyLogArg(self._strip_long_variables, task_result.local_variables),
+                                   task_id=task_id)
         else:
-            self._log_with_context(f"Not able to mark task completed - Topic: {topic} "
-                                   f"global_variables: {self._strip_long_variables(task_result.global_variables)} "
-                                   f"local_variables: {self._strip_long_variables(task_result.local_variables)}", task_id)
+            self._log_with_context("Not able to mark task completed - Topic: %s global_variables: %s local_variables: %s",
+                                   topic,
+                                   LazyLogArg(self._strip_long_variables, task_result.global_variables),
+                                   LazyLogArg(self._strip_long_variables, task_result.local_variables),
+                                   task_id=task_id)
             raise Exception(f"Not able to mark complete for task_id={task_id} "
                             f"for topic={topic}, worker_id={self.worker_id}")
 
     def _handle_task_failure(self, task_id, task_result, topic):
-        self._log_with_context(f"Marking task failed - Topic: {topic} task_result: {task_result}", task_id)
+        self._log_with_context("Marking task failed - Topic: %s task_result: %s", topic, task_result, task_id=task_id)
         if self.external_task_client.failure(task_id, task_result.error_message, task_result.error_details,
                                              task_result.retries, task_result.retry_timeout):
-            self._log_with_context(f"Marked task failed - Topic: {topic} task_result: {task_result}", task_id)
+            self._log_with_context("Marked task failed - Topic: %s task_result: %s", topic, task_result, task_id=task_id)
         else:
-            self._log_with_context(f"Not able to mark task failure - Topic: {topic}", task_id=task_id)
+            self._log_with_context("Not able to mark task failure - Topic: %s", topic, task_id=task_id)
             raise Exception(f"Not able to mark failure for task_id={task_id} "
                             f"for topic={topic}, worker_id={self.worker_id}")
 
@@ -76,13 +257,13 @@ class ExternalTaskExecutor:
                                                                     task_result.error_message,
                                                                     task_result.global_variables)
         if bpmn_error_handled:
-            self._log_with_context(f"BPMN Error Handled: {bpmn_error_handled} "
-                                   f"Topic: {topic} task_result: {task_result}")
+            self._log_with_context("BPMN Error Handled: %s Topic: %s task_result: %s",
+                                   bpmn_error_handled, topic, task_result, task_id=task_id)
         else:
-            self._log_with_context(f"Not able to mark BPMN error - Topic: {topic}", task_id=task_id)
+            self._log_with_context("Not able to mark BPMN error - Topic: %s", topic, task_id=task_id)
             raise Exception(f"Not able to mark BPMN Error for task_id={task_id} "
                             f"for topic={topic}, worker_id={self.worker_id}")
 
-    def _log_with_context(self, msg, task_id=None, log_level='info', **kwargs):
+    def _log_with_context(self, msg, *args, task_id=None, log_level='info', **kwargs):
         context = {"WORKER_ID": self.worker_id, "TASK_ID": task_id}
-        log_with_context(msg, context=context, log_level=log_level, **kwargs)
+        log_with_context(msg, context=context, log_level=log_level, args=args, **kwargs)
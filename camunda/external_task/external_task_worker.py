@@ -1,29 +1,83 @@
+import threading
 import time
+from collections import Counter
 
 from camunda.client.external_task_client import ExternalTaskClient, ENGINE_LOCAL_BASE_URL
-from camunda.external_task.external_task import ExternalTask
+from camunda.external_task.batch import BatchHandler
+from camunda.external_task.external_task import ExternalTask, RETRY_CONFIG_KEYS
 from camunda.external_task.external_task_executor import ExternalTaskExecutor
-from camunda.utils.log_utils import log_with_context
+from camunda.external_task.retry_backoff import RetryBackoff
+from camunda.external_task.handler_timeout import (HandlerTimeoutError, get_handler_timeout_seconds,
+                                                   validate_handler_timeout_policy)
+from camunda.external_task.task_stream import iterate_tasks
+from camunda.utils import metrics, tracing
+from camunda.utils.log_utils import log_with_context, LazyLogArg
 from camunda.utils.auth_basic import obfuscate_password
-from camunda.utils.utils import get_exception_detail
+from camunda.utils.metrics import NOOP_METRICS
+from camunda.utils.recording import NOOP_RECORDER
+from camunda.utils.tracing import NOOP_TRACER
+from camunda.utils.utils import get_exception_detail, join, str_to_list
 
 
 class ExternalTaskWorker:
     DEFAULT_SLEEP_SECONDS = 300
 
-    def __init__(self, worker_id, base_url=ENGINE_LOCAL_BASE_URL, config=None):
+    def __init__(self, worker_id, base_url=ENGINE_LOCAL_BASE_URL, config=None, metrics=NOOP_METRICS,
+                 tracer=NOOP_TRACER, recorder=NOOP_RECORDER):
+        """
+        :param recorder: optional TaskRecorder writing the fetched tasks and handler timings to a file
+        """
         config = config if config is not None else {}  # To avoid to have a mutable default for a parameter
         self.worker_id = worker_id
+        self.metrics = metrics
+        self.tracer = tracer
+        self.recorder = recorder
         self.client = ExternalTaskClient(self.worker_id, base_url, config)
-        self.executor = ExternalTaskExecutor(self.worker_id, self.client)
+        self.executor = ExternalTaskExecutor(self.worker_id, self.client, metrics=metrics, tracer=tracer,
+                                             recorder=recorder)
         self.config = config
-        self._log_with_context(f"Created new External Task Worker with config: {obfuscate_password(self.config)}")
+        self.topic_configs = {}
+        validate_handler_timeout_policy(self.client.config["handlerTimeoutPolicy"])
+        RetryBackoff.from_config(self.client.config)  # raises ValueError for an invalid retry backoff config
+        self._stop_event = threading.Event()
+        self._log_with_context("Created new External Task Worker with config: %s",
+                               LazyLogArg(obfuscate_password, self.config))
 
-    def subscribe(self, topic_names, action, process_variables=None, variables=None):
-        while True:
+    def subscribe(self, topic_names, action, process_variables=None, variables=None, topic_configs=None):
+        """
+        Fetches and executes tasks of topic_names until stop() is called. With a BatchHandler as action the
+        fetched tasks are collected into batches per topic, see BatchHandler.
+        :param topic_configs: optional per topic settings overriding the worker config, e.g.
+            {"slowTopic": {"lockDuration": 1200000, "retries": 5, "retryTimeout": 60000, "retryBackoff": "exponential",
+                           "handlerTimeoutSeconds": 600, "handlerTimeoutPolicy": "unlock"},
+             "tenantTopic": {"tenantIdIn": ["tenant1", "tenant2"]}}: the fetch filters in FETCH_FILTERS narrow
+            down the tasks fetched for the topic, see also camunda.external_task.sharding
+        """
+        for topic_config in (topic_configs or {}).values():
+            if "handlerTimeoutPolicy" in topic_config:
+                validate_handler_timeout_policy(topic_config["handlerTimeoutPolicy"])
+            RetryBackoff.from_config({**self.client.config, **topic_config})
+        self.topic_configs = topic_configs or {}
+        while not self._stop_event.is_set():
             self._fetch_and_execute_safe(topic_names, action, process_variables, variables)
 
-        self._log_with_context("Stopping worker")  # Fixme: This code seems to be unreachable?
+        self.executor.shutdown()
+        self._log_with_context("Stopping worker")
+
+    def tasks(self, topic_names, process_variables=None, variables=None, buffer_size=None):
+        """
+        Consumes tasks without a handler: `for task in worker.tasks("topicA")` yields LockedTasks with their lock
+        deadline, to be reported with their complete(), failure() or bpmn_error() methods. Up to buffer_size
+        (default maxTasks) tasks are fetched whenever the buffer is empty; the iteration ends after stop().
+        """
+        return iterate_tasks(self, topic_names, process_variables, variables, buffer_size)
+
+    def stop(self):
+        """
+        Makes subscribe() return once the current fetch and the tasks it fetched are done. Safe to call from
+        signal handlers and other threads.
+        """
+        self._stop_event.set()
 
     def _fetch_and_execute_safe(
         self, topic_names, action, process_variables=None, variables=None
@@ -31,58 +85,182 @@ class ExternalTaskWorker:
         try:
             self.fetch_and_execute(topic_names, action, process_variables, variables)
         except NoExternalTaskFound:
-            self._log_with_context(f"no External Task found for Topics: {topic_names}, "
-                                   f"Process variables: {process_variables}", topic=topic_names)
+            self._log_with_context("no External Task found for Topics: %s, Process variables: %s",
+                                   topic_names, process_variables, topic=topic_names)
         except BaseException as e:
             sleep_seconds = self._get_sleep_seconds()
-            self._log_with_context(f'error fetching and executing tasks: {get_exception_detail(e)} '
-                                   f'for topic(s)={topic_names} with Process variables: {process_variables}. '
-                                   f'retrying after {sleep_seconds} seconds', exc_info=True)
-            time.sleep(sleep_seconds)
+            self._log_with_context('error fetching and executing tasks: %s for topic(s)=%s with Process variables: %s. '
+                                   'retrying after %s seconds', get_exception_detail(e), topic_names,
+                                   process_variables, sleep_seconds, exc_info=True)
+            self._stop_event.wait(sleep_seconds)
 
     def fetch_and_execute(self, topic_names, action, process_variables=None, variables=None):
-        self._log_with_context(f"Fetching and Executing external tasks for Topics: {topic_names} "
-                               f"with Process variables: {process_variables}")
+        self._log_with_context("Fetching and Executing external tasks for Topics: %s with Process variables: %s",
+                               topic_names, process_variables)
+        if isinstance(action, BatchHandler):
+            return self._fetch_and_execute_batches(topic_names, action, process_variables, variables)
         resp_json = self._fetch_and_lock(topic_names, process_variables, variables)
+        # the engine locks tasks when it answers a long poll, not when it is sent
+        fetched_at = time.monotonic()
         tasks = self._parse_response(resp_json, topic_names, process_variables)
         if len(tasks) == 0:
             raise NoExternalTaskFound(f"no External Task found for Topics: {topic_names}, "
                                       f"Process variables: {process_variables}")
-        self._execute_tasks(tasks, action)
+        self._execute_tasks(tasks, action, fetched_at)
+
+    def _fetch_and_execute_batches(self, topic_names, batch_handler, process_variables=None, variables=None):
+        """
+        Fetches until a topic has max_batch_size tasks or max_wait_seconds passed, then runs the batch of every
+        topic. Long polls are shortened to the time left, so a batch is never held back longer than that.
+        """
+        batches = {}
+        deadline = time.monotonic() + batch_handler.max_wait_seconds
+        long_polling_millis = self.client.config["asyncResponseTimeout"]
+        while not self._stop_event.is_set():
+            largest_batch_size = max(map(len, batches.values()), default=0)
+            remaining_millis = int((deadline - time.monotonic()) * 1000)
+            if largest_batch_size >= batch_handler.max_batch_size or (batches and remaining_millis <= 0):
+                break
+            resp_json = self._fetch_and_lock(topic_names, process_variables, variables,
+                                             max_tasks=batch_handler.max_batch_size - largest_batch_size,
+                                             async_response_timeout=max(0, min(long_polling_millis, remaining_millis)))
+            tasks = self._parse_response(resp_json, topic_names, process_variables)
+            for task in tasks:
+                batches.setdefault(task.get_topic_name(), []).append(task)
+            if not tasks and (not long_polling_millis or remaining_millis <= 0):
+                break  # the engine answers at once without long polling, don't poll it in a tight loop
 
-    def _fetch_and_lock(self, topic_names, process_variables=None, variables=None):
-        self._log_with_context(f"Fetching and Locking external tasks for Topics: {topic_names} "
-                               f"with Process variables: {process_variables}")
-        return self.client.fetch_and_lock(topic_names, process_variables, variables)
+        if not batches:
+            raise NoExternalTaskFound(f"no External Task found for Topics: {topic_names}, "
+                                      f"Process variables: {process_variables}")
+        for tasks in batches.values():
+            for start in range(0, len(tasks), batch_handler.max_batch_size):
+                self._execute_batch(tasks[start:start + batch_handler.max_batch_size], batch_handler)
+
+    def _execute_batch(self, tasks, batch_handler):
+        topic = tasks[0].get_topic_name()
+        max_retries = self._get_topic_config(topic, "retries")
+        retry_timeout = self._get_topic_config(topic, "retryTimeout")
+        self.executor.execute_batch(tasks, batch_handler, max_retries, retry_timeout)
+
+    def _fetch_and_lock(self, topic_names, process_variables=None, variables=None, **fetch_options):
+        self._log_with_context("Fetching and Locking external tasks for Topics: %s with Process variables: %s",
+                               topic_names, process_variables)
+        if not (self.metrics.enabled or self.recorder.enabled):
+            return self._request_fetch_and_lock(topic_names, process_variables, variables, **fetch_options)
+
+        topic = join(str_to_list(topic_names), ',')
+        start = time.perf_counter()
+        try:
+            resp_json = self._request_fetch_and_lock(topic_names, process_variables, variables, **fetch_options)
+        except BaseException:
+            self.metrics.inc(metrics.FETCH_ERRORS_TOTAL, topic)
+            raise
+        finally:
+            self.metrics.inc(metrics.FETCH_TOTAL, topic)
+            self.metrics.observe(metrics.FETCH_DURATION_SECONDS, topic, time.perf_counter() - start)
+        self.recorder.record_fetch(str_to_list(topic_names), resp_json, time.perf_counter() - start)
+        if resp_json:
+            for topic_name, count in Counter(task.get("topicName") for task in resp_json).items():
+                self.metrics.inc(metrics.TASKS_FETCHED_TOTAL, topic_name, count)
+        else:
+            self.metrics.inc(metrics.FETCH_EMPTY_TOTAL, topic)
+        return resp_json
+
+    def _request_fetch_and_lock(self, topic_names, process_variables=None, variables=None, **fetch_options):
+        with self.tracer.start_span(tracing.FETCH_AND_LOCK_SPAN, self._get_fetch_span_attributes(topic_names)) as span:
+            resp_json = self.client.fetch_and_lock(topic_names, process_variables, variables,
+                                                   topic_options=self.topic_configs, **fetch_options)
+            span.set_attribute("camunda.tasks_count", len(resp_json or []))
+        return resp_json
+
+    def _get_fetch_span_attributes(self, topic_names):
+        if not self.tracer.enabled:
+            return None
+        return {"camunda.topic": join(str_to_list(topic_names), ','), "camunda.worker_id": str(self.worker_id)}
 
     def _parse_response(self, resp_json, topic_names, process_variables):
         tasks = []
         if resp_json:
             for context in resp_json:
                 task = ExternalTask(context)
+                task.set_retry_config(self._get_retry_config(task.get_topic_name()))
                 tasks.append(task)
 
         tasks_count = len(tasks)
-        self._log_with_context(f"{tasks_count} External task(s) found for "
-                               f"Topics: {topic_names}, Process variables: {process_variables}")
+        self._log_with_context("%s External task(s) found for Topics: %s, Process variables: %s",
+                               tasks_count, topic_names, process_variables)
         return tasks
 
-    def _execute_tasks(self, tasks, action):
-        for task in tasks:
-            self._execute_task(task, action)
+    def _execute_tasks(self, tasks, action, fetched_at=None):
+        """
+        :param fetched_at: time.monotonic() when the fetch response arrived, the lock of each task ends lockDuration
+            of its topic later
+        """
+        # most important first, tasks of equal priority in fetch order
+        for task in sorted(tasks, key=lambda task: -task.get_priority()):
+            lock_deadline = None
+            if fetched_at is not None:
+                lock_deadline = fetched_at + self._get_lock_duration(task.get_topic_name()) / 1000
+            self._execute_task(task, action, lock_deadline)
 
-    def _execute_task(self, task, action):
+    def _execute_task(self, task, action, lock_deadline=None):
+        """
+        :param lock_deadline: time.monotonic() based end of the task's lock, bounding the handler's run time when
+            handlerTimeoutSeconds is set; without it the handler runs inline on this thread
+        """
+        topic = task.get_topic_name()
+        timeout_seconds = None
+        handler_timeout_seconds = self._get_topic_config(topic, "handlerTimeoutSeconds")
+        if handler_timeout_seconds:
+            timeout_seconds = get_handler_timeout_seconds(handler_timeout_seconds,
+                                                          self._get_topic_config(topic, "handlerTimeoutMarginSeconds"),
+                                                          self._get_lock_duration(topic), lock_deadline)
         try:
-            self.executor.execute_task(task, action)
+            self.executor.execute_task(task, action, timeout_seconds)
+        except HandlerTimeoutError as e:
+            self._handle_handler_timeout(task, e.timeout_seconds)
         except Exception as e:
-            self._log_with_context(f'error when executing task: {get_exception_detail(e)}',
+            self._log_with_context('error when executing task: %s', get_exception_detail(e),
                                    topic=task.get_topic_name(), task_id=task.get_task_id(),
                                    log_level='error', exc_info=True)
             raise e
 
-    def _log_with_context(self, msg, topic=None, task_id=None, log_level='info', **kwargs):
+    def _handle_handler_timeout(self, task, timeout_seconds):
+        """
+        Reports a task whose handler timed out according to handlerTimeoutPolicy: a failure, or an unlock so
+        another worker can fetch the task at once without using up a retry. The handler's thread is abandoned.
+        """
+        topic = task.get_topic_name()
+        policy = self._get_topic_config(topic, "handlerTimeoutPolicy")
+        self.metrics.inc(metrics.HANDLER_TIMEOUTS_TOTAL, topic)
+        self._log_with_context('handler timed out after %.3f seconds, reporting %s', timeout_seconds, policy,
+                               topic=topic, task_id=task.get_task_id(), log_level='warning')
+        try:
+            if policy == "unlock":
+                self.client.unlock(task.get_task_id())
+                return
+            task_result = task.failure(error_message='Handler timed out',
+                                       error_details=f'Handler did not finish within {timeout_seconds:.3f} seconds',
+                                       max_retries=self._get_topic_config(topic, "retries"),
+                                       retry_timeout=self._get_topic_config(topic, "retryTimeout"))
+            self.executor._handle_task_result(task_result)
+        except Exception as e:  # the other fetched tasks still run
+            self._log_with_context('error reporting timed out task: %s', get_exception_detail(e),
+                                   topic=topic, task_id=task.get_task_id(), log_level='error')
+
+    def _get_topic_config(self, topic_name, key):
+        return self.topic_configs.get(topic_name, {}).get(key, self.client.config[key])
+
+    def _get_lock_duration(self, topic_name):
+        return self._get_topic_config(topic_name, "lockDuration")
+
+    def _get_retry_config(self, topic_name):
+        return {key: self._get_topic_config(topic_name, key) for key in RETRY_CONFIG_KEYS}
+
+    def _log_with_context(self, msg, *args, topic=None, task_id=None, log_level='info', **kwargs):
         context = {"WORKER_ID": str(self.worker_id), "TOPIC": topic, "TASK_ID": task_id}
-        log_with_context(msg, context=context, log_level=log_level, **kwargs)
+        log_with_context(msg, context=context, log_level=log_level, args=args, **kwargs)
 
     def _get_sleep_seconds(self):
         return self.config.get("sleepSeconds", self.DEFAULT_SLEEP_SECONDS)
@@ -0,0 +1,58 @@
+import concurrent.futures
+import contextvars
+import time
+from concurrent.futures import Executor
+from typing import Optional
+
+HANDLER_TIMEOUT_POLICIES = ("failure", "unlock")
+
+
+class HandlerTimeoutError(Exception):
+    def __init__(self, timeout_seconds, abandoned=False):
+        """
+        :param abandoned: whether the handler still runs on a pool thread that was given up
+        """
+        super().__init__(f"handler did not finish within {timeout_seconds:.3f} seconds")
+        self.timeout_seconds = timeout_seconds
+        self.abandoned = abandoned
+
+
+def get_handler_timeout_seconds(timeout_seconds: Optional[float], margin_seconds: float, lock_duration_millis: int,
+                                lock_deadline: Optional[float], now: Optional[float] = None) -> Optional[float]:
+    """
+    :param timeout_seconds: the handlerTimeoutSeconds config: None to bound handlers by the lock only, 0 to disable
+    :param lock_deadline: time.monotonic() based end of the task's lock, None if unknown
+    :return: seconds the handler may run, at most the remaining lock time minus the margin (capped at half the lock
+        duration, so short locks leave room for the handler), None for no timeout
+    """
+    if timeout_seconds == 0:
+        return None
+    if lock_deadline is None:
+        return timeout_seconds
+    now = time.monotonic() if now is None else now
+    margin_seconds = min(margin_seconds, lock_duration_millis / 1000 / 2)
+    remaining_seconds = max(0.0, lock_deadline - now - margin_seconds)
+    return remaining_seconds if timeout_seconds is None else min(timeout_seconds, remaining_seconds)
+
+
+def validate_handler_timeout_policy(policy: str):
+    if policy not in HANDLER_TIMEOUT_POLICIES:
+        raise ValueError(f"handlerTimeoutPolicy must be one of {HANDLER_TIMEOUT_POLICIES}, got {policy!r}")
+
+
+def call_with_timeout(executor: Executor, func, arg, timeout_seconds: float):
+    """
+    Calls func(arg) on executor, a thread pool, and waits at most timeout_seconds for it. A thread can't be
+    interrupted, so on a timeout the call is abandoned: it keeps its pool thread until func returns, but nobody waits
+    for it any more. Callers should replace a pool with abandoned calls, or it fills up with them.
+    :raises HandlerTimeoutError: if func didn't return in time, with abandoned set if func had started
+    """
+    if timeout_seconds <= 0:
+        raise HandlerTimeoutError(timeout_seconds)  # no time left, don't start a call that would be abandoned
+    # keep the context, e.g. the current tracing span, in the pool thread
+    future = executor.submit(contextvars.copy_context().run, func, arg)
+    try:
+        return future.result(timeout_seconds)
+    except concurrent.futures.TimeoutError:
+        abandoned = not future.cancel()  # a call that didn't start yet is cancelled
+        raise HandlerTimeoutError(timeout_seconds, abandoned) from None
@@ -0,0 +1,104 @@
+import json
+import threading
+from typing import Any, Callable, List, Optional
+
+from camunda.external_task.external_task import ExternalTask, TaskResult
+from camunda.utils.log_utils import log_with_context
+from camunda.utils.ttl_cache import TTLCache
+from camunda.utils.utils import get_exception_detail
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_SIZE = 10000
+
+
+class MemoizedHandler:
+    """
+    Caches the results of a handler that is a pure function of a few input variables, e.g. an address
+    normalization or a rate lookup:
+
+        normalize = MemoizedHandler(normalize_address, key_variables=["street", "zipCode"])
+        worker.subscribe("normalizeAddress", normalize)
+
+    The executors look up the values of key_variables in the cache before running the handler; on a hit the
+    task completes with the cached global and local variables without calling the handler. Only completions
+    are cached, failures and BPMN errors are not. Tasks missing a key variable, or with a value that isn't plain
+    JSON, bypass the cache: the handler runs and its result isn't stored.
+
+    cache is any object with get(key, default) and set(key, value): by default an in-memory TTLCache of
+    DEFAULT_MAX_SIZE entries expiring after DEFAULT_TTL_SECONDS, or a DiskCache shared by worker processes and
+    surviving restarts. Keys start with name (the handler's qualified name by default), so handlers can share a
+    cache. Errors of the cache are logged and treated as misses. hits and misses count lookups; the executors
+    also record them as the memo_hits_total and memo_misses_total metrics.
+    """
+
+    def __init__(self, handler: Callable[[ExternalTask], Any], key_variables: List[str], cache=None,
+                 name: Optional[str] = None):
+        self.handler = handler
+        self.key_variables = list(key_variables)
+        self.cache = cache if cache is not None else TTLCache(DEFAULT_TTL_SECONDS, max_size=DEFAULT_MAX_SIZE)
+        self.name = name or f"{getattr(handler, '__module__', '')}.{getattr(handler, '__qualname__', handler)}"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, task: ExternalTask):
+        task_result = self.get_cached_result(task)
+        if task_result is None:
+            task_result = self.handler(task)
+            self.store_result(task_result)
+        return task_result
+
+    def get_key(self, task: ExternalTask) -> Optional[str]:
+        """
+        :return: the cache key of task, None if it can't be cached: a key variable is missing, or its value isn't
+            plain JSON (stringifying it could give different values the same key)
+        """
+        values = []
+        for name in self.key_variables:
+            variable = task.get_variable(name, with_meta=True)
+            if variable is None:
+                return None
+            values.append(variable.get("value"))
+        try:
+            return json.dumps([self.name, values], sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def get_hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_cached_result(self, task: ExternalTask) -> Optional[TaskResult]:
+        """
+        :return: a complete result with the cached variables, None on a miss
+        """
+        key = self.get_key(task)
+        try:
+            cached = self.cache.get(key) if key is not None else None
+        except Exception as e:
+            self._log("Memoization cache lookup failed: %s", get_exception_detail(e), task, log_level="warning")
+            cached = None
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return TaskResult.success(task, dict(cached["global_variables"]), dict(cached["local_variables"]))
+
+    def store_result(self, task_result: Any):
+        if not isinstance(task_result, TaskResult) or not task_result.is_success():
+            return
+        task = task_result.get_task()
+        key = self.get_key(task)
+        if key is None:
+            return
+        try:
+            self.cache.set(key, {"global_variables": task_result.global_variables,
+                                                "local_variables": task_result.local_variables})
+        except Exception as e:
+            self._log("Memoization cache update failed: %s", get_exception_detail(e), task, log_level="warning")
+
+    @staticmethod
+    def _log(msg, detail, task, log_level):
+        context = {"TOPIC": task.get_topic_name(), "TASK_ID": task.get_task_id()}
+        log_with_context(msg, context=context, log_level=log_level, args=(detail,))
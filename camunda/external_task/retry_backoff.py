@@ -0,0 +1,58 @@
+import random
+from typing import Any, Dict, Optional
+
+RETRY_BACKOFF_STRATEGIES = ("fixed", "exponential")
+RETRY_JITTER_MODES = ("none", "full", "equal")
+
+
+class RetryBackoff:
+    """
+    Computes the retry timeout of a failing task from the number of times it failed before, derived from its
+    remaining retries and max_retries:
+
+        fixed:       retry_timeout on every failure
+        exponential: retry_timeout * factor ** previous_failures, e.g. 1s, 2s, 4s, 8s with a factor of 2
+
+    capped at max_retry_timeout if set. jitter spreads retries of tasks failing together: "full" picks a random
+    timeout between 0 and the computed one, "equal" between half of it and all of it.
+    Workers build one per topic from the retryBackoff, retryBackoffFactor, retryTimeoutMax and retryJitter config.
+    """
+
+    def __init__(self, strategy: str = "fixed", factor: float = 2, max_retry_timeout: Optional[int] = None,
+                 jitter: str = "none", random_func=random.random):
+        if strategy not in RETRY_BACKOFF_STRATEGIES:
+            raise ValueError(f"retryBackoff must be one of {RETRY_BACKOFF_STRATEGIES}, got {strategy!r}")
+        if jitter not in RETRY_JITTER_MODES:
+            raise ValueError(f"retryJitter must be one of {RETRY_JITTER_MODES}, got {jitter!r}")
+        if factor < 1:
+            raise ValueError(f"retryBackoffFactor must be at least 1, got {factor}")
+        self.strategy = strategy
+        self.factor = factor
+        self.max_retry_timeout = max_retry_timeout
+        self.jitter = jitter
+        self.random_func = random_func
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RetryBackoff":
+        return cls(config.get("retryBackoff", "fixed"), config.get("retryBackoffFactor", 2),
+                   config.get("retryTimeoutMax"), config.get("retryJitter", "none"))
+
+    def get_retry_timeout(self, retry_timeout: int, retries: Optional[int], max_retries: Optional[int]) -> int:
+        """
+        :param retry_timeout: the base retry timeout in milliseconds
+        :param retries: the retries left after this failure
+        :param max_retries: the retries of a task failing for the first time, None counts every failure as the first
+        """
+        previous_failures = 0
+        if retries is not None and max_retries is not None:
+            previous_failures = max(0, max_retries - retries)
+        timeout = retry_timeout
+        if self.strategy == "exponential":
+            timeout = retry_timeout * self.factor ** previous_failures
+        if self.max_retry_timeout is not None:
+            timeout = min(timeout, self.max_retry_timeout)
+        if self.jitter == "full":
+            timeout = timeout * self.random_func()
+        elif self.jitter == "equal":
+            timeout = timeout / 2 + timeout / 2 * self.random_func()
+        return int(timeout)
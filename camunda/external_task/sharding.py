@@ -0,0 +1,41 @@
+import zlib
+from typing import Any, List, Sequence
+
+
+def get_shard(values: Sequence[Any], shard_index: int, shard_count: int) -> List[Any]:
+    """
+    Gives every worker of a fleet a disjoint slice of values, e.g. of the tenants or process definition keys
+    whose tasks it fetches, so workers don't compete for the same tasks:
+
+        shard = get_shard(TENANT_IDS, shard_index=int(os.environ["WORKER_INDEX"]), shard_count=8)
+        worker.subscribe("topicA", handle_task, topic_configs={"topicA": {"tenantIdIn": shard}})
+
+    The slices are deterministic: values are sorted first, so every worker must only be given the same values
+    in any order. Together the slices of shard 0 to shard_count - 1 cover all values.
+    :raises ValueError: for an invalid shard, or an empty slice, since an empty filter would fetch all tasks
+    """
+    _validate_shard_count(shard_count)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index must be between 0 and {shard_count - 1}, got {shard_index}")
+    shard = sorted(values)[shard_index::shard_count]
+    if not shard:
+        raise ValueError(f"shard {shard_index} of {shard_count} is empty, there are only {len(values)} values")
+    return shard
+
+
+def get_shard_index(key: str, shard_count: int) -> int:
+    """
+    Stable shard of a key, e.g. a business key, for sharding tasks by a process variable set at process start:
+
+        engine_client.start_process("order", {"shard": get_shard_index(order_id, 8)}, business_key=order_id)
+        worker.subscribe("topicA", handle_task, process_variables={"shard": shard_index})
+
+    Uses crc32, which unlike hash() is the same in every process.
+    """
+    _validate_shard_count(shard_count)
+    return zlib.crc32(str(key).encode("utf-8")) % shard_count
+
+
+def _validate_shard_count(shard_count):
+    if shard_count < 1:
+        raise ValueError(f"shard_count must be at least 1, got {shard_count}")
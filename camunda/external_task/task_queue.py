@@ -0,0 +1,61 @@
+import heapq
+import itertools
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from camunda.external_task.external_task import ExternalTask
+
+
+class QueuedTask:
+    __slots__ = ("task", "action", "topic_name", "lock_deadline")
+
+    def __init__(self, task: ExternalTask, action: Callable[[ExternalTask], Any], topic_name: str,
+                 lock_deadline: Optional[float]):
+        self.task = task
+        self.action = action
+        self.topic_name = topic_name
+        self.lock_deadline = lock_deadline  # time.monotonic() based, None if unknown
+
+
+class TaskQueue:
+    """
+    Local priority queue of fetched tasks waiting for an execution slot, across all topics of a worker.
+
+    pop() returns the task with the highest engine priority (the "priority" field of the task, see usePriority).
+    With order_by_lock_deadline, tasks of equal priority are ordered by their lock deadline, so the task closest
+    to losing its lock runs first; otherwise, and for equal deadlines, tasks run in arrival order.
+    """
+
+    def __init__(self, order_by_lock_deadline: bool = False):
+        self.order_by_lock_deadline = order_by_lock_deadline
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, task: ExternalTask, action: Callable[[ExternalTask], Any], topic_name: str,
+             lock_deadline: Optional[float] = None):
+        deadline_key = lock_deadline if self.order_by_lock_deadline and lock_deadline is not None else float("inf")
+        key = (-task.get_priority(), deadline_key, next(self._sequence))
+        heapq.heappush(self._heap, (key, QueuedTask(task, action, topic_name, lock_deadline)))
+
+    def pop(self) -> QueuedTask:
+        return heapq.heappop(self._heap)[1]
+
+    def pop_expired(self, now: float) -> List[QueuedTask]:
+        """
+        Removes and returns the tasks whose lock expired while they waited: the engine may have handed them to
+        another worker already, so they must not run.
+        """
+        def is_expired(entry):
+            return entry[1].lock_deadline is not None and entry[1].lock_deadline <= now
+
+        expired = [entry[1] for entry in self._heap if is_expired(entry)]
+        if expired:
+            self._heap = [entry for entry in self._heap if not is_expired(entry)]
+            heapq.heapify(self._heap)
+        return expired
+
+    def count_by_topic(self) -> Dict[str, int]:
+        return dict(Counter(entry[1].topic_name for entry in self._heap))
@@ -0,0 +1,109 @@
+import asyncio
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+
+
+class TaskSlots:
+    """
+    Task slots of an AsyncExternalTaskWorker shared by its topics. A fetch loop takes a slot before fetching a task
+    and the slot is released once the task is done, so a slot covers a task while it is fetched, queued and run.
+
+    At most max_concurrent_tasks tasks are held in total, and per topic at most its own max_concurrent_tasks.
+    When several topics wait for a slot, the freed slot goes to the topic using the smallest share of the pool
+    relative to its weight (in_flight / weight), so a flood on one topic can't starve the others: with weights
+    2 and 1, two busy topics end up with 2/3 and 1/3 of the slots. Unused capacity is still handed to whichever
+    topic wants it.
+    """
+
+    def __init__(self, max_concurrent_tasks: int):
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.limits: Dict[str, Optional[int]] = {}
+        self.weights: Dict[str, float] = {}
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self._waiters: Dict[str, deque] = defaultdict(deque)
+
+    def configure(self, topic_name: str, max_concurrent_tasks: Optional[int] = None, weight: float = 1):
+        if weight <= 0:
+            raise ValueError(f"weight of topic {topic_name} must be positive, got {weight}")
+        if max_concurrent_tasks is not None and max_concurrent_tasks < 1:
+            raise ValueError(f"maxConcurrentTasks of topic {topic_name} must be at least 1, "
+                             f"got {max_concurrent_tasks}")
+        self.limits[topic_name] = max_concurrent_tasks
+        self.weights[topic_name] = weight
+        self._dispatch()
+
+    def total_in_flight(self) -> int:
+        return sum(self.in_flight.values())
+
+    def has_free_slot(self, topic_name: str) -> bool:
+        limit = self.limits.get(topic_name)
+        return (self.total_in_flight() < self.max_concurrent_tasks
+                and (limit is None or self.in_flight[topic_name] < limit))
+
+    async def acquire(self, topic_name: str):
+        if not self._waiters[topic_name] and self.has_free_slot(topic_name) and not self._has_other_waiters():
+            self.in_flight[topic_name] += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[topic_name].append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(topic_name)  # granted and cancelled at the same time: give the slot back
+            elif waiter in self._waiters[topic_name]:
+                self._waiters[topic_name].remove(waiter)
+            raise
+
+    def hold(self, topic_name: str, count: int = 1):
+        """
+        Takes count slots at once without waiting, even beyond the limits, for tasks that are already fetched.
+        """
+        self.in_flight[topic_name] += count
+
+    def release(self, topic_name: str):
+        """
+        :raises ValueError: if topic_name holds no slot, i.e. a slot was released twice
+        """
+        if self.in_flight[topic_name] <= 0:
+            raise ValueError(f"topic {topic_name} releases more task slots than it holds")
+        self.in_flight[topic_name] -= 1
+        self._dispatch()
+
+    def occupancy(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: per topic the held tasks, the limit, the weight and the number of fetch loops waiting for a slot
+        """
+        topics = set(self.limits) | {topic for topic, count in self.in_flight.items() if count}
+        return {
+            topic: {
+                "in_flight": self.in_flight[topic],
+                "max_concurrent_tasks": self.limits.get(topic),
+                "weight": self.weights.get(topic, 1),
+                "waiting": len(self._waiters.get(topic, ())),
+            }
+            for topic in sorted(topics)
+        }
+
+    def _has_other_waiters(self):
+        return any(waiters for waiters in self._waiters.values())
+
+    def _dispatch(self):
+        while self.total_in_flight() < self.max_concurrent_tasks:
+            topic_name = self._get_next_topic()
+            if topic_name is None:
+                return
+            waiter = self._waiters[topic_name].popleft()
+            if waiter.done():  # cancelled while waiting
+                continue
+            self.in_flight[topic_name] += 1
+            waiter.set_result(None)
+
+    def _get_next_topic(self):
+        candidates = [topic for topic, waiters in self._waiters.items()
+                      if waiters and self.has_free_slot(topic)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda topic: self.in_flight[topic] / self.weights.get(topic, 1))
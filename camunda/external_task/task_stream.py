@@ -0,0 +1,263 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from camunda.external_task.external_task import ExternalTask, TaskResult
+from camunda.utils.utils import get_exception_detail, str_to_list
+
+
+class LockedTask:
+    """
+    A task yielded by ExternalTaskWorker.tasks(), locked for the worker until lock_deadline (time.monotonic()
+    based). The methods of ExternalTask are available on it; complete(), failure() and bpmn_error() report the
+    result to the engine right away, extend_lock() and unlock() change the lock.
+    """
+
+    def __init__(self, task: ExternalTask, lock_deadline: float, worker):
+        self.task = task
+        self.lock_deadline = lock_deadline
+        self._worker = worker
+
+    def __getattr__(self, name):
+        return getattr(self.task, name)
+
+    def __str__(self):
+        return str(self.task)
+
+    def get_remaining_lock_seconds(self) -> float:
+        return self.lock_deadline - time.monotonic()
+
+    def is_lock_expired(self) -> bool:
+        return self.get_remaining_lock_seconds() <= 0
+
+    def complete(self, global_variables: Optional[Dict[str, Any]] = None,
+                 local_variables: Optional[Dict[str, Any]] = None) -> TaskResult:
+        return self._report(self.task.complete(global_variables or {}, local_variables or {}))
+
+    def failure(self, error_message: str, error_details: Any = None, max_retries: Optional[int] = None,
+                retry_timeout: Optional[int] = None) -> TaskResult:
+        """
+        :param max_retries: retries of a task failing for the first time, by default the retries config of its topic
+        :param retry_timeout: by default the retryTimeout config of its topic
+        """
+        return self._report(self.task.failure(error_message, error_details, max_retries, retry_timeout))
+
+    def bpmn_error(self, error_code: str, error_message: str, variables: Optional[Dict[str, Any]] = None) -> TaskResult:
+        return self._report(self.task.bpmn_error(error_code, error_message, variables or {}))
+
+    def extend_lock(self, new_duration: int):
+        """
+        :param new_duration: new lock duration in milliseconds, counted from now
+        """
+        deadline = time.monotonic() + new_duration / 1000
+        self._worker.client.extend_lock(self.task.get_task_id(), new_duration)
+        self.lock_deadline = deadline
+
+    def unlock(self):
+        """
+        Hands the task back to the engine without a result, so it can be fetched again at once.
+        """
+        self._worker.client.unlock(self.task.get_task_id())
+
+    def _report(self, task_result):
+        self._worker.executor._handle_task_result(task_result)
+        return task_result
+
+
+class AsyncLockedTask(LockedTask):
+    """
+    A task yielded by AsyncExternalTaskWorker.tasks(), see LockedTask; its methods are coroutines.
+    """
+
+    async def complete(self, global_variables: Optional[Dict[str, Any]] = None,
+                       local_variables: Optional[Dict[str, Any]] = None) -> TaskResult:
+        return await self._report(self.task.complete(global_variables or {}, local_variables or {}))
+
+    async def failure(self, error_message: str, error_details: Any = None, max_retries: Optional[int] = None,
+                      retry_timeout: Optional[int] = None) -> TaskResult:
+        return await self._report(self.task.failure(error_message, error_details, max_retries, retry_timeout))
+
+    async def bpmn_error(self, error_code: str, error_message: str,
+                         variables: Optional[Dict[str, Any]] = None) -> TaskResult:
+        return await self._report(self.task.bpmn_error(error_code, error_message, variables or {}))
+
+    async def extend_lock(self, new_duration: int):
+        deadline = time.monotonic() + new_duration / 1000
+        await self._worker.client.extend_lock(self.task.get_task_id(), new_duration)
+        self.lock_deadline = deadline
+
+    async def unlock(self):
+        await self._worker.client.unlock(self.task.get_task_id())
+
+    async def _report(self, task_result):
+        await self._worker.executor._handle_task_result(task_result)
+        return task_result
+
+
+class AsyncTaskStream:
+    """
+    Async iterator over the tasks of some topics, returned by AsyncExternalTaskWorker.tasks():
+
+        async with worker.tasks(["topicA", "topicB"], buffer_size=20) as tasks:
+            async for task in tasks:
+                await task.complete({"done": True})
+
+    A fetch loop per topic fills a buffer of at most buffer_size tasks, fetching only as many tasks as there is
+    room for. Tasks whose lock expired while they were buffered are skipped. Reporting is up to the consumer, and
+    so is concurrency: the worker's maxConcurrentTasks doesn't apply. The iteration ends when the stream is closed
+    or the worker is stopped; closing unlocks the tasks still buffered.
+    """
+
+    def __init__(self, worker, topic_names, process_variables: Optional[Dict[str, Any]] = None,
+                 variables: Optional[List[str]] = None, buffer_size: int = 10):
+        if buffer_size < 1:
+            raise ValueError(f"buffer_size must be at least 1, got {buffer_size}")
+        self.topic_names = str_to_list(topic_names)
+        self.process_variables = process_variables
+        self.variables = variables
+        self.buffer_size = buffer_size
+        self._worker = worker
+        self._buffer = None
+        self._space = None
+        self._fetch_loops = None
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def __anext__(self) -> AsyncLockedTask:
+        self._start()
+        while True:
+            if self._buffer.empty() and self._fetch_loops.done():
+                raise StopAsyncIteration
+            getter = asyncio.ensure_future(self._buffer.get())
+            await asyncio.wait({getter, self._fetch_loops}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                continue
+            self._space.release()
+            locked_task = getter.result()
+            if locked_task.is_lock_expired():
+                self._worker._log_with_context("Lock of task %s expired while it was buffered, skipping it",
+                                               locked_task.get_task_id(), topic=locked_task.get_topic_name(),
+                                               task_id=locked_task.get_task_id(), log_level="warning")
+                continue
+            return locked_task
+
+    async def aclose(self):
+        """
+        Stops fetching and unlocks the buffered tasks.
+        """
+        if self._fetch_loops is None:
+            return
+        self._fetch_loops.cancel()
+        await asyncio.gather(self._fetch_loops, return_exceptions=True)
+        self._worker._task_streams.discard(self)
+        buffered = []
+        while not self._buffer.empty():
+            buffered.append(self._buffer.get_nowait())
+        await asyncio.gather(*(locked_task.unlock() for locked_task in buffered), return_exceptions=True)
+
+    def cancel(self):
+        """
+        Stops fetching; the tasks already buffered are still yielded.
+        """
+        if self._fetch_loops is not None:
+            self._fetch_loops.cancel()
+
+    def _start(self):
+        if self._fetch_loops is not None:
+            return
+        self._buffer = asyncio.Queue()
+        self._space = asyncio.Semaphore(self.buffer_size)
+        self._fetch_loops = asyncio.gather(*(self._fetch_loop(topic_name) for topic_name in self.topic_names))
+        # the loops only end by cancellation, retrieve it so asyncio doesn't log it as unhandled
+        self._fetch_loops.add_done_callback(lambda loops: loops.cancelled() or loops.exception())
+        self._worker._task_streams.add(self)
+
+    async def _fetch_loop(self, topic_name):
+        worker = self._worker
+        sleep_seconds = worker._get_sleep_seconds()
+        long_polling = worker._is_long_polling()
+        while True:
+            await self._space.acquire()
+            room = 1
+            while not self._space.locked():
+                await self._space.acquire()  # doesn't block, takes all the room there is
+                room += 1
+            try:
+                resp_json = await worker._fetch_and_lock(topic_name, self.process_variables, self.variables,
+                                                         max_tasks=room)
+            except asyncio.CancelledError:
+                self._release(room)
+                raise
+            except Exception as e:
+                worker._log_with_context("Error fetching tasks for task stream: %s for topic=%s. Retrying after %s "
+                                         "seconds", get_exception_detail(e), topic_name, sleep_seconds,
+                                         topic=topic_name, log_level="error", exc_info=True)
+                self._release(room)
+                await asyncio.sleep(sleep_seconds)
+                continue
+
+            tasks = worker._parse_response(resp_json, topic_name, self.process_variables)
+            lock_deadline = time.monotonic() + worker._get_lock_duration(topic_name) / 1000
+            for task in tasks:
+                self._buffer.put_nowait(AsyncLockedTask(task, lock_deadline, worker))
+            self._release(room - len(tasks))
+            if not tasks and not long_polling:
+                await asyncio.sleep(sleep_seconds)
+
+    def _release(self, count):
+        for _ in range(count):
+            self._space.release()
+
+
+def iterate_tasks(worker, topic_names, process_variables=None, variables=None, buffer_size=None):
+    """
+    Generator behind ExternalTaskWorker.tasks(): fetches up to buffer_size tasks whenever its buffer is empty
+    and yields them as LockedTasks until the worker is stopped. Tasks whose lock expired while they were buffered
+    are skipped; closing the generator unlocks the tasks still buffered.
+    """
+    buffer_size = buffer_size or worker.client.config["maxTasks"]
+    if buffer_size < 1:
+        raise ValueError(f"buffer_size must be at least 1, got {buffer_size}")
+    buffered = deque()
+    try:
+        while not worker._stop_event.is_set():
+            if not buffered:
+                try:
+                    resp_json = worker._fetch_and_lock(topic_names, process_variables, variables,
+                                                       max_tasks=buffer_size)
+                except Exception as e:
+                    sleep_seconds = worker._get_sleep_seconds()
+                    worker._log_with_context("error fetching tasks for task stream: %s for topic(s)=%s. retrying "
+                                             "after %s seconds", get_exception_detail(e), topic_names,
+                                             sleep_seconds, log_level="error", exc_info=True)
+                    worker._stop_event.wait(sleep_seconds)
+                    continue
+                fetched_at = time.monotonic()
+                buffered.extend(LockedTask(task, fetched_at + worker._get_lock_duration(task.get_topic_name()) / 1000,
+                                           worker)
+                                for task in worker._parse_response(resp_json, topic_names, process_variables))
+                continue
+
+            locked_task = buffered.popleft()
+            if locked_task.is_lock_expired():
+                worker._log_with_context("lock of task %s expired while it was buffered, skipping it",
+                                         locked_task.get_task_id(), topic=locked_task.get_topic_name(),
+                                         task_id=locked_task.get_task_id(), log_level="warning")
+                continue
+            yield locked_task
+    finally:
+        for locked_task in buffered:
+            try:
+                locked_task.unlock()
+            except Exception as e:
+                worker._log_with_context("error unlocking buffered task: %s", get_exception_detail(e),
+                                         task_id=locked_task.get_task_id(), log_level="warning")
@@ -1,11 +1,19 @@
+import threading
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 from unittest.mock import AsyncMock
 
 from camunda.client.async_external_task_client import AsyncExternalTaskClient
 from camunda.external_task.async_external_task_executor import AsyncExternalTaskExecutor
+from camunda.external_task.batch import BatchHandler
+from camunda.external_task.memoize import MemoizedHandler
 from camunda.external_task.external_task import ExternalTask, TaskResult
 
 
+def complete_in_child_process(task):
+    return task.complete({"square": task.get_variable("number") ** 2})
+
+
 class AsyncExternalTaskExecutorTest(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self):
@@ -137,3 +145,97 @@ class AsyncExternalTaskExecutorTest(unittest.IsolatedAsyncioTestCase):
             await self.executor.execute_task(task, bpmn_error_action)
 
         self.assertIn("Not able to mark BPMN Error for task_id=taskId", str(ctx.exception))
+
+    async def test_execute_task_runs_sync_action_in_handler_executor(self):
+        handler_threads = []
+
+        def sync_action(task):
+            handler_threads.append(threading.current_thread())
+            return task.complete({"globalVar": 1})
+
+        task = ExternalTask({"id": "taskId", "topicName": "someTopic"})
+        result = await self.executor.execute_task(task, sync_action)
+
+        self.assertTrue(result.is_success())
+        self.assertIsNot(threading.main_thread(), handler_threads[0])
+        self.mock_client.complete.assert_awaited_once_with("taskId", {"globalVar": 1}, {})
+
+    async def test_execute_task_runs_sync_action_in_process_pool(self):
+        with ProcessPoolExecutor(max_workers=1) as process_pool:
+            executor = AsyncExternalTaskExecutor("someWorker", self.mock_client, handler_executor=process_pool)
+            task = ExternalTask({"id": "taskId", "topicName": "someTopic", "variables": {"number": {"value": 3}}})
+
+            result = await executor.execute_task(task, complete_in_child_process)
+
+        self.assertIs(task, result.get_task())
+        self.assertIs(result, task.get_task_result())
+        self.mock_client.complete.assert_awaited_once_with("taskId", {"square": 9}, {})
+
+    async def test_execute_batch_reports_every_task_on_its_own(self):
+        self.mock_client.complete.side_effect = [Exception("engine unavailable"), True]
+
+        async def batch_action(tasks):
+            return {task.get_task_id(): task.complete({"batchSize": len(tasks)}) for task in tasks[:2]}
+
+        tasks = [ExternalTask({"id": task_id, "topicName": "someTopic"}) for task_id in ["t1", "t2", "t3"]]
+        task_results = await self.executor.execute_batch(tasks, BatchHandler(batch_action), max_retries=3,
+                                                         retry_timeout=1000)
+
+        self.assertEqual([True, True, False], [result.is_success() for result in task_results])
+        self.assertEqual(2, self.mock_client.complete.await_count)
+        self.mock_client.failure.assert_awaited_once()
+        self.assertEqual("t3", self.mock_client.failure.await_args.args[0])
+
+    async def test_execute_batch_runs_sync_handler_in_handler_executor_and_fails_all_if_it_raises(self):
+        handler_threads = []
+
+        def batch_action(tasks):
+            handler_threads.append(threading.current_thread())
+            raise ValueError("model not loaded")
+
+        tasks = [ExternalTask({"id": task_id, "topicName": "someTopic"}) for task_id in ["t1", "t2"]]
+        task_results = await self.executor.execute_batch(tasks, BatchHandler(batch_action), max_retries=3,
+                                                         retry_timeout=1000)
+
+        self.assertIsNot(threading.main_thread(), handler_threads[0])
+        self.assertEqual(["Batch handler failed"] * 2, [result.error_message for result in task_results])
+        self.assertEqual(2, self.mock_client.failure.await_count)
+
+    async def test_memoized_async_handler_completes_hits_without_running_it(self):
+        calls = []
+
+        async def lookup_rate(task):
+            calls.append(task.get_task_id())
+            return task.complete({"rate": 1.5})
+
+        memoized = MemoizedHandler(lookup_rate, key_variables=["currency"])
+        tasks = [ExternalTask({"id": task_id, "topicName": "someTopic", "variables": {"currency": {"value": "EUR"}}})
+                 for task_id in ["t1", "t2"]]
+
+        for task in tasks:
+            await self.executor.execute_task(task, memoized)
+
+        self.assertEqual(["t1"], calls)
+        self.mock_client.complete.assert_awaited_with("t2", {"rate": 1.5}, {})
+        self.assertEqual(0.5, memoized.get_hit_ratio())
+
+    async def test_memoization_cache_is_used_off_the_event_loop(self):
+        cache_threads = []
+
+        class RecordingCache(dict):
+            def get(self, key, default=None):
+                cache_threads.append(threading.current_thread())
+                return super().get(key, default)
+
+            def set(self, key, value):
+                cache_threads.append(threading.current_thread())
+                self[key] = value
+
+        memoized = MemoizedHandler(lambda task: task.complete({"rate": 1.5}), key_variables=["currency"],
+                                   cache=RecordingCache())
+        task = ExternalTask({"id": "t1", "topicName": "someTopic", "variables": {"currency": {"value": "EUR"}}})
+
+        await self.executor.execute_task(task, memoized)
+
+        self.assertEqual(2, len(cache_threads))
+        self.assertNotIn(threading.current_thread(), cache_threads)
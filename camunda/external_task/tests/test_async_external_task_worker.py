@@ -1,10 +1,17 @@
 import asyncio
+import threading
+import time
 import unittest
 from unittest.mock import AsyncMock, patch
 
+import httpx
+
 from camunda.client.async_external_task_client import AsyncExternalTaskClient
 from camunda.external_task.async_external_task_worker import AsyncExternalTaskWorker
+from camunda.external_task.batch import BatchHandler
 from camunda.external_task.external_task import ExternalTask, TaskResult
+from camunda.testing.fake_engine import FakeEngine
+from camunda.utils.metrics import Metrics
 
 
 class AsyncExternalTaskWorkerTest(unittest.IsolatedAsyncioTestCase):
@@ -103,7 +110,7 @@ class AsyncExternalTaskWorkerTest(unittest.IsolatedAsyncioTestCase):
     async def test_cancel_running_tasks_single_iteration(self, mock_fetch_and_execute):
         # Make _fetch_and_execute_safe run exactly once, then return
         async def one_iteration(*args, **kwargs):
-            await self.worker.semaphore.acquire()
+            await self.worker.task_slots.acquire("topicA")
             await self.worker.fetch_and_execute(*args, **kwargs)
             # no 'while True', so it ends
 
@@ -127,3 +134,351 @@ class AsyncExternalTaskWorkerTest(unittest.IsolatedAsyncioTestCase):
 
         for t in self.worker.running_tasks:
             self.assertTrue(t.done())
+
+    async def test_fetch_and_execute_records_fetch_metrics(self):
+        worker_metrics = Metrics()
+        worker = AsyncExternalTaskWorker("testWorker", config=self.config, metrics=worker_metrics)
+        worker.client = self.mock_client
+        worker.executor.external_task_client = self.mock_client
+
+        await worker.fetch_and_execute("myTopic", AsyncMock())
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+        await worker.fetch_and_execute("myTopic", AsyncMock(side_effect=lambda task: task.complete()))
+        await asyncio.gather(*worker.running_tasks, return_exceptions=True)
+
+        snapshot = worker_metrics.snapshot()
+        self.assertEqual({"myTopic": 2}, snapshot["counters"]["fetch_total"])
+        self.assertEqual({"myTopic": 1}, snapshot["counters"]["fetch_empty_total"])
+        self.assertEqual({"myTopic": 1}, snapshot["counters"]["tasks_fetched_total"])
+        self.assertEqual({"myTopic": 1}, snapshot["counters"]["tasks_completed_total"])
+        self.assertEqual(2, snapshot["histograms"]["fetch_duration_seconds"]["myTopic"]["count"])
+
+    @patch("camunda.external_task.async_external_task_executor.time.perf_counter")
+    @patch("camunda.external_task.async_external_task_worker.time.perf_counter")
+    async def test_nothing_is_timed_without_metrics(self, worker_perf_counter, executor_perf_counter):
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+
+        await self.worker.fetch_and_execute("myTopic", AsyncMock(side_effect=lambda task: task.complete()))
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.mock_client.complete.assert_awaited_once()
+        worker_perf_counter.assert_not_called()
+        executor_perf_counter.assert_not_called()
+
+    async def test_subscribe_applies_topic_configs(self):
+        subscription = asyncio.create_task(self.worker.subscribe(
+            {"topicA": AsyncMock(), "topicB": AsyncMock()},
+            topic_configs={"topicA": {"maxConcurrentTasks": 1, "weight": 3}},
+        ))
+        await asyncio.sleep(0.05)
+        occupancy = self.worker.get_occupancy()
+        await self.worker.stop()
+        await asyncio.gather(subscription, return_exceptions=True)
+
+        self.assertEqual({"in_flight": 0, "max_concurrent_tasks": 1, "weight": 3, "waiting": 0, "queued": 0},
+                         occupancy["topicA"])
+
+    async def test_topic_max_concurrent_tasks_is_respected(self):
+        running = {"cheap": 0, "slow": 0}
+        max_running = {"cheap": 0, "slow": 0}
+
+        def create_handler(topic):
+            async def handle(task):
+                running[topic] += 1
+                max_running[topic] = max(max_running[topic], running[topic])
+                await asyncio.sleep(0.02)
+                running[topic] -= 1
+                return task.complete()
+            return handle
+
+        with FakeEngine() as engine:
+            engine.add_tasks("cheap", 10)
+            engine.add_tasks("slow", 10)
+            http_client = httpx.AsyncClient()
+            worker = AsyncExternalTaskWorker("testWorker", engine.base_url,
+                                             {"maxConcurrentTasks": 4, "sleepSeconds": 0, "asyncResponseTimeout": 100},
+                                             http_client=http_client)
+            subscription = asyncio.create_task(worker.subscribe(
+                {"cheap": create_handler("cheap"), "slow": create_handler("slow")},
+                topic_configs={"cheap": {"maxConcurrentTasks": 1}},
+            ))
+            while engine.count_tasks("completed") < 20:
+                await asyncio.sleep(0.01)
+            await worker.stop()
+            await asyncio.gather(subscription, return_exceptions=True)
+            await http_client.aclose()
+
+        self.assertEqual(1, max_running["cheap"])
+        self.assertLessEqual(max_running["slow"], 4)
+
+    async def test_prefetched_tasks_run_by_priority_across_topics(self):
+        executed = []
+
+        async def handle(task):
+            executed.append(task.get_priority())
+            await asyncio.sleep(0.05)
+            return task.complete()
+
+        with FakeEngine() as engine:
+            for _ in range(3):
+                engine.add_task("low", priority=0)
+                engine.add_task("high", priority=10)
+            http_client = httpx.AsyncClient()
+            worker = AsyncExternalTaskWorker("testWorker", engine.base_url,
+                                             {"maxConcurrentTasks": 1, "prefetchTasks": 5, "sleepSeconds": 0,
+                                              "asyncResponseTimeout": 100},
+                                             http_client=http_client)
+            subscription = asyncio.create_task(worker.subscribe({"low": handle, "high": handle}))
+            while engine.count_tasks("completed") < 6:
+                await asyncio.sleep(0.01)
+            await worker.stop()
+            await asyncio.gather(subscription, return_exceptions=True)
+            await http_client.aclose()
+
+        # the first task starts as soon as it is fetched, the others wait in the local queue
+        self.assertEqual(sorted(executed[1:], reverse=True), executed[1:])
+
+    async def test_queued_task_with_expired_lock_is_skipped(self):
+        self.worker.config["lockDuration"] = 0
+        self.worker.max_concurrent_tasks = 0  # keep the task queued
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+        await self.worker.task_slots.acquire("myTopic")
+
+        await self.worker._fetch_and_execute("myTopic", AsyncMock(), held_slots=1)
+
+        self.assertEqual(0, len(self.worker.task_queue))
+        self.assertEqual(0, self.worker.task_slots.total_in_flight())
+
+    async def test_tasks_fetched_directly_take_task_slots(self):
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+
+        await self.worker.fetch_and_execute("myTopic", AsyncMock(side_effect=lambda task: task.complete()))
+        self.assertEqual(1, self.worker.task_slots.total_in_flight())
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.assertEqual(0, self.worker.task_slots.total_in_flight())
+
+    async def run_fetch_loop_briefly(self, config, seconds=0.1):
+        async def long_poll(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return []
+
+        worker = AsyncExternalTaskWorker("testWorker", config=config)
+        worker.client = self.mock_client
+        self.mock_client.fetch_and_lock.side_effect = long_poll
+        worker.subscriptions = [asyncio.create_task(worker._fetch_and_execute_safe("myTopic", AsyncMock()))]
+        await asyncio.sleep(seconds)
+        await worker.stop()
+        return worker
+
+    async def test_empty_long_poll_is_followed_by_the_next_long_poll_without_sleeping(self):
+        await self.run_fetch_loop_briefly({"asyncResponseTimeout": 10000, "sleepSeconds": 100})
+
+        self.assertGreater(self.mock_client.fetch_and_lock.call_count, 2)
+
+    async def test_empty_response_without_long_polling_sleeps(self):
+        await self.run_fetch_loop_briefly({"asyncResponseTimeout": 0, "sleepSeconds": 100})
+
+        self.assertEqual(1, self.mock_client.fetch_and_lock.call_count)
+
+    async def test_stop_cancels_outstanding_long_poll_at_once(self):
+        with FakeEngine() as engine:
+            http_client = httpx.AsyncClient()
+            worker = AsyncExternalTaskWorker("testWorker", engine.base_url, {"asyncResponseTimeout": 10000},
+                                             http_client=http_client)
+            subscription = asyncio.create_task(worker.subscribe({"topicA": AsyncMock()}))
+            self.assertTrue(await asyncio.get_running_loop().run_in_executor(
+                None, engine.wait_until, lambda e: e.stats["fetch_and_lock"] == 1))
+
+            start = time.monotonic()
+            await worker.stop()
+            await asyncio.gather(subscription, return_exceptions=True)
+            await http_client.aclose()
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(0, worker.task_slots.total_in_flight())
+
+    async def test_blocking_sync_handler_does_not_block_the_event_loop(self):
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        def blocking_handler(task):
+            time.sleep(0.2)
+            return task.complete()
+
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+        self.mock_client.complete.return_value = True
+        ticker = asyncio.create_task(tick())
+        await self.worker.fetch_and_execute("myTopic", blocking_handler)
+        await asyncio.gather(*self.worker.running_tasks)
+        ticker.cancel()
+
+        self.assertGreater(ticks, 5)
+        self.mock_client.complete.assert_awaited_once_with("task1", {}, {})
+        await self.worker.stop()
+
+    async def test_batch_handler_gets_batches_of_at_most_max_batch_size(self):
+        batch_sizes = []
+
+        async def handle_batch(tasks):
+            batch_sizes.append(len(tasks))
+            return [task.complete({"batchSize": len(tasks)}) for task in tasks]
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 7)
+            http_client = httpx.AsyncClient()
+            worker = AsyncExternalTaskWorker("testWorker", engine.base_url,
+                                             {"sleepSeconds": 0, "asyncResponseTimeout": 5000},
+                                             http_client=http_client)
+            subscription = asyncio.create_task(worker.subscribe(
+                {"topicA": BatchHandler(handle_batch, max_batch_size=3, max_wait_seconds=0.2)}
+            ))
+            while engine.count_tasks("completed") < 7:
+                await asyncio.sleep(0.01)
+            await worker.stop()
+            await asyncio.gather(subscription, return_exceptions=True)
+            await http_client.aclose()
+
+        self.assertEqual(3, batch_sizes[0])
+        self.assertEqual(7, sum(batch_sizes))
+        self.assertTrue(all(size <= 3 for size in batch_sizes))
+        self.assertEqual(0, worker.task_slots.total_in_flight())
+
+    async def test_drain_runs_the_batch_collected_so_far(self):
+        handled = []
+
+        async def handle_batch(tasks):
+            handled.extend(tasks)
+            return [task.complete() for task in tasks]
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 2)
+            http_client = httpx.AsyncClient()
+            worker = AsyncExternalTaskWorker("testWorker", engine.base_url,
+                                             {"sleepSeconds": 0, "asyncResponseTimeout": 10000},
+                                             http_client=http_client)
+            subscription = asyncio.create_task(worker.subscribe(
+                {"topicA": BatchHandler(handle_batch, max_batch_size=10, max_wait_seconds=30)}
+            ))
+            self.assertTrue(await asyncio.get_running_loop().run_in_executor(
+                None, engine.wait_until, lambda e: e.stats["fetched"] == 2 and e.stats["fetch_and_lock"] == 2))
+            await worker.drain(timeout_seconds=5)
+            await asyncio.gather(subscription, return_exceptions=True)
+            await http_client.aclose()
+
+            self.assertEqual(2, engine.count_tasks("completed"))
+        self.assertEqual(2, len(handled))
+
+    async def test_hung_handler_times_out_before_its_lock_expires(self):
+        async def hang(task):
+            await asyncio.sleep(60)
+
+        self.worker.config.update({"lockDuration": 400, "handlerTimeoutMarginSeconds": 0.1})
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+        self.mock_client.failure.return_value = True
+        start = time.monotonic()
+        await self.worker.fetch_and_execute("myTopic", hang)
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.mock_client.failure.assert_awaited_once()
+        self.assertEqual("Handler timed out", self.mock_client.failure.await_args.args[1])
+        await self.worker.stop()
+
+    async def test_lock_is_counted_from_the_end_of_a_long_poll(self):
+        handled = []
+
+        async def slow_long_poll(*args, **kwargs):
+            await asyncio.sleep(0.3)
+            return [{"id": "task1", "topicName": "myTopic"}]
+
+        async def handle(task):
+            handled.append(task.get_task_id())
+            return task.complete()
+
+        self.worker.config.update({"lockDuration": 400, "handlerTimeoutMarginSeconds": 0.1})
+        self.mock_client.fetch_and_lock.side_effect = slow_long_poll
+        self.mock_client.complete.return_value = True
+        await self.worker.fetch_and_execute("myTopic", handle)
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.assertEqual(["task1"], handled)
+        self.mock_client.failure.assert_not_awaited()
+        await self.worker.stop()
+
+    async def test_abandoned_sync_handlers_do_not_fill_up_the_handler_pool(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        handled = []
+
+        def handle(task):
+            handled.append(task.get_task_id())
+            if len(handled) <= 2:
+                release.wait()
+            return task.complete()
+
+        worker = AsyncExternalTaskWorker("testWorker", config={"maxConcurrentTasks": 1, "handlerTimeoutSeconds": 0.1})
+        worker.client = worker.executor.external_task_client = self.mock_client
+        self.mock_client.fetch_and_lock.return_value = [{"id": f"task{i}", "topicName": "myTopic"} for i in range(3)]
+        self.mock_client.unlock.return_value = True
+        await worker.fetch_and_execute("myTopic", handle)
+        while worker.running_tasks or worker.task_queue:
+            await asyncio.gather(*worker.running_tasks)
+
+        self.assertEqual(["task0", "task1", "task2"], handled)
+        self.assertEqual(2, worker.executor.abandoned_handlers)
+        self.mock_client.complete.assert_awaited_once()
+        await worker.stop()
+
+    async def test_handler_timeout_policy_unlock_per_topic(self):
+        async def hang(task):
+            await asyncio.sleep(60)
+
+        self.worker.topic_configs = {"myTopic": {"handlerTimeoutSeconds": 0.05, "handlerTimeoutPolicy": "unlock"}}
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+        await self.worker.fetch_and_execute("myTopic", hang)
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.mock_client.unlock.assert_awaited_once_with("task1")
+        self.mock_client.failure.assert_not_awaited()
+        await self.worker.stop()
+
+    async def test_failing_handler_is_reported_with_retries_of_its_topic(self):
+        async def fail(task):
+            raise ValueError("boom")
+
+        self.worker.topic_configs = {"myTopic": {"retries": 7, "retryTimeout": 1000}}
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic"}]
+        self.mock_client.failure.return_value = True
+        await self.worker.fetch_and_execute("myTopic", fail)
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.assertEqual(("task1", 'Task execution failed', 'An unexpected error occurred while executing the task',
+                          7, 1000), self.mock_client.failure.await_args.args)
+        await self.worker.stop()
+
+    async def test_failing_handler_is_reported_with_exponential_backoff_of_its_topic(self):
+        async def fail(task):
+            raise ValueError("boom")
+
+        self.worker.topic_configs = {"myTopic": {"retries": 3, "retryTimeout": 1000, "retryBackoff": "exponential"}}
+        self.mock_client.fetch_and_lock.return_value = [{"id": "task1", "topicName": "myTopic", "retries": 1}]
+        self.mock_client.failure.return_value = True
+        await self.worker.fetch_and_execute("myTopic", fail)
+        await asyncio.gather(*self.worker.running_tasks)
+
+        self.assertEqual((0, 8000), self.mock_client.failure.await_args.args[3:])
+        await self.worker.stop()
+
+    def test_invalid_retry_backoff_is_rejected(self):
+        with self.assertRaises(ValueError):
+            AsyncExternalTaskWorker("testWorker", config={"retryBackoff": "linear"})
+
+    def test_invalid_sync_handler_pool_is_rejected(self):
+        with self.assertRaises(ValueError):
+            AsyncExternalTaskWorker("testWorker", config={"syncHandlerPool": "fiber"})
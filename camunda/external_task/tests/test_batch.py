@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+from camunda.external_task.batch import BatchHandler, batch_handler, get_batch_results
+from camunda.external_task.external_task import ExternalTask
+
+
+class BatchTest(TestCase):
+
+    def setUp(self):
+        self.tasks = [ExternalTask({"id": task_id, "topicName": "topicA", "retries": None})
+                      for task_id in ["task1", "task2", "task3"]]
+
+    def test_results_are_matched_by_task_id(self):
+        results = [self.tasks[2].complete({"n": 3}), self.tasks[0].complete({"n": 1}),
+                   self.tasks[1].failure("error", "details", 3, 1000)]
+
+        task_results = get_batch_results(self.tasks, results, max_retries=3, retry_timeout=1000)
+
+        self.assertEqual([{"n": 1}, {}, {"n": 3}], [result.global_variables for result in task_results])
+        self.assertEqual([True, False, True], [result.is_success() for result in task_results])
+        self.assertEqual(task_results[1], self.tasks[1].get_task_result())
+
+    def test_results_by_task_id(self):
+        results = {"task1": self.tasks[0].complete(), "task3": self.tasks[2].complete()}
+
+        task_results = get_batch_results(self.tasks, results, max_retries=3, retry_timeout=1000)
+
+        self.assertEqual([True, False, True], [result.is_success() for result in task_results])
+
+    def test_tasks_without_result_fail(self):
+        task_results = get_batch_results(self.tasks, [self.tasks[0].complete()], max_retries=3, retry_timeout=1000)
+
+        self.assertTrue(task_results[0].is_success())
+        for task_result in task_results[1:]:
+            self.assertTrue(task_result.is_failure())
+            self.assertEqual("Batch handler returned no result for the task", task_result.error_message)
+            self.assertEqual(3, task_result.retries)
+            self.assertEqual(1000, task_result.retry_timeout)
+
+    def test_results_of_task_copies_are_bound_to_the_fetched_tasks(self):
+        copy = ExternalTask({"id": "task1", "topicName": "topicA"})
+
+        task_results = get_batch_results(self.tasks[:1], [copy.complete()], max_retries=3, retry_timeout=1000)
+
+        self.assertIs(self.tasks[0], task_results[0].get_task())
+
+    def test_batch_handler_decorator(self):
+        @batch_handler(max_batch_size=10, max_wait_seconds=0.5)
+        def handler(tasks):
+            return [task.complete() for task in tasks]
+
+        self.assertIsInstance(handler, BatchHandler)
+        self.assertEqual((10, 0.5), (handler.max_batch_size, handler.max_wait_seconds))
+        self.assertTrue(handler(self.tasks)[0].is_success())
+
+    def test_invalid_batch_settings_are_rejected(self):
+        with self.assertRaises(ValueError):
+            BatchHandler(lambda tasks: [], max_batch_size=0)
+        with self.assertRaises(ValueError):
+            BatchHandler(lambda tasks: [], max_wait_seconds=-1)
@@ -1,6 +1,7 @@
 from unittest import TestCase
 
-from camunda.external_task.external_task import ExternalTask
+from camunda.external_task.external_task import ExternalTask, TaskResult
+from camunda.external_task.retry_backoff import RetryBackoff
 
 
 class ExternalTaskTest(TestCase):
@@ -76,6 +77,34 @@ class ExternalTaskTest(TestCase):
 
         self.assertEqual(retries - 1, task_result.retries)
 
+    def test_failure_defaults_to_retry_config_of_topic(self):
+        task = ExternalTask(context={})
+        self.assertEqual((3, 300000), (task.failure("error", "details").retries,
+                                       task.failure("error", "details").retry_timeout))
+
+        task.set_retry_config({"retries": 1, "retryTimeout": 500})
+        task_result = task.failure("error", "details")
+
+        self.assertEqual((1, 500), (task_result.retries, task_result.retry_timeout))
+        self.assertEqual(10, task.failure("error", "details", max_retries=10).retries)
+
+    def test_failure_applies_retry_backoff_of_topic(self):
+        task = ExternalTask(context={"retries": 2})
+        task.set_retry_config({"retries": 3, "retryTimeout": 1000, "retryBackoff": "exponential",
+                               "retryTimeoutMax": 1500})
+
+        self.assertEqual((1, 1500), (task.failure("error", "details").retries,
+                                     task.failure("error", "details").retry_timeout))
+        self.assertEqual(1000, task.failure("error", "details", backoff=RetryBackoff()).retry_timeout)
+
+    def test_task_result_failure_applies_backoff(self):
+        task = ExternalTask(context={})
+
+        task_result = TaskResult.failure(task, "error", "details", retries=1, retry_timeout=1000,
+                                         backoff=RetryBackoff("exponential"), max_retries=4)
+
+        self.assertEqual(8000, task_result.retry_timeout)
+
     def test_get_variable_returns_none_for_missing_variable(self):
         task = ExternalTask(context={})
         variable = task.get_variable("var_name")
@@ -1,13 +1,16 @@
 import base64
 import collections
 from http import HTTPStatus
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import responses
 
 from camunda.client.external_task_client import ExternalTaskClient
+from camunda.external_task.batch import BatchHandler
+from camunda.external_task.memoize import MemoizedHandler
 from camunda.external_task.external_task import TaskResult, ExternalTask
 from camunda.external_task.external_task_executor import ExternalTaskExecutor
+from camunda.utils.metrics import Metrics
 
 
 class ExternalTaskExecutorTest(TestCase):
@@ -198,3 +201,113 @@ class ExternalTaskExecutorTest(TestCase):
             "var4": {"value": "...", "type": "Bytes"},
             "var5": {"value": "...", "type": "File"},
         }, cleaned)
+
+    @responses.activate
+    def test_execute_task_records_metrics(self):
+        task = ExternalTask({"id": "1", "topicName": "my_topic"})
+        external_task_client = ExternalTaskClient(worker_id=1)
+        responses.add(responses.POST, external_task_client.get_task_complete_url(task.get_task_id()),
+                      status=HTTPStatus.NO_CONTENT)
+        task_metrics = Metrics()
+        executor = ExternalTaskExecutor(worker_id=1, external_task_client=external_task_client, metrics=task_metrics)
+
+        executor.execute_task(task, self.task_success_action)
+
+        snapshot = task_metrics.snapshot()
+        self.assertEqual({"my_topic": 1}, snapshot["counters"]["tasks_completed_total"])
+        self.assertEqual({"my_topic": 0}, snapshot["gauges"]["tasks_in_flight"])
+        self.assertEqual(1, snapshot["histograms"]["handler_duration_seconds"]["my_topic"]["count"])
+        self.assertEqual(1, snapshot["histograms"]["report_duration_seconds"]["my_topic"]["count"])
+
+    @responses.activate
+    def test_execute_task_starts_execute_handler_and_report_spans(self):
+        task = ExternalTask({"id": "1", "topicName": "my_topic", "processInstanceId": "pi1"})
+        external_task_client = ExternalTaskClient(worker_id=1)
+        responses.add(responses.POST, external_task_client.get_task_complete_url(task.get_task_id()),
+                      status=HTTPStatus.NO_CONTENT)
+        tracer = RecordingTracer()
+        executor = ExternalTaskExecutor(worker_id=1, external_task_client=external_task_client, tracer=tracer)
+
+        executor.execute_task(task, self.task_success_action)
+
+        self.assertEqual(["camunda.execute_task", "camunda.handler", "camunda.report"],
+                         [name for name, _, _ in tracer.spans])
+        name, attributes, span = tracer.spans[2]
+        self.assertEqual({"camunda.task_id": "1", "camunda.topic": "my_topic", "camunda.process_instance_id": "pi1"},
+                         attributes)
+        span.set_attribute.assert_called_once_with("camunda.result", "complete")
+
+    @responses.activate
+    def test_execute_batch_reports_every_task_on_its_own(self):
+        tasks = [ExternalTask({"id": task_id, "topicName": "my_topic"}) for task_id in ["1", "2", "3"]]
+        external_task_client = ExternalTaskClient(worker_id=1)
+        responses.add(responses.POST, external_task_client.get_task_complete_url("1"),
+                      status=HTTPStatus.INTERNAL_SERVER_ERROR)
+        responses.add(responses.POST, external_task_client.get_task_complete_url("2"), status=HTTPStatus.NO_CONTENT)
+        responses.add(responses.POST, external_task_client.get_task_failure_url("3"), status=HTTPStatus.NO_CONTENT)
+        task_metrics = Metrics()
+        executor = ExternalTaskExecutor(worker_id=1, external_task_client=external_task_client, metrics=task_metrics)
+        handler = BatchHandler(lambda batch: [task.complete() for task in batch[:2]])
+
+        task_results = executor.execute_batch(tasks, handler, max_retries=3, retry_timeout=1000)
+
+        self.assertEqual([True, True, False], [result.is_success() for result in task_results])
+        self.assertEqual(3, len(responses.calls))  # the failing report of task 1 didn't stop the others
+        snapshot = task_metrics.snapshot()
+        self.assertEqual({"my_topic": 1}, snapshot["counters"]["tasks_completed_total"])
+        self.assertEqual({"my_topic": 1}, snapshot["counters"]["tasks_failed_total"])
+        self.assertEqual({"my_topic": 0}, snapshot["gauges"]["tasks_in_flight"])
+        self.assertEqual(1, snapshot["histograms"]["handler_duration_seconds"]["my_topic"]["count"])
+
+    @responses.activate
+    def test_execute_batch_fails_all_tasks_if_handler_raises(self):
+        tasks = [ExternalTask({"id": task_id, "topicName": "my_topic"}) for task_id in ["1", "2"]]
+        external_task_client = ExternalTaskClient(worker_id=1)
+        for task in tasks:
+            responses.add(responses.POST, external_task_client.get_task_failure_url(task.get_task_id()),
+                          status=HTTPStatus.NO_CONTENT)
+        executor = ExternalTaskExecutor(worker_id=1, external_task_client=external_task_client)
+
+        def handler(batch):
+            raise ValueError("model not loaded")
+
+        task_results = executor.execute_batch(tasks, BatchHandler(handler), max_retries=3, retry_timeout=1000)
+
+        self.assertEqual(["Batch handler failed"] * 2, [result.error_message for result in task_results])
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_memoized_handler_completes_hits_without_running_the_handler(self):
+        tasks = [ExternalTask({"id": task_id, "topicName": "my_topic", "variables": {"zipCode": {"value": "1000"}}})
+                 for task_id in ["1", "2"]]
+        external_task_client = ExternalTaskClient(worker_id=1)
+        for task in tasks:
+            responses.add(responses.POST, external_task_client.get_task_complete_url(task.get_task_id()),
+                          status=HTTPStatus.NO_CONTENT)
+        task_metrics = Metrics()
+        executor = ExternalTaskExecutor(worker_id=1, external_task_client=external_task_client, metrics=task_metrics)
+        action = mock.Mock(side_effect=self.task_success_action)
+        memoized = MemoizedHandler(action, key_variables=["zipCode"])
+
+        results = [executor.execute_task(task, memoized) for task in tasks]
+
+        self.assertEqual(1, action.call_count)
+        self.assertEqual(results[0].global_variables, results[1].global_variables)
+        self.assertEqual(2, len(responses.calls))
+        counters = task_metrics.snapshot()["counters"]
+        self.assertEqual({"my_topic": 1}, counters["memo_hits_total"])
+        self.assertEqual({"my_topic": 1}, counters["memo_misses_total"])
+
+
+class RecordingTracer:
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, attributes=None):
+        span = mock.MagicMock()
+        span.__enter__.return_value = span
+        span.__exit__.return_value = False
+        self.spans.append((name, attributes, span))
+        return span
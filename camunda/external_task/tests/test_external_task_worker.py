@@ -1,3 +1,5 @@
+import threading
+import time
 from http import HTTPStatus
 from unittest import mock, TestCase
 from unittest.mock import patch
@@ -5,8 +7,11 @@ from unittest.mock import patch
 import responses
 
 from camunda.client.external_task_client import ExternalTaskClient
+from camunda.external_task.batch import BatchHandler
 from camunda.external_task.external_task import TaskResult, ExternalTask
 from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.testing.fake_engine import FakeEngine
+from camunda.utils.metrics import Metrics
 
 
 class ExternalTaskWorkerTest(TestCase):
@@ -130,8 +135,7 @@ class ExternalTaskWorkerTest(TestCase):
                          str(context.exception))
 
     @responses.activate
-    @patch('time.sleep', return_value=None)
-    def test_fetch_and_execute_safe_raises_exception_sleep_is_called(self, mock_time_sleep):
+    def test_fetch_and_execute_safe_raises_exception_sleep_is_called(self):
         external_task_client = ExternalTaskClient(worker_id=0)
         responses.add(responses.POST, external_task_client.get_fetch_and_lock_url(),
                       status=HTTPStatus.INTERNAL_SERVER_ERROR)
@@ -140,8 +144,216 @@ class ExternalTaskWorkerTest(TestCase):
         worker = ExternalTaskWorker(worker_id=0, config={"sleepSeconds": sleep_seconds})
         mock_action = mock.Mock()
 
-        worker._fetch_and_execute_safe("my_topic", mock_action)
+        with patch.object(worker._stop_event, 'wait', return_value=False) as mock_time_sleep:
+            worker._fetch_and_execute_safe("my_topic", mock_action)
 
         self.assertEqual(0, mock_action.call_count)
         self.assertEqual(1, mock_time_sleep.call_count)
         mock_time_sleep.assert_called_with(sleep_seconds)
+
+    def test_subscribe_returns_after_stop(self):
+        worker = ExternalTaskWorker(worker_id=0)
+        mock_action = mock.Mock()
+
+        with patch.object(worker, '_fetch_and_execute_safe', side_effect=lambda *args: worker.stop()) as mock_fetch:
+            worker.subscribe("my_topic", mock_action)
+
+        self.assertEqual(1, mock_fetch.call_count)
+
+    def test_execute_tasks_runs_most_important_tasks_first(self):
+        worker = ExternalTaskWorker(worker_id=0)
+        tasks = [ExternalTask({"id": "low"}), ExternalTask({"id": "high", "priority": 10}),
+                 ExternalTask({"id": "mid", "priority": 5}), ExternalTask({"id": "low2", "priority": 0})]
+
+        with patch.object(worker, '_execute_task') as mock_execute_task:
+            worker._execute_tasks(tasks, mock.Mock())
+
+        self.assertEqual(["high", "mid", "low", "low2"],
+                         [call.args[0].get_task_id() for call in mock_execute_task.call_args_list])
+
+    def test_fetch_and_execute_collects_batches_up_to_max_batch_size(self):
+        batch_sizes = []
+
+        def handler(tasks):
+            batch_sizes.append(len(tasks))
+            return [task.complete() for task in tasks]
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 5)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url, config={"asyncResponseTimeout": 5000})
+            batch_handler = BatchHandler(handler, max_batch_size=3, max_wait_seconds=0.3)
+            worker.fetch_and_execute("topicA", batch_handler)
+            worker.fetch_and_execute("topicA", batch_handler)
+
+            self.assertEqual(5, engine.count_tasks("completed"))
+        self.assertEqual(3, batch_sizes[0])
+        self.assertEqual(5, sum(batch_sizes))
+
+    def test_fetch_and_execute_runs_incomplete_batch_after_max_wait(self):
+        batch_sizes = []
+
+        def handler(tasks):
+            batch_sizes.append(len(tasks))
+            return [task.complete() for task in tasks]
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 2)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url, config={"asyncResponseTimeout": 5000})
+            start = time.monotonic()
+            worker.fetch_and_execute("topicA", BatchHandler(handler, max_batch_size=10, max_wait_seconds=0.2))
+
+            self.assertLess(time.monotonic() - start, 2)
+            self.assertEqual(2, engine.count_tasks("completed"))
+        self.assertEqual([2], batch_sizes)
+
+    def test_hung_handler_times_out_before_its_lock_expires(self):
+        release = threading.Event()
+
+        def hang(task):
+            release.wait()
+            return task.complete()
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 1)
+            engine.add_tasks("topicB", 1)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"lockDuration": 400, "handlerTimeoutSeconds": 60,
+                                                "handlerTimeoutMarginSeconds": 0.1, "maxTasks": 2,
+                                                "asyncResponseTimeout": 0})
+            worker.topic_configs = {"topicB": {"handlerTimeoutPolicy": "unlock"}}
+            start = time.monotonic()
+            worker.fetch_and_execute(["topicA", "topicB"], hang)
+            release.set()
+
+            self.assertLess(time.monotonic() - start, 1)
+            failed, unlocked = (next(task for task in engine.tasks.values() if task.topic_name == topic)
+                                for topic in ["topicA", "topicB"])
+            self.assertEqual("Handler timed out", failed.error_message)
+            self.assertIsNone(unlocked.worker_id)
+            self.assertEqual(1, engine.stats["failures"])
+
+    def test_abandoned_handlers_do_not_fill_up_the_handler_pool(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        handled = []
+
+        def handle(task):
+            handled.append(task.get_task_id())
+            if len(handled) <= 2:
+                release.wait()
+            return task.complete()
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 3)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"handlerTimeoutSeconds": 0.1, "maxTasks": 3, "asyncResponseTimeout": 0})
+            worker.fetch_and_execute(["topicA"], handle)
+
+            self.assertEqual(3, len(handled))
+            self.assertEqual(2, worker.executor.abandoned_handlers)
+            self.assertEqual((2, 1), (engine.stats["failures"], engine.stats["completed"]))
+
+    def test_failed_timeout_report_does_not_skip_other_tasks(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 2)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"handlerTimeoutSeconds": 0.05, "handlerTimeoutPolicy": "unlock",
+                                                "maxTasks": 2, "asyncResponseTimeout": 0})
+            with patch.object(worker.client, "unlock", side_effect=[Exception("engine down"), None]) as unlock:
+                worker.fetch_and_execute(["topicA"], lambda task: release.wait())
+
+            self.assertEqual(2, unlock.call_count)
+
+    def test_fetched_tasks_are_counted_per_topic(self):
+        worker_metrics = Metrics()
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 2)
+            engine.add_tasks("topicB", 1)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"maxTasks": 3, "asyncResponseTimeout": 0}, metrics=worker_metrics)
+            worker.fetch_and_execute(["topicA", "topicB"], lambda task: task.complete())
+
+        counters = worker_metrics.snapshot()["counters"]
+        self.assertEqual({"topicA": 2, "topicB": 1}, counters["tasks_fetched_total"])
+        self.assertEqual({"topicA,topicB": 1}, counters["fetch_total"])
+
+    @patch("camunda.external_task.external_task_executor.time.perf_counter")
+    @patch("camunda.external_task.external_task_worker.time.perf_counter")
+    def test_nothing_is_timed_without_metrics(self, worker_perf_counter, executor_perf_counter):
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 1)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"asyncResponseTimeout": 0})
+            worker.fetch_and_execute(["topicA"], lambda task: task.complete())
+
+            self.assertEqual(1, engine.stats["completed"])
+        worker_perf_counter.assert_not_called()
+        executor_perf_counter.assert_not_called()
+
+    def test_handler_runs_on_the_worker_thread_without_handler_timeout(self):
+        threads = []
+
+        def handle(task):
+            threads.append(threading.current_thread())
+            return task.complete()
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicA", 1)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"asyncResponseTimeout": 0})
+            worker.fetch_and_execute(["topicA"], handle)
+
+            self.assertEqual([threading.current_thread()], threads)
+            self.assertEqual(1, engine.stats["completed"])
+
+    def test_lock_is_counted_from_the_end_of_a_long_poll(self):
+        handled = []
+
+        def handle(task):
+            handled.append(task.get_task_id())
+            return task.complete()
+
+        with FakeEngine() as engine:
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"lockDuration": 400, "handlerTimeoutSeconds": 60,
+                                                "handlerTimeoutMarginSeconds": 0.1, "asyncResponseTimeout": 2000})
+            add_task_later = threading.Timer(0.3, engine.add_task, args=("topicA",))
+            add_task_later.start()
+            worker.fetch_and_execute(["topicA"], handle)
+            add_task_later.join()
+
+            self.assertEqual(1, len(handled))
+            self.assertEqual(1, engine.stats["completed"])
+            self.assertEqual(0, engine.stats["failures"])
+
+    def test_topic_configs_override_lock_duration_and_retries(self):
+        locks = {}
+
+        def fail(task):
+            locks[task.get_topic_name()] = engine.tasks[task.get_task_id()].lock_expires_at - time.monotonic()
+            return task.failure("error", "details")
+
+        with FakeEngine() as engine:
+            engine.add_tasks("fastTopic", 1)
+            engine.add_tasks("slowTopic", 1)
+            worker = ExternalTaskWorker(worker_id="worker1", base_url=engine.base_url,
+                                        config={"maxTasks": 2, "asyncResponseTimeout": 0, "retries": 3,
+                                                "retryTimeout": 60000})
+            worker.topic_configs = {"fastTopic": {"lockDuration": 2000, "retries": 1, "retryTimeout": 0}}
+            worker.fetch_and_execute(["fastTopic", "slowTopic"], fail)
+
+            fast, slow = (next(task for task in engine.tasks.values() if task.topic_name == topic)
+                          for topic in ["fastTopic", "slowTopic"])
+            self.assertLess(locks["fastTopic"], 2)
+            self.assertGreater(locks["slowTopic"], 200)
+            self.assertEqual(1, fast.retries)
+            self.assertEqual(3, slow.retries)
+            self.assertLessEqual(fast.due_at, time.monotonic())
+            self.assertGreater(slow.due_at, time.monotonic() + 50)
+
+    def test_invalid_handler_timeout_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ExternalTaskWorker(worker_id=0, config={"handlerTimeoutPolicy": "ignore"})
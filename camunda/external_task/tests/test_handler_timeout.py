@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from camunda.external_task.handler_timeout import (HandlerTimeoutError, call_with_timeout,
+                                                   get_handler_timeout_seconds, validate_handler_timeout_policy)
+
+
+class HandlerTimeoutTest(TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(thread_name_prefix="test")
+        self.addCleanup(self.executor.shutdown, wait=False)
+
+    def test_timeout_is_bound_to_remaining_lock_time_minus_margin(self):
+        self.assertEqual(25, get_handler_timeout_seconds(None, 5, 60000, lock_deadline=130, now=100))
+        self.assertEqual(10, get_handler_timeout_seconds(10, 5, 60000, lock_deadline=130, now=100))
+        self.assertEqual(0, get_handler_timeout_seconds(None, 5, 60000, lock_deadline=102, now=100))
+
+    def test_margin_is_capped_at_half_the_lock_duration(self):
+        self.assertEqual(1.5, get_handler_timeout_seconds(None, 5, 1000, lock_deadline=102, now=100))
+
+    def test_zero_disables_and_unknown_lock_keeps_configured_timeout(self):
+        self.assertIsNone(get_handler_timeout_seconds(0, 5, 60000, lock_deadline=130, now=100))
+        self.assertIsNone(get_handler_timeout_seconds(None, 5, 60000, lock_deadline=None))
+        self.assertEqual(10, get_handler_timeout_seconds(10, 5, 60000, lock_deadline=None))
+
+    def test_call_with_timeout_returns_result_or_raises(self):
+        self.assertEqual(4, call_with_timeout(self.executor, lambda x: x * 2, 2, 1))
+        with self.assertRaises(ValueError):
+            call_with_timeout(self.executor, int, "not a number", 1)
+
+    def test_call_with_timeout_abandons_hung_thread(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def hang(arg):
+            started.set()
+            release.wait()
+
+        with self.assertRaises(HandlerTimeoutError) as context:
+            call_with_timeout(self.executor, hang, None, 0.05)
+        self.assertEqual(0.05, context.exception.timeout_seconds)
+        self.assertTrue(context.exception.abandoned)
+        self.assertTrue(started.is_set())
+        release.set()
+
+    def test_threads_of_the_executor_are_reused(self):
+        first = call_with_timeout(self.executor, lambda _: threading.current_thread(), None, 1)
+        second = call_with_timeout(self.executor, lambda _: threading.current_thread(), None, 1)
+
+        self.assertIs(first, second)
+
+    def test_no_call_is_started_without_time_left(self):
+        called = []
+
+        with self.assertRaises(HandlerTimeoutError):
+            call_with_timeout(self.executor, called.append, None, 0)
+        self.assertEqual([], called)
+
+    def test_invalid_policy_is_rejected(self):
+        validate_handler_timeout_policy("unlock")
+        with self.assertRaises(ValueError):
+            validate_handler_timeout_policy("retry")
@@ -0,0 +1,87 @@
+from unittest import TestCase, mock
+
+from camunda.external_task.external_task import ExternalTask
+from camunda.external_task.memoize import MemoizedHandler
+from camunda.utils.ttl_cache import TTLCache
+
+
+def create_task(task_id, street, zip_code="1000", other="x"):
+    return ExternalTask({"id": task_id, "topicName": "normalizeAddress", "variables": {
+        "street": {"value": street}, "zipCode": {"value": zip_code}, "other": {"value": other}}})
+
+
+def normalize_address(task):
+    return task.complete({"street": task.get_variable("street").upper()}, {"normalized": True})
+
+
+class MemoizedHandlerTest(TestCase):
+
+    def test_results_are_cached_by_key_variables(self):
+        handler = mock.Mock(side_effect=normalize_address)
+        memoized = MemoizedHandler(handler, key_variables=["street", "zipCode"])
+
+        first = memoized(create_task("1", "main st"))
+        second = memoized(create_task("2", "main st", other="y"))
+        memoized(create_task("3", "main st", zip_code="2000"))
+
+        self.assertEqual(2, handler.call_count)
+        self.assertEqual("2", second.get_task().get_task_id())
+        self.assertEqual((first.global_variables, first.local_variables),
+                         (second.global_variables, second.local_variables))
+        self.assertEqual((1, 2), (memoized.hits, memoized.misses))
+        self.assertAlmostEqual(1 / 3, memoized.get_hit_ratio())
+
+    def test_tasks_missing_a_key_variable_bypass_the_cache(self):
+        handler = mock.Mock(side_effect=lambda task: task.complete({"taskId": task.get_task_id()}))
+        cache = TTLCache(60)
+        memoized = MemoizedHandler(handler, key_variables=["street", "houseNumber"], cache=cache)
+
+        memoized(create_task("1", "main st"))
+        second = memoized(create_task("2", "main st"))
+
+        self.assertEqual(2, handler.call_count)
+        self.assertEqual({"taskId": "2"}, second.global_variables)
+        self.assertEqual(0, len(cache))
+
+    def test_values_that_are_not_json_bypass_the_cache(self):
+        handler = mock.Mock(side_effect=normalize_address)
+        cache = TTLCache(60)
+        memoized = MemoizedHandler(handler, key_variables=["zipCode"], cache=cache)
+
+        memoized(create_task("1", "main st", zip_code=object()))
+        memoized(create_task("2", "main st", zip_code=object()))
+
+        self.assertEqual(2, handler.call_count)
+        self.assertEqual(0, len(cache))
+
+    def test_failures_are_not_cached(self):
+        handler = mock.Mock(side_effect=lambda task: task.failure("lookup failed", "", 3, 1000))
+        memoized = MemoizedHandler(handler, key_variables=["street"])
+
+        memoized(create_task("1", "main st"))
+        memoized(create_task("2", "main st"))
+
+        self.assertEqual(2, handler.call_count)
+        self.assertEqual(0, memoized.get_hit_ratio())
+
+    def test_handlers_sharing_a_cache_have_separate_keys(self):
+        cache = TTLCache(60)
+        first = MemoizedHandler(normalize_address, ["street"], cache=cache, name="first")
+        second = MemoizedHandler(lambda task: task.complete({"other": True}), ["street"], cache=cache, name="second")
+
+        first(create_task("1", "main st"))
+        result = second(create_task("2", "main st"))
+
+        self.assertEqual({"other": True}, result.global_variables)
+        self.assertEqual(2, len(cache))
+
+    def test_cache_errors_count_as_misses(self):
+        cache = mock.Mock()
+        cache.get.side_effect = OSError("disk full")
+        cache.set.side_effect = OSError("disk full")
+        memoized = MemoizedHandler(normalize_address, ["street"], cache=cache)
+
+        result = memoized(create_task("1", "main st"))
+
+        self.assertTrue(result.is_success())
+        self.assertEqual(1, memoized.misses)
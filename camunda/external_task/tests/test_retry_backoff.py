@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from camunda.external_task.retry_backoff import RetryBackoff
+
+
+class RetryBackoffTest(TestCase):
+
+    def test_fixed_backoff_keeps_retry_timeout(self):
+        backoff = RetryBackoff()
+
+        self.assertEqual([1000, 1000, 1000], [backoff.get_retry_timeout(1000, retries, 3) for retries in (3, 2, 1)])
+
+    def test_exponential_backoff_grows_with_previous_failures(self):
+        backoff = RetryBackoff("exponential", factor=3)
+
+        self.assertEqual([1000, 3000, 9000, 27000],
+                         [backoff.get_retry_timeout(1000, retries, 3) for retries in (3, 2, 1, 0)])
+        self.assertEqual(1000, backoff.get_retry_timeout(1000, 2, None))
+        self.assertEqual(1000, backoff.get_retry_timeout(1000, 5, 3))
+
+    def test_exponential_backoff_is_capped(self):
+        backoff = RetryBackoff("exponential", max_retry_timeout=5000)
+
+        self.assertEqual([1000, 2000, 4000, 5000, 5000],
+                         [backoff.get_retry_timeout(1000, retries, 5) for retries in (5, 4, 3, 2, 1)])
+
+    def test_jitter(self):
+        full = RetryBackoff("exponential", jitter="full", random_func=lambda: 0.25)
+        equal = RetryBackoff("exponential", jitter="equal", random_func=lambda: 0.25)
+
+        self.assertEqual(1000, full.get_retry_timeout(1000, 1, 3))
+        self.assertEqual(2500, equal.get_retry_timeout(1000, 1, 3))
+
+    def test_from_config(self):
+        backoff = RetryBackoff.from_config({"retryBackoff": "exponential", "retryBackoffFactor": 1.5,
+                                            "retryTimeoutMax": 60000, "retryJitter": "full"})
+
+        self.assertEqual(("exponential", 1.5, 60000, "full"),
+                         (backoff.strategy, backoff.factor, backoff.max_retry_timeout, backoff.jitter))
+
+    def test_invalid_config_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RetryBackoff("linear")
+        with self.assertRaises(ValueError):
+            RetryBackoff(jitter="some")
+        with self.assertRaises(ValueError):
+            RetryBackoff("exponential", factor=0.5)
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.external_task.sharding import get_shard, get_shard_index
+from camunda.testing.fake_engine import FakeEngine
+
+TENANT_IDS = [f"tenant{i}" for i in range(10)]
+
+
+class ShardingTest(TestCase):
+
+    def test_get_shard_gives_disjoint_slices_covering_all_values(self):
+        shards = [get_shard(TENANT_IDS, shard_index, 3) for shard_index in range(3)]
+
+        self.assertEqual(sorted(TENANT_IDS), sorted(value for shard in shards for value in shard))
+        self.assertEqual([4, 3, 3], [len(shard) for shard in shards])
+        self.assertEqual(shards[1], get_shard(list(reversed(TENANT_IDS)), 1, 3))
+
+    def test_get_shard_rejects_invalid_and_empty_shards(self):
+        with self.assertRaises(ValueError):
+            get_shard(TENANT_IDS, 3, 3)
+        with self.assertRaises(ValueError):
+            get_shard(TENANT_IDS, 0, 0)
+        with self.assertRaises(ValueError):
+            get_shard(["tenant1"], 1, 2)
+
+    def test_get_shard_index_is_stable(self):
+        self.assertEqual(get_shard_index("order-1", 8), get_shard_index("order-1", 8))
+        self.assertEqual(3769860079 % 8, get_shard_index("order-1", 8))  # crc32 of "order-1"
+        self.assertEqual({0, 1, 2, 3}, {get_shard_index(f"order-{i}", 4) for i in range(100)})
+
+
+class ShardedWorkersTest(TestCase):
+
+    def setUp(self):
+        self.engine = FakeEngine().start()
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def test_workers_only_fetch_tasks_of_their_shard(self):
+        for tenant_id in TENANT_IDS:
+            self.engine.add_task("topicA", tenant_id=tenant_id)
+        fetched = {}
+
+        for shard_index in range(2):
+            worker = ExternalTaskWorker(f"worker{shard_index}", self.engine.base_url,
+                                        {"maxTasks": 10, "asyncResponseTimeout": 0})
+            worker.topic_configs = {"topicA": {"tenantIdIn": get_shard(TENANT_IDS, shard_index, 2)}}
+            worker.fetch_and_execute("topicA", lambda task: task.complete())
+            fetched[shard_index] = {task.tenant_id for task in self.engine.tasks.values()
+                                    if task.worker_id == f"worker{shard_index}"}
+
+        self.assertEqual(set(get_shard(TENANT_IDS, 0, 2)), fetched[0])
+        self.assertEqual(set(get_shard(TENANT_IDS, 1, 2)), fetched[1])
+        self.assertEqual(10, self.engine.count_tasks("completed"))
@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+from camunda.external_task.external_task import ExternalTask
+from camunda.external_task.task_queue import TaskQueue
+
+
+def create_task(task_id, priority=None):
+    return ExternalTask({"id": task_id, "topicName": "topicA", "priority": priority})
+
+
+class TaskQueueTest(TestCase):
+
+    def test_pop_returns_highest_priority_then_arrival_order(self):
+        queue = TaskQueue()
+        queue.push(create_task("low"), None, "topicA")
+        queue.push(create_task("high1", 10), None, "topicB")
+        queue.push(create_task("mid", 5), None, "topicA")
+        queue.push(create_task("high2", 10), None, "topicB")
+
+        self.assertEqual(["high1", "high2", "mid", "low"],
+                         [queue.pop().task.get_task_id() for _ in range(len(queue))])
+
+    def test_pop_orders_equal_priorities_by_lock_deadline(self):
+        queue = TaskQueue(order_by_lock_deadline=True)
+        queue.push(create_task("late"), None, "topicA", lock_deadline=20)
+        queue.push(create_task("early"), None, "topicB", lock_deadline=10)
+        queue.push(create_task("important", 1), None, "topicA", lock_deadline=30)
+
+        self.assertEqual(["important", "early", "late"], [queue.pop().task.get_task_id() for _ in range(len(queue))])
+
+    def test_pop_ignores_lock_deadline_by_default(self):
+        queue = TaskQueue()
+        queue.push(create_task("late"), None, "topicA", lock_deadline=20)
+        queue.push(create_task("early"), None, "topicB", lock_deadline=10)
+
+        self.assertEqual("late", queue.pop().task.get_task_id())
+
+    def test_pop_expired(self):
+        queue = TaskQueue()
+        queue.push(create_task("expired"), None, "topicA", lock_deadline=10)
+        queue.push(create_task("locked"), None, "topicB", lock_deadline=20)
+        queue.push(create_task("unknown"), None, "topicB")
+
+        self.assertEqual(["expired"], [queued.task.get_task_id() for queued in queue.pop_expired(now=15)])
+        self.assertEqual(2, len(queue))
+        self.assertEqual({"topicB": 2}, queue.count_by_topic())
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+
+from camunda.external_task.task_slots import TaskSlots
+
+
+class TaskSlotsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_acquire_waits_for_global_limit(self):
+        slots = TaskSlots(2)
+        await slots.acquire("topicA")
+        await slots.acquire("topicB")
+
+        waiter = asyncio.create_task(slots.acquire("topicA"))
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        slots.release("topicB")
+        await asyncio.wait_for(waiter, 1)
+        self.assertEqual({"topicA": 2, "topicB": 0}, dict(slots.in_flight))
+
+    async def test_acquire_waits_for_topic_limit_but_other_topics_proceed(self):
+        slots = TaskSlots(10)
+        slots.configure("topicA", max_concurrent_tasks=1)
+        await slots.acquire("topicA")
+
+        waiter = asyncio.create_task(slots.acquire("topicA"))
+        await asyncio.wait_for(slots.acquire("topicB"), 1)
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        slots.release("topicA")
+        await asyncio.wait_for(waiter, 1)
+
+    async def test_freed_slots_are_shared_by_weight(self):
+        slots = TaskSlots(3)
+        slots.configure("flood", weight=1)
+        slots.configure("important", weight=2)
+        for _ in range(3):
+            await slots.acquire("flood")
+
+        granted = []
+
+        async def acquire(topic):
+            await slots.acquire(topic)
+            granted.append(topic)
+
+        waiters = [asyncio.create_task(acquire(topic)) for topic in ["flood", "important", "important"]]
+        await asyncio.sleep(0)
+        for _ in range(3):
+            slots.release("flood")
+            await asyncio.sleep(0)
+
+        self.assertEqual(["important", "important", "flood"], granted)
+        self.assertEqual({"flood": 1, "important": 2}, dict(slots.in_flight))
+        await asyncio.gather(*waiters)
+
+    async def test_cancelled_waiter_does_not_take_a_slot(self):
+        slots = TaskSlots(1)
+        await slots.acquire("topicA")
+        waiter = asyncio.create_task(slots.acquire("topicB"))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        slots.release("topicA")
+
+        self.assertEqual(0, slots.total_in_flight())
+        self.assertNotIn("topicB", slots.occupancy())
+
+    async def test_occupancy(self):
+        slots = TaskSlots(5)
+        slots.configure("topicA", max_concurrent_tasks=1, weight=2)
+        await slots.acquire("topicA")
+        waiter = asyncio.create_task(slots.acquire("topicA"))
+        await asyncio.sleep(0)
+
+        self.assertEqual({"topicA": {"in_flight": 1, "max_concurrent_tasks": 1, "weight": 2, "waiting": 1}},
+                         slots.occupancy())
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    def test_configure_rejects_invalid_values(self):
+        slots = TaskSlots(5)
+        with self.assertRaises(ValueError):
+            slots.configure("topicA", weight=0)
+        with self.assertRaises(ValueError):
+            slots.configure("topicA", max_concurrent_tasks=0)
+
+    async def test_releasing_more_slots_than_held_raises(self):
+        slots = TaskSlots(1)
+        await slots.acquire("topicA")
+        slots.release("topicA")
+
+        with self.assertRaises(ValueError):
+            slots.release("topicA")
+        self.assertEqual(0, slots.total_in_flight())
@@ -0,0 +1,130 @@
+import asyncio
+import time
+import unittest
+
+import httpx
+
+from camunda.external_task.async_external_task_worker import AsyncExternalTaskWorker
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.testing.fake_engine import FakeEngine
+
+
+class TaskStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = FakeEngine().start()
+        self.worker = ExternalTaskWorker("worker1", self.engine.base_url,
+                                         {"asyncResponseTimeout": 100, "lockDuration": 10000})
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def test_tasks_are_reported_explicitly(self):
+        self.engine.add_tasks("topicA", 3)
+
+        tasks = self.worker.tasks("topicA", buffer_size=3)
+        first = next(tasks)
+        self.assertGreater(first.get_remaining_lock_seconds(), 5)
+        first.extend_lock(60000)
+        self.assertGreater(first.get_remaining_lock_seconds(), 55)
+        first.complete({"done": True})
+        next(tasks).failure("invalid input", max_retries=0)
+        next(tasks).bpmn_error("REJECTED", "rejected")
+        tasks.close()
+
+        self.assertEqual(1, self.engine.count_tasks("completed"))
+        self.assertEqual(1, self.engine.count_tasks("incident"))
+        self.assertEqual(1, self.engine.count_tasks("bpmn_error"))
+        self.assertEqual(1, self.engine.stats["fetch_and_lock"])
+
+    def test_closing_unlocks_buffered_tasks(self):
+        self.engine.add_tasks("topicA", 3)
+
+        tasks = self.worker.tasks("topicA", buffer_size=3)
+        next(tasks).complete()
+        tasks.close()
+
+        unlocked = [task for task in self.engine.tasks.values() if task.state == "available"]
+        self.assertEqual(2, len(unlocked))
+        self.assertTrue(all(task.worker_id is None for task in unlocked))
+
+    def test_iteration_ends_after_stop(self):
+        self.engine.add_tasks("topicA", 1)
+
+        for task in self.worker.tasks("topicA"):
+            task.complete()
+            self.worker.stop()
+
+        self.assertEqual(1, self.engine.count_tasks("completed"))
+
+
+class AsyncTaskStreamTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = FakeEngine().start()
+        self.http_client = httpx.AsyncClient()
+        self.worker = AsyncExternalTaskWorker("worker1", self.engine.base_url,
+                                              {"asyncResponseTimeout": 100, "sleepSeconds": 0},
+                                              http_client=self.http_client)
+
+    async def asyncTearDown(self):
+        await self.worker.stop()
+        await self.http_client.aclose()
+        self.engine.stop()
+
+    async def test_buffer_is_bounded(self):
+        self.engine.add_tasks("topicA", 10)
+        completed = 0
+
+        async with self.worker.tasks(["topicA"], buffer_size=3) as tasks:
+            async for task in tasks:
+                await asyncio.sleep(0.01)  # give the fetch loop time to overfill the buffer, if it would
+                self.assertLessEqual(sum(t.is_locked(time.monotonic()) for t in self.engine.tasks.values()), 4)
+                await task.complete({"done": True})
+                completed += 1
+                if completed == 10:
+                    break
+
+        self.assertEqual(10, self.engine.count_tasks("completed"))
+
+    async def test_tasks_of_several_topics_and_explicit_reports(self):
+        self.engine.add_task("topicA")
+        self.engine.add_task("topicB")
+        topics = []
+
+        async with self.worker.tasks(["topicA", "topicB"]) as tasks:
+            async for task in tasks:
+                topics.append(task.get_topic_name())
+                await task.extend_lock(60000)
+                await task.failure("not yet", max_retries=0)
+                if len(topics) == 2:
+                    break
+
+        self.assertEqual(["topicA", "topicB"], sorted(topics))
+        self.assertEqual(2, self.engine.count_tasks("incident"))
+
+    async def test_closing_unlocks_buffered_tasks(self):
+        self.engine.add_tasks("topicA", 3)
+        # without long polling, so no abandoned long poll locks the unlocked tasks again
+        worker = AsyncExternalTaskWorker("worker1", self.engine.base_url,
+                                         {"asyncResponseTimeout": 0, "sleepSeconds": 0.01},
+                                         http_client=self.http_client)
+
+        async with worker.tasks(["topicA"], buffer_size=3) as tasks:
+            async for task in tasks:
+                await task.complete()
+                await asyncio.sleep(0.05)
+                break
+
+        unlocked = [task for task in self.engine.tasks.values() if task.state == "available"]
+        self.assertEqual(2, len(unlocked))
+        self.assertTrue(all(task.worker_id is None for task in unlocked))
+
+    async def test_iteration_ends_after_stop(self):
+        self.engine.add_tasks("topicA", 1)
+
+        async for task in self.worker.tasks(["topicA"]):
+            await task.complete()
+            await self.worker.stop()
+
+        self.assertEqual(1, self.engine.count_tasks("completed"))
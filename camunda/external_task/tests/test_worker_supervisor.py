@@ -0,0 +1,102 @@
+import asyncio
+import sys
+import threading
+import time
+from unittest import TestCase, skipIf
+
+from camunda.client.external_task_client import ExternalTaskClient
+from camunda.external_task.async_external_task_worker import AsyncExternalTaskWorker
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.external_task.worker_supervisor import WorkerSupervisor
+from camunda.testing.fake_engine import FakeEngine
+
+
+def complete_task(task):
+    return task.complete({"done": True})
+
+
+async def complete_task_slowly(task):
+    await asyncio.sleep(0.5)
+    return task.complete({"done": True})
+
+
+def fail_to_create_worker(worker_id):
+    raise RuntimeError("handler module is broken")
+
+
+@skipIf(sys.platform == "win32", "needs os.fork")
+class WorkerSupervisorTest(TestCase):
+
+    def setUp(self):
+        self.engine = FakeEngine().start()
+        self.supervisor_thread = None
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def start_supervisor(self, supervisor):
+        self.supervisor_thread = threading.Thread(target=supervisor.run, daemon=True)
+        self.supervisor_thread.start()
+        return supervisor
+
+    def stop_supervisor(self, supervisor):
+        supervisor.stop()
+        self.supervisor_thread.join(timeout=10)
+        self.assertFalse(self.supervisor_thread.is_alive())
+
+    def create_sync_worker(self, worker_id):
+        return ExternalTaskWorker(worker_id, self.engine.base_url, {"asyncResponseTimeout": 200, "sleepSeconds": 0})
+
+    def create_async_worker(self, worker_id):
+        return AsyncExternalTaskWorker(worker_id, self.engine.base_url, {"asyncResponseTimeout": 200,
+                                                                        "sleepSeconds": 0})
+
+    def test_children_process_tasks_with_derived_worker_ids(self):
+        self.engine.add_tasks("topicA", 20)
+        supervisor = self.start_supervisor(WorkerSupervisor(
+            self.create_sync_worker, lambda worker: worker.subscribe("topicA", complete_task), processes=2,
+            worker_id_prefix="host1",
+        ))
+
+        self.assertTrue(self.engine.wait_until(lambda e: e.count_tasks("completed") == 20))
+        self.stop_supervisor(supervisor)
+
+        worker_ids = {task.worker_id for task in self.engine.tasks.values()}
+        self.assertTrue(worker_ids)
+        self.assertTrue(worker_ids <= {"host1-0", "host1-1"})
+        self.assertEqual(0, supervisor.restarts)
+
+    def test_crashed_children_are_restarted_with_backoff(self):
+        supervisor = self.start_supervisor(WorkerSupervisor(
+            fail_to_create_worker, lambda worker: None, processes=1,
+            restart_backoff_seconds=0.01, max_restart_backoff_seconds=0.05,
+        ))
+
+        deadline = time.monotonic() + 10
+        while supervisor.restarts < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.stop_supervisor(supervisor)
+
+        self.assertGreaterEqual(supervisor.restarts, 3)
+        self.assertEqual(supervisor.restarts, supervisor.children[0].failures)
+
+    def test_stop_drains_running_tasks_of_async_children(self):
+        self.engine.add_tasks("topicA", 2)
+        supervisor = self.start_supervisor(WorkerSupervisor(
+            self.create_async_worker, lambda worker: worker.subscribe({"topicA": complete_task_slowly}),
+            processes=1, drain_timeout_seconds=10,
+        ))
+
+        self.assertTrue(self.engine.wait_until(lambda e: e.stats["fetched"] == 2))
+        self.stop_supervisor(supervisor)
+
+        self.assertEqual(2, self.engine.count_tasks("completed"))
+        self.assertEqual(0, self.engine.stats["failures"])
+
+    def test_default_drain_outlasts_a_default_long_poll_of_sync_children(self):
+        config = ExternalTaskClient.default_config
+        long_poll_seconds = (config["asyncResponseTimeout"] + config["timeoutDeltaMillis"]) / 1000
+
+        supervisor = WorkerSupervisor(lambda worker_id: None, lambda worker: None)
+
+        self.assertGreater(supervisor.drain_timeout_seconds, long_poll_seconds)
@@ -0,0 +1,187 @@
+import asyncio
+import importlib
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+
+from camunda.client.external_task_client import ExternalTaskClient
+from camunda.external_task.async_external_task_worker import AsyncExternalTaskWorker
+from camunda.utils.log_utils import log_with_context
+
+# a sync worker only sees SIGTERM after its current fetchAndLock, a long poll of up to the HTTP timeout of the
+# default config, then it finishes the tasks of that fetch
+DEFAULT_DRAIN_TIMEOUT_SECONDS = (ExternalTaskClient.default_config["asyncResponseTimeout"]
+                                 + ExternalTaskClient.default_config["timeoutDeltaMillis"]) / 1000 + 30
+
+
+class WorkerSupervisor:
+    """
+    Prefork supervisor running one worker per process, e.g. to use all cores with CPU bound handlers:
+
+        def create_worker(worker_id):
+            return ExternalTaskWorker(worker_id=worker_id, config=config)
+
+        def run_worker(worker):
+            worker.subscribe("topicName", handle_task)
+
+        WorkerSupervisor(create_worker, run_worker, processes=4, preload_modules=["my_handlers"]).run()
+
+    create_worker(worker_id) builds an ExternalTaskWorker or AsyncExternalTaskWorker in the child process and
+    run_worker(worker) runs it (returning a coroutine for async workers). Child i gets the worker_id
+    "<worker_id_prefix>-<i>", which stays the same across restarts.
+
+    Modules and handlers are imported in the supervisor before forking, so children start without importing
+    them again and share their memory copy-on-write. Children that exit are restarted with exponential backoff.
+    SIGTERM and SIGINT drain the children: they stop fetching, finish their running tasks and are killed if
+    they take longer than drain_timeout_seconds. ExternalTaskWorker children finish their current long poll first,
+    so drain_timeout_seconds should exceed their asyncResponseTimeout; the default covers the default one.
+
+    Needs os.fork, i.e. a POSIX platform.
+    """
+
+    def __init__(self, create_worker, run_worker, processes=None, worker_id_prefix="worker", preload_modules=(),
+                 restart_backoff_seconds=1, max_restart_backoff_seconds=60,
+                 drain_timeout_seconds=DEFAULT_DRAIN_TIMEOUT_SECONDS):
+        self.create_worker = create_worker
+        self.run_worker = run_worker
+        self.processes = processes or os.cpu_count() or 1
+        self.worker_id_prefix = worker_id_prefix
+        self.preload_modules = preload_modules
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self.max_restart_backoff_seconds = max_restart_backoff_seconds
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self.restarts = 0
+        self.children = []
+        self._stopping = False
+        self._wakeup_reader = self._wakeup_writer = None
+
+    def get_worker_id(self, index):
+        return f"{self.worker_id_prefix}-{index}"
+
+    def run(self):
+        """
+        Starts the children and supervises them until stop() is called or SIGTERM/SIGINT is received,
+        then drains them.
+        """
+        context = multiprocessing.get_context("fork")
+        self._wakeup_reader, self._wakeup_writer = os.pipe()
+        os.set_blocking(self._wakeup_writer, False)
+        for module in self.preload_modules:
+            importlib.import_module(module)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._handle_signal)
+            signal.signal(signal.SIGINT, self._handle_signal)
+
+        self.children = [_Child(index, self.get_worker_id(index)) for index in range(self.processes)]
+        self._log("Starting %s worker processes", self.processes)
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                for child in self.children:
+                    if child.process is not None and not child.process.is_alive():
+                        self._schedule_restart(child, now)
+                    if child.process is None and child.restart_at <= now and not self._stopping:
+                        self._start(context, child, now)
+                self._wait(now)
+        finally:
+            self._drain()
+            wakeup_reader, wakeup_writer = self._wakeup_reader, self._wakeup_writer
+            self._wakeup_reader = self._wakeup_writer = None
+            os.close(wakeup_reader)
+            os.close(wakeup_writer)
+
+    def stop(self):
+        """
+        Makes run() drain the children and return. Safe to call from signal handlers and other threads.
+        """
+        self._stopping = True
+        wakeup_writer = self._wakeup_writer
+        if wakeup_writer is not None:
+            try:
+                os.write(wakeup_writer, b"x")
+            except OSError:  # pipe full or already closed, run() wakes up anyway
+                pass
+
+    def _handle_signal(self, signum, frame):
+        self.stop()
+
+    def _start(self, context, child, now):
+        child.process = context.Process(target=self._run_child, args=(child.worker_id,),
+                                        name=f"camunda-{child.worker_id}")
+        child.process.start()
+        child.started_at = now
+        self._log("Started worker process with pid %s", child.process.pid, worker_id=child.worker_id)
+
+    def _schedule_restart(self, child, now):
+        exitcode = child.process.exitcode
+        child.process.close()
+        child.process = None
+        if now - child.started_at >= self.max_restart_backoff_seconds:
+            child.failures = 0  # ran long enough, start the backoff over
+        backoff_seconds = min(self.restart_backoff_seconds * 2 ** child.failures, self.max_restart_backoff_seconds)
+        child.failures += 1
+        child.restart_at = now + backoff_seconds
+        self.restarts += 1
+        self._log("Worker process exited with exit code %s, restarting in %s seconds", exitcode, backoff_seconds,
+                  worker_id=child.worker_id, log_level="warning")
+
+    def _wait(self, now):
+        processes = [child.process for child in self.children if child.process is not None]
+        restart_times = [child.restart_at for child in self.children if child.process is None]
+        timeout = max(0.0, min(restart_times) - now) if restart_times else None
+        ready = multiprocessing.connection.wait([self._wakeup_reader] + [p.sentinel for p in processes], timeout)
+        if self._wakeup_reader in ready:
+            os.read(self._wakeup_reader, 1024)
+
+    def _drain(self):
+        processes = [child.process for child in self.children if child.process is not None]
+        self._log("Draining %s worker processes", len(processes))
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.drain_timeout_seconds
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                self._log("Worker process %s did not drain in %s seconds, killing it", process.pid,
+                          self.drain_timeout_seconds, log_level="warning")
+                process.kill()
+                process.join()
+        for child in self.children:
+            child.process = None
+
+    def _run_child(self, worker_id):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the whole process group, the supervisor drains
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        worker = self.create_worker(worker_id)
+        if isinstance(worker, AsyncExternalTaskWorker):
+            asyncio.run(self._run_async_worker(worker))
+        else:
+            signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+            self.run_worker(worker)
+
+    async def _run_async_worker(self, worker):
+        drains = []
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, lambda: drains.append(asyncio.ensure_future(worker.drain(self.drain_timeout_seconds)))
+        )
+        await self.run_worker(worker)
+        if drains:
+            await drains[0]
+
+    def _log(self, msg, *args, worker_id=None, log_level='info'):
+        context = {"SUPERVISOR_PID": os.getpid(), "WORKER_ID": worker_id}
+        log_with_context(msg, context=context, log_level=log_level, args=args)
+
+
+class _Child:
+    def __init__(self, index, worker_id):
+        self.index = index
+        self.worker_id = worker_id
+        self.process = None
+        self.started_at = 0
+        self.restart_at = 0
+        self.failures = 0
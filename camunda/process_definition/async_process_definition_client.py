@@ -0,0 +1,80 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from camunda.client.async_engine_client import AsyncEngineClient
+from camunda.client.engine_client import ENGINE_LOCAL_BASE_URL
+from camunda.process_definition.process_definition_client import ProcessDefinitionClient
+from camunda.utils.response_utils import raise_exception_if_not_ok
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncProcessDefinitionClient(AsyncEngineClient, ProcessDefinitionClient):
+    """
+    asyncio counterpart of ProcessDefinitionClient, including its process definition cache.
+    """
+
+    def __init__(self, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(engine_base_url, config=config, http_client=http_client)
+
+    async def get_process_definitions(
+        self,
+        process_key,
+        version_tag,
+        tenant_ids,
+        sort_by="version",
+        sort_order="desc",
+        offset=0,
+        limit=1,
+    ):
+        url = self.get_process_definitions_url()
+        url_params = self.get_process_definitions_url_params(
+            process_key, version_tag, tenant_ids, sort_by, sort_order, offset, limit
+        )
+        response = await self._request("GET", url, params=url_params)
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def start_process_by_version(
+        self, process_key, version_tag, variables, tenant_id=None, business_key=None
+    ):
+        cache_key = (process_key, version_tag, tenant_id)
+        process_definition_id = self.process_definition_cache.get(cache_key)
+        from_cache = process_definition_id is not None
+        if not from_cache:
+            process_definition_id = await self._get_latest_process_definition_id(process_key, version_tag, tenant_id)
+
+        response = await self._start_process_by_definition_id(process_definition_id, variables, business_key)
+        if from_cache and self.config["processDefinitionCacheRefreshOnMiss"] \
+                and self._is_process_definition_not_found(response):
+            logger.info(
+                f"cached process_definition_id: {process_definition_id} not found for process_key: {process_key}, "
+                f"version_tag: {version_tag} and tenant_id: {tenant_id}, refreshing process definition"
+            )
+            self.process_definition_cache.invalidate(cache_key)
+            process_definition_id = await self._get_latest_process_definition_id(process_key, version_tag, tenant_id)
+            response = await self._start_process_by_definition_id(process_definition_id, variables, business_key)
+
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    async def _get_latest_process_definition_id(self, process_key, version_tag, tenant_id):
+        tenant_ids = [tenant_id] if tenant_id else []
+        process_definitions = await self.get_process_definitions(
+            process_key,
+            version_tag,
+            tenant_ids,
+            sort_by="version",
+            sort_order="desc",
+            offset=0,
+            limit=1,
+        )
+        return self._cache_latest_process_definition_id(process_definitions, process_key, version_tag, tenant_id)
+
+    async def _start_process_by_definition_id(self, process_definition_id, variables, business_key):
+        url = self.get_start_process_url(process_definition_id)
+        body = self._get_start_process_body(variables, business_key)
+        return await self._request("POST", url, json=body)
@@ -1,18 +1,26 @@
 import logging
-
-import requests
+from http import HTTPStatus
 
 from camunda.client.engine_client import EngineClient, ENGINE_LOCAL_BASE_URL
 from camunda.utils.response_utils import raise_exception_if_not_ok
+from camunda.utils.ttl_cache import TTLCache
 from camunda.utils.utils import join
-from camunda.variables.variables import Variables
 
 logger = logging.getLogger(__name__)
 
 
 class ProcessDefinitionClient(EngineClient):
+    default_config = {
+        "processDefinitionCacheTtlSeconds": 0,  # caches definition lookups of start_process_by_version, 0 disables
+        "processDefinitionCacheMaxSize": 1000,
+        "processDefinitionCacheRefreshOnMiss": True,  # re-query once if a cached definition no longer exists
+    }
+
     def __init__(self, engine_base_url=ENGINE_LOCAL_BASE_URL, config=None):
         super().__init__(engine_base_url, config=config)
+        self.config = {**type(self).default_config, **self.config}
+        self.process_definition_cache = TTLCache(self.config["processDefinitionCacheTtlSeconds"],
+                                                 max_size=self.config["processDefinitionCacheMaxSize"])
 
     def get_process_definitions(
         self,
@@ -28,7 +36,7 @@ class ProcessDefinitionClient(EngineClient):
         url_params = self.get_process_definitions_url_params(
             process_key, version_tag, tenant_ids, sort_by, sort_order, offset, limit
         )
-        response = requests.get(url, headers=self._get_headers(), params=url_params)
+        response = self._request("get", url, headers=self._get_headers(), params=url_params)
         raise_exception_if_not_ok(response)
         return response.json()
 
@@ -68,7 +76,8 @@ class ProcessDefinitionClient(EngineClient):
     ):
         """
         Start a process instance with the process_key and specified version tag and variables passed.
-        If multiple versions with same version tag found, it triggers the latest one
+        If multiple versions with same version tag found, it triggers the latest one.
+        The resolved process definition id is cached for processDefinitionCacheTtlSeconds when configured.
         :param process_key: Mandatory
         :param version_tag:
         :param variables: Mandatory - can be empty dict
@@ -76,6 +85,27 @@ class ProcessDefinitionClient(EngineClient):
         :param business_key: Optional
         :return: response json
         """
+        cache_key = (process_key, version_tag, tenant_id)
+        process_definition_id = self.process_definition_cache.get(cache_key)
+        from_cache = process_definition_id is not None
+        if not from_cache:
+            process_definition_id = self._get_latest_process_definition_id(process_key, version_tag, tenant_id)
+
+        response = self._start_process_by_definition_id(process_definition_id, variables, business_key)
+        if from_cache and self.config["processDefinitionCacheRefreshOnMiss"] \
+                and self._is_process_definition_not_found(response):
+            logger.info(
+                f"cached process_definition_id: {process_definition_id} not found for process_key: {process_key}, "
+                f"version_tag: {version_tag} and tenant_id: {tenant_id}, refreshing process definition"
+            )
+            self.process_definition_cache.invalidate(cache_key)
+            process_definition_id = self._get_latest_process_definition_id(process_key, version_tag, tenant_id)
+            response = self._start_process_by_definition_id(process_definition_id, variables, business_key)
+
+        raise_exception_if_not_ok(response)
+        return response.json()
+
+    def _get_latest_process_definition_id(self, process_key, version_tag, tenant_id):
         tenant_ids = [tenant_id] if tenant_id else []
         process_definitions = self.get_process_definitions(
             process_key,
@@ -86,7 +116,9 @@ class ProcessDefinitionClient(EngineClient):
             offset=0,
             limit=1,
         )
+        return self._cache_latest_process_definition_id(process_definitions, process_key, version_tag, tenant_id)
 
+    def _cache_latest_process_definition_id(self, process_definitions, process_key, version_tag, tenant_id):
         if len(process_definitions) == 0:
             raise Exception(
                 f"cannot start process because no process definitions found "
@@ -108,14 +140,43 @@ class ProcessDefinitionClient(EngineClient):
                 f"using process_definition_id: {process_definition_id} with version: {version}"
             )
 
+        self.process_definition_cache.set((process_key, version_tag, tenant_id), process_definition_id)
+        return process_definition_id
+
+    def _start_process_by_definition_id(self, process_definition_id, variables, business_key):
         url = self.get_start_process_url(process_definition_id)
-        body = {"variables": Variables.format(variables)}
-        if business_key:
-            body["businessKey"] = business_key
+        body = self._get_start_process_body(variables, business_key)
+        return self._request("post", url, headers=self._get_headers(), json=body)
+
+    @staticmethod
+    def _is_process_definition_not_found(response):
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            return True
+        if response.status_code < 400:
+            return False
+        try:
+            message = response.json().get("message", "")
+        except (ValueError, AttributeError):  # not JSON or not an object, e.g. an error page of a proxy
+            return False
+        return isinstance(message, str) and "no deployed process definition found" in message.lower()
+
+    def invalidate_process_definition_cache(self, process_key=None, version_tag=None, tenant_id=None):
+        """
+        Removes cached process definition lookups of start_process_by_version.
+        Without arguments the whole cache is cleared, otherwise only entries matching all given arguments.
+        Call this after deploying a new process definition version to pick it up before the TTL expires.
+        """
+        if process_key is None and version_tag is None and tenant_id is None:
+            self.process_definition_cache.clear()
+            return
 
-        response = requests.post(url, headers=self._get_headers(), json=body)
-        raise_exception_if_not_ok(response)
-        return response.json()
+        def matches(cache_key):
+            key, tag, tenant = cache_key
+            return ((process_key is None or key == process_key)
+                    and (version_tag is None or tag == version_tag)
+                    and (tenant_id is None or tenant == tenant_id))
+
+        self.process_definition_cache.invalidate_matching(matches)
 
     def get_start_process_url(self, process_definition_id):
         return (
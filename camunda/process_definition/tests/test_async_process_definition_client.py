@@ -0,0 +1,56 @@
+import unittest
+from http import HTTPStatus
+
+import httpx
+
+from camunda.process_definition.async_process_definition_client import AsyncProcessDefinitionClient
+
+
+class AsyncProcessDefinitionClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.requests = []
+        self.http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle_request))
+
+    async def asyncTearDown(self):
+        await self.http_client.aclose()
+
+    def handle_request(self, request):
+        self.requests.append(request)
+        if request.url.path == "/engine-rest/process-definition":
+            return httpx.Response(HTTPStatus.OK, json=[{"id": "process_definition_id", "version": 1}])
+        if request.url.path == "/engine-rest/process-definition/process_definition_id/start":
+            return httpx.Response(HTTPStatus.OK, json={"id": "process_instance_id"})
+        return httpx.Response(HTTPStatus.NOT_FOUND, json={"type": "RestException", "message": "not found"})
+
+    async def test_start_process_by_version_uses_cached_process_definition_id(self):
+        client = AsyncProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60},
+                                              http_client=self.http_client)
+
+        await client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+        resp = await client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        self.assertDictEqual({"id": "process_instance_id"}, resp)
+        self.assertEqual(["GET", "POST", "POST"], [r.method for r in self.requests])
+        self.assertEqual("3.8.3%", self.requests[0].url.params["versionTagLike"])
+
+    async def test_start_process_by_version_refreshes_cached_process_definition_id_if_not_found(self):
+        client = AsyncProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60},
+                                              http_client=self.http_client)
+        client.process_definition_cache.set(("ORIGINATION", "3.8.3", "tenant1"), "deleted_definition_id")
+
+        resp = await client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        self.assertDictEqual({"id": "process_instance_id"}, resp)
+        self.assertEqual(3, len(self.requests))
+
+    async def test_start_process_by_version_raises_exception_if_no_process_definitions_found(self):
+        client = AsyncProcessDefinitionClient(http_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(HTTPStatus.OK, json=[]))))
+
+        with self.assertRaises(Exception) as context:
+            await client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        self.assertEqual("cannot start process because no process definitions found "
+                         "for process_key: ORIGINATION, version_tag: 3.8.3 and tenant_id: tenant1",
+                         str(context.exception))
@@ -1,6 +1,7 @@
 from http import HTTPStatus
 from unittest import TestCase
 
+import requests
 import responses
 
 from camunda.process_definition.process_definition_client import ProcessDefinitionClient
@@ -179,3 +180,93 @@ class ProcessDefinitionClientTest(TestCase):
         resp_json = self.process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
 
         self.assertDictEqual(start_process_resp, resp_json)
+
+    @responses.activate
+    def test_start_process_by_version_uses_cached_process_definition_id(self):
+        process_client = ProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60})
+        responses.add(responses.GET, process_client.get_process_definitions_url(),
+                      status=HTTPStatus.OK, json=[{"id": "process_definition_id", "version": 1}])
+        responses.add(responses.POST, process_client.get_start_process_url('process_definition_id'),
+                      status=HTTPStatus.OK, json={"id": "process_instance_id"})
+
+        process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+        process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        lookups = [c for c in responses.calls if c.request.method == responses.GET]
+        self.assertEqual(1, len(lookups))
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_start_process_by_version_without_cache_ttl_looks_up_process_definition_every_time(self):
+        responses.add(responses.GET, self.process_client.get_process_definitions_url(),
+                      status=HTTPStatus.OK, json=[{"id": "process_definition_id", "version": 1}])
+        responses.add(responses.POST, self.process_client.get_start_process_url('process_definition_id'),
+                      status=HTTPStatus.OK, json={"id": "process_instance_id"})
+
+        self.process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+        self.process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        self.assertEqual(4, len(responses.calls))
+
+    @responses.activate
+    def test_start_process_by_version_refreshes_cached_process_definition_id_if_not_found(self):
+        process_client = ProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60})
+        process_client.process_definition_cache.set(("ORIGINATION", "3.8.3", "tenant1"), "deleted_definition_id")
+        responses.add(responses.POST, process_client.get_start_process_url('deleted_definition_id'),
+                      status=HTTPStatus.NOT_FOUND, json={"type": "RestException", "message": "not found"})
+        responses.add(responses.GET, process_client.get_process_definitions_url(),
+                      status=HTTPStatus.OK, json=[{"id": "process_definition_id", "version": 2}])
+        responses.add(responses.POST, process_client.get_start_process_url('process_definition_id'),
+                      status=HTTPStatus.OK, json={"id": "process_instance_id"})
+
+        resp_json = process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        self.assertDictEqual({"id": "process_instance_id"}, resp_json)
+        self.assertEqual("process_definition_id",
+                         process_client.process_definition_cache.get(("ORIGINATION", "3.8.3", "tenant1")))
+
+    @responses.activate
+    def test_start_process_by_version_raises_exception_if_cached_definition_not_found_and_refresh_disabled(self):
+        process_client = ProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60,
+                                                         "processDefinitionCacheRefreshOnMiss": False})
+        process_client.process_definition_cache.set(("ORIGINATION", "3.8.3", "tenant1"), "deleted_definition_id")
+        responses.add(responses.POST, process_client.get_start_process_url('deleted_definition_id'),
+                      status=HTTPStatus.NOT_FOUND, json={"type": "RestException", "message": "not found"})
+
+        with self.assertRaises(Exception) as context:
+            process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+        self.assertEqual("received 404 : RestException : not found", str(context.exception))
+
+    @responses.activate
+    def test_start_process_by_version_raises_http_error_for_bodies_that_are_not_json(self):
+        process_client = ProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60})
+        process_client.process_definition_cache.set(("ORIGINATION", "3.8.3", "tenant1"), "cached_definition_id")
+        responses.add(responses.POST, process_client.get_start_process_url('cached_definition_id'),
+                      status=HTTPStatus.BAD_GATEWAY, body="<html>Bad Gateway</html>")
+
+        with self.assertRaises(requests.HTTPError):
+            process_client.start_process_by_version("ORIGINATION", "3.8.3", {}, "tenant1")
+
+    def test_unexpected_error_bodies_are_no_missing_process_definition(self):
+        for body in [b"<html>Bad Gateway</html>", b"[]", b'{"message": 42}']:
+            with self.subTest(body=body):
+                response = requests.Response()
+                response.status_code = HTTPStatus.INTERNAL_SERVER_ERROR
+                response._content = body
+
+                self.assertFalse(ProcessDefinitionClient._is_process_definition_not_found(response))
+
+    def test_invalidate_process_definition_cache_removes_matching_entries(self):
+        process_client = ProcessDefinitionClient(config={"processDefinitionCacheTtlSeconds": 60})
+        cache = process_client.process_definition_cache
+        cache.set(("ORIGINATION", "3.8.3", "tenant1"), "id1")
+        cache.set(("ORIGINATION", "3.8.3", "tenant2"), "id2")
+        cache.set(("SERVICING", "1.0.0", "tenant1"), "id3")
+
+        process_client.invalidate_process_definition_cache(process_key="ORIGINATION", tenant_id="tenant1")
+        self.assertIsNone(cache.get(("ORIGINATION", "3.8.3", "tenant1")))
+        self.assertEqual("id2", cache.get(("ORIGINATION", "3.8.3", "tenant2")))
+
+        process_client.invalidate_process_definition_cache()
+        self.assertEqual(0, len(cache))
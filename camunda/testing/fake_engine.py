@@ -0,0 +1,408 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+ENGINE_REST_PATH = "/engine-rest"
+CAMUNDA_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+class FakeTask:
+    def __init__(self, topic_name, variables=None, priority=0, business_key=None, process_instance_id=None,
+                 tenant_id=None, retries=None, activity_id=None, process_definition_key=None):
+        self.id = str(uuid.uuid4())
+        self.topic_name = topic_name
+        self.variables = variables or {}
+        self.priority = priority
+        self.business_key = business_key
+        self.process_instance_id = process_instance_id or str(uuid.uuid4())
+        self.tenant_id = tenant_id
+        self.retries = retries
+        self.activity_id = activity_id or topic_name
+        self.process_definition_key = process_definition_key or "FAKE_PROCESS"
+        self.create_time = datetime.now(timezone.utc)
+        self.created_at = time.monotonic()
+        self.reported_at = None  # time.monotonic() of the complete or bpmnError report, or of the incident
+        self.state = "available"  # available, completed, bpmn_error or incident
+        self.worker_id = None
+        self.lock_expires_at = None  # time.monotonic() based
+        self.due_at = 0  # time.monotonic() based, set by failures with a retry timeout
+        self.error_message = None
+        self.error_details = None
+        self.fetch_count = 0
+
+    def is_locked(self, now):
+        return self.lock_expires_at is not None and self.lock_expires_at > now
+
+    def is_fetchable(self, now):
+        return self.state == "available" and not self.is_locked(now) and self.due_at <= now
+
+    def matches(self, topic):
+        """
+        :return: whether the task passes the filters of a fetchAndLock topic
+        """
+        if topic.get("tenantIdIn") and self.tenant_id not in topic["tenantIdIn"]:
+            return False
+        if topic.get("withoutTenantId") and self.tenant_id is not None:
+            return False
+        if topic.get("processDefinitionKey") and self.process_definition_key != topic["processDefinitionKey"]:
+            return False
+        if topic.get("processDefinitionKeyIn") and self.process_definition_key not in topic["processDefinitionKeyIn"]:
+            return False
+        if topic.get("businessKey") and self.business_key != topic["businessKey"]:
+            return False
+        return all(self.variables.get(name) == value for name, value in (topic.get("processVariables") or {}).items())
+
+    def to_json(self, now, requested_variables=None):
+        lock_expiration_time = None
+        if self.lock_expires_at is not None:
+            lock_expiration_time = _format_date(datetime.now(timezone.utc)
+                                                + timedelta(seconds=self.lock_expires_at - now))
+        variables = {name: _format_variable(value) for name, value in self.variables.items()
+                     if requested_variables is None or name in requested_variables}
+        return {
+            "activityId": self.activity_id,
+            "activityInstanceId": f"{self.activity_id}:{self.id}",
+            "errorMessage": self.error_message,
+            "errorDetails": self.error_details,
+            "executionId": self.id,
+            "id": self.id,
+            "lockExpirationTime": lock_expiration_time,
+            "createTime": _format_date(self.create_time),
+            "processDefinitionId": f"{self.process_definition_key}:1:{self.process_definition_key}",
+            "processDefinitionKey": self.process_definition_key,
+            "processInstanceId": self.process_instance_id,
+            "tenantId": self.tenant_id,
+            "retries": self.retries,
+            "workerId": self.worker_id,
+            "priority": self.priority,
+            "topicName": self.topic_name,
+            "businessKey": self.business_key,
+            "variables": variables,
+            "extensionProperties": {},
+        }
+
+
+class FakeEngine:
+    """
+    In-process stand-in for the external task REST API of the Camunda engine, served over HTTP on localhost,
+    so ExternalTaskClient, AsyncExternalTaskClient and the workers can run without a real engine:
+
+        with FakeEngine() as engine:
+            engine.add_tasks("topicName", 100, variables={"amount": 10})
+            worker = ExternalTaskWorker(worker_id="1", base_url=engine.base_url)
+
+    It implements fetchAndLock with long polling, usePriority, the tenant, process definition key, business key and
+    process variable filters of topics, lock expiry, complete, failure (retries and
+    retry timeout, incidents once retries are 0), bpmnError, extendLock and unlock.
+    latency_seconds delays every response and error_rate answers that fraction of requests with an HTTP 500.
+    """
+
+    def __init__(self, latency_seconds=0, error_rate=0.0, seed=None, host="127.0.0.1", port=0):
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.tasks = {}
+        self.stats = {
+            "fetch_and_lock": 0,
+            "fetched": 0,
+            "completed": 0,
+            "failures": 0,
+            "bpmn_errors": 0,
+            "incidents": 0,
+            "lock_expired": 0,  # tasks fetched again after the lock of a previous fetch expired unreported
+            "rejected_reports": 0,  # reports of tasks not (or no longer) locked by the reporting worker
+            "injected_errors": 0,
+        }
+        self._random = random.Random(seed)
+        self._fail_next = 0
+        self._condition = threading.Condition()
+        self._server = None
+        self._stopping = False
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}{ENGINE_REST_PATH}"
+
+    def start(self):
+        self._stopping = False
+        self._server = ThreadingHTTPServer((self.host, self.port), self._create_request_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def add_task(self, topic_name, variables=None, **kwargs):
+        """
+        Adds an external task, kwargs: priority, business_key, process_instance_id, tenant_id, retries,
+        activity_id, process_definition_key.
+        :return: the FakeTask
+        """
+        task = FakeTask(topic_name, variables, **kwargs)
+        with self._condition:
+            self.tasks[task.id] = task
+            self._condition.notify_all()
+        return task
+
+    def add_tasks(self, topic_name, count, variables=None, **kwargs):
+        return [self.add_task(topic_name, dict(variables or {}), **kwargs) for _ in range(count)]
+
+    def fail_next(self, count=1):
+        """
+        Answers the next count requests with an HTTP 500.
+        """
+        with self._condition:
+            self._fail_next += count
+
+    def count_tasks(self, state=None, topic_name=None):
+        with self._condition:
+            return sum(1 for task in self.tasks.values()
+                       if (state is None or task.state == state) and (topic_name is None or task.topic_name == topic_name))
+
+    def wait_until(self, predicate, timeout_seconds=10):
+        """
+        Blocks until predicate(engine) is true, e.g. engine.wait_until(lambda e: e.count_tasks("available") == 0)
+        :return: whether the predicate became true within timeout_seconds
+        """
+        deadline = time.monotonic() + timeout_seconds
+        while not predicate(self):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def fetch_and_lock(self, body):
+        worker_id = body["workerId"]
+        max_tasks = body.get("maxTasks", 1)
+        use_priority = body.get("usePriority", False)
+        topics = {topic["topicName"]: topic for topic in body.get("topics", [])}
+        timeout_seconds = (body.get("asyncResponseTimeout") or 0) / 1000
+        deadline = time.monotonic() + timeout_seconds
+
+        with self._condition:
+            self.stats["fetch_and_lock"] += 1
+            while True:
+                now = time.monotonic()
+                candidates = [task for task in self.tasks.values()
+                              if task.topic_name in topics and task.is_fetchable(now)
+                              and task.matches(topics[task.topic_name])]
+                if candidates or now >= deadline or self._stopping:
+                    break
+                self._condition.wait(self._get_wait_seconds(deadline, now))
+
+            if use_priority:
+                candidates.sort(key=lambda t: -t.priority)
+            locked = []
+            for task in candidates[:max_tasks]:
+                topic = topics[task.topic_name]
+                if task.lock_expires_at is not None:
+                    self.stats["lock_expired"] += 1
+                task.worker_id = worker_id
+                task.lock_expires_at = now + topic.get("lockDuration", 300000) / 1000
+                task.fetch_count += 1
+                locked.append(task.to_json(now, topic.get("variables")))
+            self.stats["fetched"] += len(locked)
+            return HTTPStatus.OK, locked
+
+    def _get_wait_seconds(self, deadline, now):
+        # wake up when the next lock expires or retry timeout passes, tasks may have become fetchable
+        wake_ups = [deadline]
+        for task in self.tasks.values():
+            if task.state != "available":
+                continue
+            if task.lock_expires_at is not None and task.lock_expires_at > now:
+                wake_ups.append(task.lock_expires_at)
+            if task.due_at > now:
+                wake_ups.append(task.due_at)
+        return max(min(wake_ups) - now, 0.001)
+
+    def complete(self, task_id, body):
+        def complete_task(task):
+            task.state = "completed"
+            task.variables.update({k: v.get("value") for k, v in (body.get("variables") or {}).items()})
+            self.stats["completed"] += 1
+        return self._report(task_id, body, complete_task)
+
+    def failure(self, task_id, body):
+        def fail_task(task, now):
+            task.retries = body.get("retries")
+            task.error_message = body.get("errorMessage")
+            task.error_details = body.get("errorDetails")
+            task.lock_expires_at = None
+            task.worker_id = None
+            self.stats["failures"] += 1
+            if task.retries is not None and task.retries <= 0:
+                task.state = "incident"
+                self.stats["incidents"] += 1
+            else:
+                task.due_at = now + (body.get("retryTimeout") or 0) / 1000
+        return self._report(task_id, body, fail_task, pass_now=True)
+
+    def bpmn_error(self, task_id, body):
+        def bpmn_error_task(task):
+            task.state = "bpmn_error"
+            task.error_message = body.get("errorMessage")
+            self.stats["bpmn_errors"] += 1
+        return self._report(task_id, body, bpmn_error_task)
+
+    def extend_lock(self, task_id, body):
+        def extend_lock_task(task, now):
+            task.lock_expires_at = now + body["newDuration"] / 1000
+        return self._report(task_id, body, extend_lock_task, pass_now=True)
+
+    def unlock(self, task_id):
+        with self._condition:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return self._not_found(task_id)
+            task.lock_expires_at = None
+            task.worker_id = None
+            self._condition.notify_all()
+            return HTTPStatus.NO_CONTENT, None
+
+    def _report(self, task_id, body, update, pass_now=False):
+        with self._condition:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return self._not_found(task_id)
+            now = time.monotonic()
+            if task.state != "available" or task.worker_id != body.get("workerId") or not task.is_locked(now):
+                self.stats["rejected_reports"] += 1
+                return HTTPStatus.BAD_REQUEST, {
+                    "type": "BadUserRequestException",
+                    "message": f"External Task {task_id} cannot be reported by worker '{body.get('workerId')}'. "
+                               f"It is locked by worker '{task.worker_id}'.",
+                }
+            if pass_now:
+                update(task, now)
+            else:
+                update(task)
+            if task.state != "available":
+                task.lock_expires_at = None
+                task.reported_at = now
+            self._condition.notify_all()
+            return HTTPStatus.NO_CONTENT, None
+
+    @staticmethod
+    def _not_found(task_id):
+        return HTTPStatus.NOT_FOUND, {"type": "RestException",
+                                      "message": f"External task with id {task_id} does not exist"}
+
+    def _should_inject_error(self):
+        with self._condition:
+            if self._fail_next > 0:
+                self._fail_next -= 1
+                inject = True
+            else:
+                inject = self.error_rate > 0 and self._random.random() < self.error_rate
+            if inject:
+                self.stats["injected_errors"] += 1
+            return inject
+
+    def handle(self, method, path, body):
+        """
+        Dispatches one REST call, returns (HTTPStatus, json or None)
+        """
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self._should_inject_error():
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"type": "ProcessEngineException", "message": "injected error"}
+
+        if not path.startswith(ENGINE_REST_PATH):
+            return HTTPStatus.NOT_FOUND, {"type": "RestException", "message": f"unknown path {path}"}
+        path = path[len(ENGINE_REST_PATH):]
+
+        if method == "POST" and path == "/external-task/fetchAndLock":
+            return self.fetch_and_lock(body)
+        match = re.fullmatch(r"/external-task/([^/]+)/(complete|failure|bpmnError|extendLock|unlock)", path)
+        if method == "POST" and match:
+            task_id, action = match.groups()
+            if action == "complete":
+                return self.complete(task_id, body)
+            if action == "failure":
+                return self.failure(task_id, body)
+            if action == "bpmnError":
+                return self.bpmn_error(task_id, body)
+            if action == "extendLock":
+                return self.extend_lock(task_id, body)
+            return self.unlock(task_id)
+        return HTTPStatus.NOT_FOUND, {"type": "RestException", "message": f"unknown path {path}"}
+
+    def _create_request_handler(self):
+        engine = self
+
+        class FakeEngineRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real engine
+            disable_nagle_algorithm = True  # headers and body are written separately
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                status, resp_json = engine.handle("POST", self.path.split("?")[0], body)
+                self._send(status, resp_json)
+
+            def _send(self, status, resp_json):
+                content = json.dumps(resp_json).encode("utf-8") if resp_json is not None else b""
+                self.send_response(status)
+                if resp_json is not None:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                try:
+                    self.end_headers()
+                    self.wfile.write(content)
+                except ConnectionError:
+                    # the worker gave up on the request, e.g. a long poll cancelled by stop()
+                    logger.debug("client disconnected before the response to %s was sent", self.path)
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return FakeEngineRequestHandler
+
+
+def _format_date(value):
+    return value.strftime(CAMUNDA_DATE_FORMAT)[:-3] + value.strftime("%z")
+
+
+def _format_variable(value):
+    if isinstance(value, dict) and "value" in value:
+        return value
+    if isinstance(value, bool):
+        value_type = "Boolean"
+    elif isinstance(value, int):
+        value_type = "Integer" if -2 ** 31 <= value < 2 ** 31 else "Long"
+    elif isinstance(value, float):
+        value_type = "Double"
+    elif value is None:
+        value_type = "Null"
+    elif isinstance(value, (dict, list)):
+        return {"value": json.dumps(value), "type": "Json", "valueInfo": {}}
+    else:
+        value_type = "String"
+    return {"value": value, "type": value_type, "valueInfo": {}}
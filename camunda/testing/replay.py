@@ -0,0 +1,86 @@
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict
+
+from camunda.external_task.async_external_task_executor import is_async_action
+from camunda.external_task.external_task import ExternalTask
+from camunda.utils.recording import get_outcome, read_recording
+
+
+class ReplayDriver:
+    """
+    Feeds the tasks recorded by a TaskRecorder through ExternalTask and handlers offline, as fast as possible, to
+    profile and benchmark handlers on production payload shapes without an engine:
+
+        stats = ReplayDriver("recording.ndjson").run({"topicA": handle_task}, repeat=10)
+
+    Handlers run one task at a time on the calling thread, coroutine handlers on an event loop. Their results are
+    only counted, nothing is reported. Tasks of topics without a handler are skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tasks = defaultdict(list)  # topic -> raw task json in recording order
+        self.recorded_handler_seconds = defaultdict(list)
+        for record in read_recording(path):
+            if record["type"] == "fetch":
+                for task in record["tasks"]:
+                    self.tasks[task["topicName"]].append(task)
+            elif record["type"] == "handler":
+                self.recorded_handler_seconds[record["topic"]].append(record["duration_seconds"])
+
+    def run(self, topic_handlers, repeat=1):
+        """
+        :return: per topic the replayed tasks, total parse and handler time, tasks/sec, handler p50/p99 and the
+            recorded handler p50/p99 for comparison, and the outcomes, e.g. {"complete": 990, "error": 10}
+        """
+        loop = None
+        if any(is_async_action(handler) for handler in topic_handlers.values()):
+            loop = asyncio.new_event_loop()
+        try:
+            return {topic: self._replay_topic(topic, handler, repeat, loop)
+                    for topic, handler in topic_handlers.items() if self.tasks.get(topic)}
+        finally:
+            if loop is not None:
+                loop.close()
+
+    def _replay_topic(self, topic, handler, repeat, loop):
+        parse_seconds = 0.0
+        handler_seconds = []
+        outcomes = Counter()
+        run_async = is_async_action(handler)
+        for _ in range(repeat):
+            for context in self.tasks[topic]:
+                start = time.perf_counter()
+                task = ExternalTask(context)
+                parsed = time.perf_counter()
+                try:
+                    task_result = loop.run_until_complete(handler(task)) if run_async else handler(task)
+                    outcomes[get_outcome(task_result)] += 1
+                except Exception:
+                    outcomes["error"] += 1
+                handler_seconds.append(time.perf_counter() - parsed)
+                parse_seconds += parsed - start
+
+        total_handler_seconds = sum(handler_seconds)
+        handler_seconds.sort()
+        recorded = sorted(self.recorded_handler_seconds.get(topic, []))
+        return {
+            "tasks": len(handler_seconds),
+            "parse_seconds": parse_seconds,
+            "handler_seconds": total_handler_seconds,
+            "tasks_per_second": len(handler_seconds) / ((parse_seconds + total_handler_seconds) or math.inf),
+            "handler_p50_seconds": _percentile(handler_seconds, 50),
+            "handler_p99_seconds": _percentile(handler_seconds, 99),
+            "recorded_handler_p50_seconds": _percentile(recorded, 50),
+            "recorded_handler_p99_seconds": _percentile(recorded, 99),
+            "outcomes": dict(outcomes),
+        }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # nearest rank
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
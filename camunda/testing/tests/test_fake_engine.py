@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+import requests
+
+from camunda.client.async_external_task_client import AsyncExternalTaskClient
+from camunda.client.external_task_client import ExternalTaskClient
+from camunda.external_task.async_external_task_worker import AsyncExternalTaskWorker
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.testing.fake_engine import FakeEngine
+
+
+class FakeEngineTest(TestCase):
+
+    def setUp(self):
+        self.engine = FakeEngine().start()
+        self.client = ExternalTaskClient("worker1", self.engine.base_url, {"maxTasks": 10, "asyncResponseTimeout": 0})
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def test_fetch_and_lock_returns_tasks_with_variables(self):
+        self.engine.add_task("topicA", {"amount": 10, "name": "order"}, business_key="bk1")
+        self.engine.add_task("topicB")
+
+        tasks = self.client.fetch_and_lock("topicA", variables=["amount"])
+
+        self.assertEqual(1, len(tasks))
+        self.assertEqual("topicA", tasks[0]["topicName"])
+        self.assertEqual("bk1", tasks[0]["businessKey"])
+        self.assertEqual({"amount": {"value": 10, "type": "Integer", "valueInfo": {}}}, tasks[0]["variables"])
+        self.assertEqual([], self.client.fetch_and_lock("topicA"))
+
+    def test_fetch_and_lock_with_priority_returns_most_important_tasks_first(self):
+        self.engine.add_task("topicA", priority=1)
+        self.engine.add_task("topicA", priority=10)
+        client = ExternalTaskClient("worker1", self.engine.base_url,
+                                    {"maxTasks": 1, "asyncResponseTimeout": 0, "usePriority": True})
+
+        self.assertEqual(10, client.fetch_and_lock("topicA")[0]["priority"])
+
+    def test_fetch_and_lock_long_polls_until_task_is_added(self):
+        client = ExternalTaskClient("worker1", self.engine.base_url, {"asyncResponseTimeout": 5000})
+        timer = threading.Timer(0.1, self.engine.add_task, args=("topicA",))
+        timer.start()
+
+        start = time.monotonic()
+        tasks = client.fetch_and_lock("topicA")
+
+        self.assertEqual(1, len(tasks))
+        self.assertLess(time.monotonic() - start, 4)
+
+    def test_expired_lock_makes_task_fetchable_again_and_rejects_late_complete(self):
+        self.engine.add_task("topicA")
+        client = ExternalTaskClient("worker1", self.engine.base_url, {"asyncResponseTimeout": 0, "lockDuration": 50})
+        other_client = ExternalTaskClient("worker2", self.engine.base_url, {"asyncResponseTimeout": 0})
+
+        task_id = client.fetch_and_lock("topicA")[0]["id"]
+        time.sleep(0.1)
+        self.assertEqual(task_id, other_client.fetch_and_lock("topicA")[0]["id"])
+
+        with self.assertRaises(Exception):
+            client.complete(task_id, {})
+        self.assertTrue(other_client.complete(task_id, {"result": 1}))
+        self.assertEqual(1, self.engine.stats["lock_expired"])
+        self.assertEqual(1, self.engine.stats["rejected_reports"])
+        self.assertEqual(1, self.engine.count_tasks("completed"))
+
+    def test_failure_with_retries_makes_task_fetchable_after_retry_timeout(self):
+        self.engine.add_task("topicA")
+        task_id = self.client.fetch_and_lock("topicA")[0]["id"]
+
+        self.client.failure(task_id, "error", "details", retries=2, retry_timeout=50)
+        self.assertEqual([], self.client.fetch_and_lock("topicA"))
+        time.sleep(0.1)
+        task = self.client.fetch_and_lock("topicA")[0]
+
+        self.assertEqual(2, task["retries"])
+        self.client.failure(task_id, "error", "details", retries=0, retry_timeout=0)
+        self.assertEqual(1, self.engine.count_tasks("incident"))
+
+    def test_bpmn_error_extend_lock_and_unlock(self):
+        self.engine.add_tasks("topicA", 2)
+        task_ids = [task["id"] for task in self.client.fetch_and_lock("topicA")]
+        base_url = f"{self.engine.base_url}/external-task"
+
+        response = requests.post(f"{base_url}/{task_ids[0]}/extendLock", json={"workerId": "worker1", "newDuration": 1})
+        self.assertEqual(204, response.status_code)
+        self.assertTrue(self.client.bpmn_failure(task_ids[1], "ERROR_CODE", "error"))
+        self.assertEqual(204, requests.post(f"{base_url}/{task_ids[0]}/unlock").status_code)
+
+        self.assertEqual([task_ids[0]], [task["id"] for task in self.client.fetch_and_lock("topicA")])
+        self.assertEqual(1, self.engine.count_tasks("bpmn_error"))
+
+    def test_injected_errors(self):
+        self.engine.fail_next(1)
+
+        with self.assertRaises(Exception) as context:
+            self.client.fetch_and_lock("topicA")
+
+        self.assertEqual("received 500 : ProcessEngineException : injected error", str(context.exception))
+        self.assertEqual([], self.client.fetch_and_lock("topicA"))
+
+    def test_unknown_task_returns_not_found(self):
+        with self.assertRaises(Exception) as context:
+            self.client.complete("unknown", {})
+
+        self.assertIn("received 404", str(context.exception))
+
+    def test_external_task_worker_completes_tasks(self):
+        self.engine.add_tasks("topicA", 3, {"amount": 10})
+        worker = ExternalTaskWorker("worker1", self.engine.base_url, {"maxTasks": 10, "asyncResponseTimeout": 0})
+
+        worker.fetch_and_execute("topicA", lambda task: task.complete({"doubled": task.get_variable("amount") * 2}))
+
+        self.assertEqual(3, self.engine.count_tasks("completed"))
+        self.assertEqual({20}, {task.variables["doubled"] for task in self.engine.tasks.values()})
+
+
+class FakeEngineAsyncTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = FakeEngine().start()
+
+    async def asyncTearDown(self):
+        self.engine.stop()
+
+    async def test_async_client_fetch_and_complete(self):
+        self.engine.add_task("topicA")
+        client = AsyncExternalTaskClient("worker1", self.engine.base_url, {"asyncResponseTimeout": 0})
+
+        tasks = await client.fetch_and_lock("topicA")
+
+        self.assertTrue(await client.complete(tasks[0]["id"], {}))
+        self.assertEqual(1, self.engine.count_tasks("completed"))
+
+    async def test_async_external_task_worker_completes_tasks(self):
+        self.engine.add_tasks("topicA", 5)
+        worker = AsyncExternalTaskWorker("worker1", self.engine.base_url,
+                                         {"asyncResponseTimeout": 100, "sleepSeconds": 0})
+
+        async def handle_task(task):
+            return task.complete()
+
+        subscription = asyncio.create_task(worker.subscribe({"topicA": handle_task}))
+        for _ in range(200):
+            if self.engine.count_tasks("completed") == 5:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        subscription.cancel()
+        await asyncio.gather(subscription, return_exceptions=True)
+
+        self.assertEqual(5, self.engine.count_tasks("completed"))
@@ -0,0 +1,67 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.testing.fake_engine import FakeEngine
+from camunda.testing.replay import ReplayDriver
+from camunda.utils.recording import TaskRecorder
+
+
+class ReplayDriverTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "recording.ndjson")
+
+    def record_worker_run(self, redact_variables=()):
+        engine = FakeEngine().start()
+        self.addCleanup(engine.stop)
+        for amount in (1, 2, 3):
+            engine.add_task("topicA", {"amount": amount, "iban": "DE00 1234"})
+        engine.add_task("topicB")
+        with TaskRecorder(self.path, redact_variables=redact_variables) as recorder:
+            worker = ExternalTaskWorker("worker1", engine.base_url, {"maxTasks": 10, "asyncResponseTimeout": 0},
+                                        recorder=recorder)
+            worker.fetch_and_execute("topicA", lambda task: task.complete({"doubled": task.get_variable("amount") * 2}))
+        return engine
+
+    def test_worker_records_fetches_and_handler_runs(self):
+        engine = self.record_worker_run(redact_variables=["iban"])
+
+        driver = ReplayDriver(self.path)
+
+        self.assertEqual(3, engine.count_tasks("completed"))
+        self.assertEqual([1, 2, 3], [task["variables"]["amount"]["value"] for task in driver.tasks["topicA"]])
+        self.assertEqual({"<redacted>"}, {task["variables"]["iban"]["value"] for task in driver.tasks["topicA"]})
+        self.assertEqual(3, len(driver.recorded_handler_seconds["topicA"]))
+
+    def test_run_replays_recorded_tasks_through_handlers(self):
+        self.record_worker_run()
+        amounts = []
+
+        def handle_task(task):
+            amounts.append(task.get_variable("amount"))
+            if task.get_variable("amount") == 3:
+                raise ValueError("bad amount")
+            return task.complete()
+
+        stats = ReplayDriver(self.path).run({"topicA": handle_task, "topicB": handle_task}, repeat=2)
+
+        self.assertEqual(["topicA"], list(stats))
+        self.assertEqual([1, 2, 3, 1, 2, 3], amounts)
+        self.assertEqual(6, stats["topicA"]["tasks"])
+        self.assertEqual({"complete": 4, "error": 2}, stats["topicA"]["outcomes"])
+        self.assertLessEqual(stats["topicA"]["handler_p50_seconds"], stats["topicA"]["handler_p99_seconds"])
+        self.assertIsNotNone(stats["topicA"]["recorded_handler_p99_seconds"])
+
+    def test_run_awaits_coroutine_handlers(self):
+        self.record_worker_run()
+
+        async def handle_task(task):
+            return task.failure("error", "details", 3, 1000)
+
+        stats = ReplayDriver(self.path).run({"topicA": handle_task})
+
+        self.assertEqual({"failure": 3}, stats["topicA"]["outcomes"])
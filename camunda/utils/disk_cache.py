@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Key->value cache in a SQLite file with the interface of TTLCache, so entries survive restarts and are shared
+    by all processes using the same file, e.g. the children of a WorkerSupervisor. Keys are strings and values
+    must be JSON serializable.
+
+    Every entry expires ttl_seconds after it was stored. When max_size is set, the least recently used entries
+    are evicted once the cache is full. A ttl_seconds of 0 (or less) disables the cache. The connection is
+    opened lazily per process, so a DiskCache may be created before forking.
+    """
+
+    def __init__(self, path, ttl_seconds, max_size=None, clock=time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            connection = self._get_connection()
+            row = connection.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            value, expires_at = row
+            now = self._clock()
+            if expires_at <= now:
+                connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return default
+            connection.execute("UPDATE cache SET used_at = ? WHERE key = ?", (now, key))
+            return json.loads(value)
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            connection = self._get_connection()
+            now = self._clock()
+            connection.execute("INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value), now + self.ttl_seconds, now))
+            if self.max_size is not None:
+                connection.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at, rowid "
+                                   "LIMIT max(0, (SELECT count(*) FROM cache) - ?))", (self.max_size,))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._get_connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._get_connection().execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __len__(self):
+        with self._lock:
+            return self._get_connection().execute("SELECT count(*) FROM cache").fetchone()[0]
+
+    def _get_connection(self):
+        if self._connection is None or self._pid != os.getpid():
+            # autocommit, every statement is its own transaction
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                                     "expires_at REAL NOT NULL, used_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._connection
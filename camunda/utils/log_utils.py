@@ -1,18 +1,72 @@
+import json
 import logging
+from collections.abc import Mapping
 
+logger = logging.getLogger("camunda")
 
-def log_with_context(message, context=None, log_level='info', **kwargs):
-    context = context if context is not None else {}
-    log_function = __get_log_function(log_level)
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR
+}
 
-    log_context_prefix = __get_log_context_prefix(context)
-    if log_context_prefix:
-        log_function(f"{log_context_prefix} {message}", **kwargs)
-    else:
-        log_function(message, **kwargs)
+# LogRecord attribute holding the context dict, e.g. {"WORKER_ID": "1", "TOPIC": "topicName"}
+CONTEXT_ATTRIBUTE = "camunda_context"
 
 
-def __get_log_context_prefix(context):
+def log_with_context(message, context=None, log_level='info', args=(), **kwargs):
+    """
+    Logs message prefixed with the non-None context values as [KEY:value].
+    The log level is checked first: nothing is formatted for disabled levels. The %-style args and then the
+    prefix are only formatted once a handler emits the record.
+    The context is also attached as structured fields: record.camunda_context holds the whole dict and every
+    key is set as lower case record attribute, e.g. record.worker_id, for use in formatters and filters.
+    """
+    level = LOG_LEVELS.get(log_level, logging.INFO)
+    if not logger.isEnabledFor(level):
+        return
+
+    context = {k: v for k, v in context.items() if v is not None} if context else {}
+    extra = dict(kwargs.pop("extra", None) or {})
+    extra[CONTEXT_ATTRIBUTE] = context
+    for k, v in context.items():
+        extra.setdefault(k.lower(), v)
+    # the args are kept by the message, so that a % in a context value isn't taken for a placeholder
+    logger.log(level, ContextMessage(message, context, args), extra=extra, **kwargs)
+
+
+class ContextMessage:
+    """
+    Log message that applies its %-style args and renders its context prefix only when converted to a string.
+    """
+    __slots__ = ("message", "context", "args")
+
+    def __init__(self, message, context, args=()):
+        self.message = message
+        self.context = context
+        if len(args) == 1 and isinstance(args[0], Mapping) and args[0]:
+            args = args[0]  # like logging: log("%(key)s", {"key": value})
+        self.args = args
+
+    def get_message(self):
+        """
+        :return: the message with its args applied, without the context prefix
+        """
+        message = str(self.message)
+        if self.args:
+            message = message % self.args
+        return message
+
+    def __str__(self):
+        message = self.get_message()
+        log_context_prefix = _get_log_context_prefix(self.context)
+        if log_context_prefix:
+            return f"{log_context_prefix} {message}"
+        return message
+
+
+def _get_log_context_prefix(context):
     log_context_prefix = ""
     if context:
         for k, v in context.items():
@@ -21,11 +75,40 @@ def __get_log_context_prefix(context):
     return log_context_prefix
 
 
-def __get_log_function(log_level):
-    switcher = {
-        'debug': logging.debug,
-        'info': logging.info,
-        'warning': logging.warning,
-        'error': logging.error
-    }
-    return switcher.get(log_level, logging.info)
+class LazyLogArg:
+    """
+    Defers an expensive computation of a log argument until the message is formatted, e.g.
+    log_with_context("variables: %s", args=(LazyLogArg(strip, variables),))
+    """
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with the context as separate fields instead of a prefix:
+    {"timestamp": ..., "level": "INFO", "logger": "camunda", "message": ..., "WORKER_ID": "1", "TOPIC": ...}
+    """
+
+    def format(self, record):
+        if isinstance(record.msg, ContextMessage):
+            message = record.msg.get_message()
+        else:
+            message = record.getMessage()
+
+        log_entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+        }
+        log_entry.update({k: v for k, v in getattr(record, CONTEXT_ATTRIBUTE, {}).items()})
+        if record.exc_info:
+            log_entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(log_entry, default=str)
@@ -0,0 +1,201 @@
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# metric names recorded by the workers and executors, all of them per topic
+FETCH_TOTAL = "fetch_total"
+FETCH_EMPTY_TOTAL = "fetch_empty_total"
+FETCH_ERRORS_TOTAL = "fetch_errors_total"
+FETCH_DURATION_SECONDS = "fetch_duration_seconds"
+TASKS_FETCHED_TOTAL = "tasks_fetched_total"
+TASKS_IN_FLIGHT = "tasks_in_flight"
+HANDLER_DURATION_SECONDS = "handler_duration_seconds"
+HANDLER_ERRORS_TOTAL = "handler_errors_total"
+HANDLER_TIMEOUTS_TOTAL = "handler_timeouts_total"
+REPORT_DURATION_SECONDS = "report_duration_seconds"
+REPORT_ERRORS_TOTAL = "report_errors_total"
+TASKS_COMPLETED_TOTAL = "tasks_completed_total"
+TASKS_FAILED_TOTAL = "tasks_failed_total"
+TASKS_BPMN_ERROR_TOTAL = "tasks_bpmn_error_total"
+MEMO_HITS_TOTAL = "memo_hits_total"
+MEMO_MISSES_TOTAL = "memo_misses_total"
+
+
+class NoopMetrics:
+    """
+    Default metrics of workers and executors: records nothing.
+    """
+    enabled = False
+
+    def inc(self, name, topic, value=1):
+        pass
+
+    def add(self, name, topic, delta):
+        pass
+
+    def observe(self, name, topic, seconds):
+        pass
+
+
+NOOP_METRICS = NoopMetrics()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot counts observations above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {"buckets": dict(zip(self.buckets, self.counts)), "sum": self.sum, "count": self.count}
+
+
+class Metrics:
+    """
+    In-memory per-topic counters, gauges and latency histograms.
+    Pass an instance as metrics to a worker (or executor) and read it with snapshot() or an exporter.
+    """
+    enabled = True
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, topic, value=1):
+        key = (name, topic)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add(self, name, topic, delta):
+        key = (name, topic)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name, topic, seconds):
+        key = (name, topic)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """
+        :return: {"counters": {name: {topic: value}}, "gauges": {name: {topic: value}},
+                  "histograms": {name: {topic: {"buckets": {upper_bound: count}, "sum": float, "count": int}}}}
+        """
+        with self._lock:
+            return {
+                "counters": self.__group(self._counters, lambda v: v),
+                "gauges": self.__group(self._gauges, lambda v: v),
+                "histograms": self.__group(self._histograms, lambda v: v.to_dict()),
+            }
+
+    @staticmethod
+    def __group(values, convert):
+        grouped = {}
+        for (name, topic), value in values.items():
+            grouped.setdefault(name, {})[topic] = convert(value)
+        return grouped
+
+
+class PrometheusExporter:
+    """
+    Renders Metrics in the Prometheus text exposition format, optionally served over HTTP.
+    """
+
+    def __init__(self, metrics, prefix="camunda_external_task"):
+        self.metrics = metrics
+        self.prefix = prefix
+        self._server = None
+
+    def render(self):
+        snapshot = self.metrics.snapshot()
+        lines = []
+        for metric_type, metric_values in (("counter", snapshot["counters"]), ("gauge", snapshot["gauges"])):
+            for name, values in sorted(metric_values.items()):
+                metric_name = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric_name} {metric_type}")
+                for topic, value in sorted(values.items()):
+                    lines.append(f'{metric_name}{{topic="{topic}"}} {value}')
+
+        for name, values in sorted(snapshot["histograms"].items()):
+            metric_name = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric_name} histogram")
+            for topic, histogram in sorted(values.items()):
+                cumulative = 0
+                for upper_bound, count in histogram["buckets"].items():
+                    cumulative += count
+                    lines.append(f'{metric_name}_bucket{{topic="{topic}",le="{upper_bound}"}} {cumulative}')
+                lines.append(f'{metric_name}_bucket{{topic="{topic}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{metric_name}_sum{{topic="{topic}"}} {histogram["sum"]}')
+                lines.append(f'{metric_name}_count{{topic="{topic}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9100, host="0.0.0.0"):
+        """
+        Serves the metrics on http://host:port/metrics from a daemon thread.
+        """
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+class CallbackExporter:
+    """
+    Calls callback(snapshot) every interval_seconds from a daemon thread, e.g. to push metrics to StatsD.
+    """
+
+    def __init__(self, metrics, callback, interval_seconds=60):
+        self.metrics = metrics
+        self.callback = callback
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            self.export()
+
+    def export(self):
+        try:
+            self.callback(self.metrics.snapshot())
+        except Exception:
+            logger.exception("error exporting metrics")
+
+    def stop(self):
+        self._stopped.set()
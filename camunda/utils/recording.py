@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+
+REDACT_ALL = "*"
+
+
+class NoopRecorder:
+    """
+    Default recorder of workers and executors: records nothing.
+    """
+    enabled = False
+
+    def record_fetch(self, topic_names, resp_json, duration_seconds):
+        pass
+
+    def record_handler(self, task, duration_seconds, outcome):
+        pass
+
+
+NOOP_RECORDER = NoopRecorder()
+
+
+class TaskRecorder:
+    """
+    Appends the raw fetchAndLock responses and the handler timings of a worker to an NDJSON file, one compact
+    JSON object per line, to reproduce production payload shapes offline with camunda.testing.replay:
+
+        {"type":"fetch","time":1700000000.1,"topics":["topicA"],"duration_seconds":0.012,"tasks":[{...}]}
+        {"type":"handler","time":1700000000.2,"topic":"topicA","task_id":"...","duration_seconds":0.3,
+         "outcome":"complete"}
+
+    The values of the variables named in redact_variables ("*" for all of them) are replaced by redacted_value,
+    keeping their name, type and valueInfo. Empty fetches are not recorded. Every record is flushed at once, so a
+    crashed worker loses nothing. Safe to share between threads and workers.
+    """
+    enabled = True
+
+    def __init__(self, path, redact_variables=(), redacted_value="<redacted>"):
+        self.path = path
+        self.redact_variables = set(redact_variables)
+        self.redacted_value = redacted_value
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record_fetch(self, topic_names, resp_json, duration_seconds):
+        if not resp_json:
+            return  # empty polls carry no payload
+        self._write({
+            "type": "fetch",
+            "time": time.time(),
+            "topics": list(topic_names) if isinstance(topic_names, (list, tuple)) else [topic_names],
+            "duration_seconds": duration_seconds,
+            "tasks": [self._redact(task) for task in resp_json],
+        })
+
+    def record_handler(self, task, duration_seconds, outcome):
+        """
+        :param outcome: complete, failure, bpmn_error, error (the handler raised), timeout or none (no TaskResult)
+        """
+        self._write({
+            "type": "handler",
+            "time": time.time(),
+            "topic": task.get_topic_name(),
+            "task_id": task.get_task_id(),
+            "duration_seconds": duration_seconds,
+            "outcome": outcome,
+        })
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _redact(self, task):
+        variables = task.get("variables")
+        if not self.redact_variables or not variables:
+            return task
+        redacted = {}
+        for name, variable in variables.items():
+            if REDACT_ALL in self.redact_variables or name in self.redact_variables:
+                variable = {**variable, "value": self.redacted_value}
+            redacted[name] = variable
+        return {**task, "variables": redacted}
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+def get_outcome(task_result):
+    """
+    :return: the outcome of a handler result as recorded by TaskRecorder.record_handler
+    """
+    if task_result is None or not hasattr(task_result, "is_success"):
+        return "none"
+    if task_result.is_success():
+        return "complete"
+    if task_result.is_bpmn_error():
+        return "bpmn_error"
+    if task_result.is_failure():
+        return "failure"
+    return "none"
+
+
+def read_recording(path):
+    """
+    Yields the records of a TaskRecorder file, skipping a last line cut off by a crash.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                return
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,75 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from camunda.utils.disk_cache import DiskCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class DiskCacheTest(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_cache(self, ttl_seconds=10, max_size=None):
+        cache = DiskCache(self.path, ttl_seconds, max_size=max_size, clock=self.clock)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_get_returns_value_until_ttl_expires(self):
+        cache = self.create_cache()
+        cache.set("key", {"value": [1, 2]})
+
+        self.clock.now = 9
+        self.assertEqual({"value": [1, 2]}, cache.get("key"))
+
+        self.clock.now = 10
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(0, len(cache))
+
+    def test_values_are_shared_by_caches_of_the_same_file(self):
+        self.create_cache().set("key", "value")
+
+        self.assertEqual("value", self.create_cache().get("key"))
+
+    def test_disabled_cache_does_not_store_values(self):
+        cache = self.create_cache(ttl_seconds=0)
+        cache.set("key", "value")
+        self.assertFalse(cache.enabled)
+        self.assertEqual("default", cache.get("key", "default"))
+
+    def test_least_recently_used_entry_is_evicted_when_full(self):
+        cache = self.create_cache(max_size=2)
+        cache.set("a", 1)
+        self.clock.now = 1
+        cache.set("b", 2)
+        self.clock.now = 2
+        cache.get("a")
+        self.clock.now = 3
+        cache.set("c", 3)
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+
+    def test_invalidate_and_clear(self):
+        cache = self.create_cache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.invalidate("a")
+        self.assertIsNone(cache.get("a"))
+        cache.clear()
+        self.assertEqual(0, len(cache))
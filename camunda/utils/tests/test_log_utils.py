@@ -0,0 +1,54 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import Mock
+
+from camunda.utils.log_utils import log_with_context, LazyLogArg, JsonFormatter
+
+
+class LogUtilsTest(TestCase):
+
+    def test_log_with_context_prefixes_message_and_adds_context_fields(self):
+        with self.assertLogs("camunda", level="INFO") as logs:
+            log_with_context("%s task(s) found", context={"WORKER_ID": "1", "TOPIC": "topicA", "TASK_ID": None},
+                             args=(2,))
+
+        record = logs.records[0]
+        self.assertEqual("[WORKER_ID:1][TOPIC:topicA] 2 task(s) found", record.getMessage())
+        self.assertEqual({"WORKER_ID": "1", "TOPIC": "topicA"}, record.camunda_context)
+        self.assertEqual("topicA", record.topic)
+        self.assertEqual("1", record.worker_id)
+
+    def test_log_with_context_keeps_percent_signs_in_context_values(self):
+        with self.assertLogs("camunda", level="INFO") as logs:
+            log_with_context('%s found', context={'TOPIC': 'a%b'}, args=(2,))
+
+        self.assertEqual("[TOPIC:a%b] 2 found", logs.records[0].getMessage())
+
+    def test_log_with_context_without_context_logs_message_as_is(self):
+        with self.assertLogs("camunda", level="INFO") as logs:
+            log_with_context("hello", log_level="warning")
+
+        self.assertEqual("hello", logs.records[0].getMessage())
+        self.assertEqual(logging.WARNING, logs.records[0].levelno)
+
+    def test_log_with_context_does_not_format_disabled_levels(self):
+        expensive = Mock(return_value="expensive")
+        with self.assertLogs("camunda", level="INFO") as logs:
+            log_with_context("debug %s", context={"WORKER_ID": "1"}, log_level="debug",
+                             args=(LazyLogArg(expensive),))
+            log_with_context("info")
+
+        self.assertEqual(1, len(logs.records))
+        expensive.assert_not_called()
+
+    def test_json_formatter_outputs_context_as_fields(self):
+        with self.assertLogs("camunda", level="INFO") as logs:
+            log_with_context("%s task(s) found", context={"WORKER_ID": "1", "TOPIC": "topicA"}, args=(2,))
+
+        log_entry = json.loads(JsonFormatter().format(logs.records[0]))
+
+        self.assertEqual("2 task(s) found", log_entry["message"])
+        self.assertEqual("INFO", log_entry["level"])
+        self.assertEqual("1", log_entry["WORKER_ID"])
+        self.assertEqual("topicA", log_entry["TOPIC"])
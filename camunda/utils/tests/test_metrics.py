@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from camunda.utils.metrics import Metrics, PrometheusExporter, CallbackExporter, NOOP_METRICS
+
+
+class MetricsTest(TestCase):
+
+    def test_snapshot_groups_metrics_by_name_and_topic(self):
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.inc("fetch_total", "topicA")
+        metrics.inc("fetch_total", "topicA")
+        metrics.inc("fetch_total", "topicB", 3)
+        metrics.add("tasks_in_flight", "topicA", 1)
+        metrics.observe("handler_duration_seconds", "topicA", 0.05)
+        metrics.observe("handler_duration_seconds", "topicA", 0.5)
+        metrics.observe("handler_duration_seconds", "topicA", 5)
+
+        snapshot = metrics.snapshot()
+
+        self.assertDictEqual({"fetch_total": {"topicA": 2, "topicB": 3}}, snapshot["counters"])
+        self.assertDictEqual({"tasks_in_flight": {"topicA": 1}}, snapshot["gauges"])
+        self.assertDictEqual({"buckets": {0.1: 1, 1: 1}, "sum": 5.55, "count": 3},
+                             snapshot["histograms"]["handler_duration_seconds"]["topicA"])
+
+    def test_noop_metrics_is_disabled(self):
+        NOOP_METRICS.inc("fetch_total", "topicA")
+        NOOP_METRICS.observe("fetch_duration_seconds", "topicA", 1)
+        self.assertFalse(NOOP_METRICS.enabled)
+
+    def test_prometheus_exporter_renders_cumulative_histogram_buckets(self):
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.inc("fetch_total", "topicA")
+        metrics.observe("handler_duration_seconds", "topicA", 0.05)
+        metrics.observe("handler_duration_seconds", "topicA", 0.5)
+
+        text = PrometheusExporter(metrics, prefix="camunda").render()
+
+        self.assertIn('# TYPE camunda_fetch_total counter\ncamunda_fetch_total{topic="topicA"} 1\n', text)
+        self.assertIn('camunda_handler_duration_seconds_bucket{topic="topicA",le="0.1"} 1\n', text)
+        self.assertIn('camunda_handler_duration_seconds_bucket{topic="topicA",le="1"} 2\n', text)
+        self.assertIn('camunda_handler_duration_seconds_bucket{topic="topicA",le="+Inf"} 2\n', text)
+        self.assertIn('camunda_handler_duration_seconds_count{topic="topicA"} 2\n', text)
+
+    def test_callback_exporter_passes_snapshot(self):
+        metrics = Metrics()
+        metrics.inc("fetch_total", "topicA")
+        snapshots = []
+
+        CallbackExporter(metrics, snapshots.append).export()
+
+        self.assertEqual({"topicA": 1}, snapshots[0]["counters"]["fetch_total"])
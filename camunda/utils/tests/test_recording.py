@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from camunda.external_task.external_task import ExternalTask
+from camunda.utils.recording import TaskRecorder, get_outcome, read_recording
+
+
+class TaskRecorderTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "recording.ndjson")
+
+    def test_records_fetches_and_handler_runs_as_json_lines(self):
+        task_json = {"id": "task1", "topicName": "topicA", "variables": {"amount": {"value": 10, "type": "Integer"}}}
+        with TaskRecorder(self.path) as recorder:
+            recorder.record_fetch(["topicA"], [task_json], 0.01)
+            recorder.record_fetch(["topicA"], [], 0.02)
+            task = ExternalTask(task_json)
+            recorder.record_handler(task, 0.5, get_outcome(task.complete()))
+
+        records = list(read_recording(self.path))
+
+        self.assertEqual(["fetch", "handler"], [record["type"] for record in records])
+        self.assertEqual(["topicA"], records[0]["topics"])
+        self.assertEqual([task_json], records[0]["tasks"])
+        self.assertEqual({"topic": "topicA", "task_id": "task1", "duration_seconds": 0.5, "outcome": "complete"},
+                         {key: records[1][key] for key in ("topic", "task_id", "duration_seconds", "outcome")})
+
+    def test_redacts_values_of_named_variables(self):
+        task_json = {"id": "task1", "topicName": "topicA",
+                     "variables": {"iban": {"value": "DE00 1234", "type": "String", "valueInfo": {}},
+                                   "amount": {"value": 10, "type": "Integer", "valueInfo": {}}}}
+        with TaskRecorder(self.path, redact_variables=["iban"]) as recorder:
+            recorder.record_fetch("topicA", [task_json], 0.01)
+
+        variables = next(read_recording(self.path))["tasks"][0]["variables"]
+
+        self.assertEqual({"value": "<redacted>", "type": "String", "valueInfo": {}}, variables["iban"])
+        self.assertEqual(10, variables["amount"]["value"])
+        self.assertEqual("DE00 1234", task_json["variables"]["iban"]["value"])
+
+    def test_redacts_all_variables(self):
+        task_json = {"id": "task1", "topicName": "topicA",
+                     "variables": {"a": {"value": 1, "type": "Integer"}, "b": {"value": "x", "type": "String"}}}
+        with TaskRecorder(self.path, redact_variables="*", redacted_value=None) as recorder:
+            recorder.record_fetch(["topicA"], [task_json], 0.01)
+
+        variables = next(read_recording(self.path))["tasks"][0]["variables"]
+
+        self.assertEqual({None}, {variable["value"] for variable in variables.values()})
+
+    def test_read_recording_skips_truncated_last_line(self):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"type": "fetch", "tasks": []}) + "\n")
+            file.write('{"type": "fetch", "tas')
+
+        self.assertEqual([{"type": "fetch", "tasks": []}], list(read_recording(self.path)))
+
+    def test_get_outcome(self):
+        task = ExternalTask({"id": "task1", "topicName": "topicA"})
+
+        self.assertEqual("complete", get_outcome(task.complete()))
+        self.assertEqual("failure", get_outcome(task.failure("error", "details", 3, 1000)))
+        self.assertEqual("bpmn_error", get_outcome(task.bpmn_error("CODE", "message")))
+        self.assertEqual("none", get_outcome(None))
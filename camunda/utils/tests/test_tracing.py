@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from camunda.external_task.external_task import ExternalTask
+from camunda.utils.tracing import NOOP_TRACER, OpenTelemetryTracer, get_task_span_attributes
+
+
+class TracingTest(TestCase):
+
+    def test_noop_tracer_span_ignores_attributes(self):
+        with NOOP_TRACER.start_span("camunda.handler", {"camunda.task_id": "1"}) as span:
+            span.set_attribute("camunda.result", "complete")
+        self.assertFalse(NOOP_TRACER.enabled)
+
+    def test_get_task_span_attributes_skips_missing_values(self):
+        task = ExternalTask({"id": "1", "topicName": "my_topic", "processInstanceId": "pi1", "businessKey": None,
+                             "createTime": "2024-01-01T10:00:00.000+0000"})
+
+        self.assertDictEqual({
+            "camunda.task_id": "1",
+            "camunda.topic": "my_topic",
+            "camunda.process_instance_id": "pi1",
+            "camunda.create_time": "2024-01-01T10:00:00.000+0000",
+        }, get_task_span_attributes(task))
+
+    def test_open_telemetry_tracer_starts_current_span(self):
+        otel_span = MagicMock()
+        otel_tracer = MagicMock()
+
+        @contextmanager
+        def start_as_current_span(name, attributes=None):
+            yield otel_span
+        otel_tracer.start_as_current_span.side_effect = start_as_current_span
+
+        with OpenTelemetryTracer(otel_tracer).start_span("camunda.report", {"camunda.task_id": "1"}) as span:
+            span.set_attribute("camunda.result", "complete")
+
+        otel_tracer.start_as_current_span.assert_called_once_with("camunda.report",
+                                                                  attributes={"camunda.task_id": "1"})
+        otel_span.set_attribute.assert_called_once_with("camunda.result", "complete")
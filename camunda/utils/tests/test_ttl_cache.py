@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from camunda.utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTest(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_get_returns_value_until_ttl_expires(self):
+        cache = TTLCache(10, clock=self.clock)
+        cache.set("key", "value")
+
+        self.clock.now = 9
+        self.assertEqual("value", cache.get("key"))
+
+        self.clock.now = 10
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(0, len(cache))
+
+    def test_disabled_cache_does_not_store_values(self):
+        cache = TTLCache(0, clock=self.clock)
+        cache.set("key", "value")
+        self.assertFalse(cache.enabled)
+        self.assertEqual("default", cache.get("key", "default"))
+
+    def test_least_recently_used_entry_is_evicted_when_full(self):
+        cache = TTLCache(10, max_size=2, clock=self.clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+
+    def test_invalidate(self):
+        cache = TTLCache(10, clock=self.clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.invalidate("a")
+        cache.invalidate("missing")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(2, cache.get("b"))
@@ -0,0 +1,66 @@
+FETCH_AND_LOCK_SPAN = "camunda.fetch_and_lock"
+EXECUTE_TASK_SPAN = "camunda.execute_task"
+HANDLER_SPAN = "camunda.handler"
+REPORT_SPAN = "camunda.report"
+
+
+class NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class NoopTracer:
+    """
+    Default tracer of workers and executors: creates no spans.
+
+    A tracer is any object with an enabled flag and a start_span(name, attributes) method returning a
+    context manager, whose value supports set_attribute(key, value).
+    """
+    enabled = False
+
+    def start_span(self, name, attributes=None):
+        return NOOP_SPAN
+
+
+NOOP_TRACER = NoopTracer()
+
+
+class OpenTelemetryTracer:
+    """
+    Adapts an OpenTelemetry tracer, e.g. OpenTelemetryTracer(opentelemetry.trace.get_tracer(__name__)).
+    Spans are started as current span, so spans of the handler become children of the execute_task span.
+    """
+    enabled = True
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def start_span(self, name, attributes=None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+def get_task_span_attributes(task):
+    """
+    :return: span attributes of an ExternalTask: task id, topic, process instance, business key, worker and
+        the engine timestamps needed to derive the time a task spent in the engine queue
+    """
+    context = task.get_context()
+    attributes = {
+        "camunda.task_id": context.get("id"),
+        "camunda.topic": context.get("topicName"),
+        "camunda.process_instance_id": context.get("processInstanceId"),
+        "camunda.business_key": context.get("businessKey"),
+        "camunda.worker_id": context.get("workerId"),
+        "camunda.create_time": context.get("createTime"),
+        "camunda.lock_expiration_time": context.get("lockExpirationTime"),
+    }
+    return {k: v for k, v in attributes.items() if v is not None}
@@ -0,0 +1,33 @@
+import logging
+
+from camunda.external_task.external_task_worker import ExternalTaskWorker
+from camunda.external_task.worker_supervisor import WorkerSupervisor
+from examples.task_handler_example import handle_task
+
+default_config = {
+    "maxTasks": 1,
+    "lockDuration": 10000,
+    "asyncResponseTimeout": 3000,
+    "retries": 3,
+    "retryTimeout": 5000,
+    "sleepSeconds": 30,
+}
+
+
+def create_worker(worker_id):
+    return ExternalTaskWorker(worker_id=worker_id, config=default_config)
+
+
+def run_worker(worker):
+    worker.subscribe(["PARALLEL_STEP_1", "PARALLEL_STEP_2", "COMBINE_STEP"], handle_task)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        handlers=[logging.StreamHandler()])
+    # one worker process per core, stop with SIGTERM or Ctrl+C to let them finish their tasks
+    WorkerSupervisor(create_worker, run_worker, worker_id_prefix="prefork").run()
+
+
+if __name__ == '__main__':
+    main()